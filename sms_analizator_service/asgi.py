@@ -13,4 +13,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms_analizator_service.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from utils.lifespan import LifespanApplication, on_startup  # noqa: E402
+
+
+def prepare_schema():
+    # Схема API строится при запуске, а не на первом запросе документации;
+    # drf_yasg загружается только здесь, чтобы не замедлять импорт приложения
+    from sms_analizator_service.schema import prepare_schema_in_background
+    prepare_schema_in_background()
+
+
+on_startup(prepare_schema)
+
+# Обработка lifespan: при остановке воркер возвращает незавершённые
+# доставки планировщику и записывает буферы (utils/lifespan.py)
+application = LifespanApplication(django_application)
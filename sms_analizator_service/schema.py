@@ -0,0 +1,87 @@
+"""
+Документация API (drf-yasg) со схемой, сгенерированной один раз.
+
+Генерация схемы обходит все маршруты и сериализаторы и занимает заметное
+время, а схема меняется только с кодом. CachedSchemaView строит её один
+раз на процесс (в фоновом потоке при запуске ASGI приложения, см. asgi.py,
+или при первом запросе) без привязки к запросу: без host в схеме Swagger UI использует
+адрес, с которого открыта документация. Ответ со схемой отдаётся с ETag,
+повторный запрос браузера получает 304.
+"""
+import hashlib
+import json
+import threading
+
+from django.views.decorators.http import condition
+from drf_yasg import openapi
+from drf_yasg.renderers import _SpecRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from utils.logger_config import get_api_logger
+
+# Значения параметра format, при которых отдаётся схема, а не страница UI
+SPEC_FORMATS = ('openapi', 'json', 'yaml', '.json', '.yaml')
+
+API_INFO = openapi.Info(
+    title="SMS analizator service API",
+    default_version='v1',
+    description="API documentation",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@yourapi.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def get_schema(version=''):
+    """Схема API версии version (генерируется при первом обращении)."""
+    entry = _schemas.get(version)
+    if entry is None:
+        with _schemas_lock:
+            entry = _schemas.get(version)
+            if entry is None:
+                generator = schema_view.generator_class(API_INFO, version)
+                schema = generator.get_schema(request=None, public=True)
+                digest = hashlib.sha1(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+                entry = _schemas[version] = (schema, digest)
+                get_api_logger().info(f"Схема API {version or 'по умолчанию'} сгенерирована")
+    return entry
+
+
+def prepare_schema():
+    """Генерация схемы при запуске процесса (хук lifespan startup)."""
+    get_schema()
+
+
+def prepare_schema_in_background():
+    """Генерация схемы в фоновом потоке: приём запросов начинается не дожидаясь её."""
+    threading.Thread(target=prepare_schema, name='prepare-schema', daemon=True).start()
+
+
+class CachedSchemaView(schema_view):
+    def get(self, request, version='', format=None):
+        if not isinstance(request.accepted_renderer, _SpecRenderer):
+            return super().get(request, version, format)
+        schema, _ = get_schema(request.version or version or '')
+        return Response(schema)
+
+
+def schema_etag(request, *args, **kwargs):
+    if request.GET.get('format') not in SPEC_FORMATS:
+        return None
+    _, digest = get_schema(kwargs.get('version') or '')
+    return f"{digest}-{request.GET['format']}"
+
+
+def swagger_ui_view():
+    return condition(etag_func=schema_etag)(CachedSchemaView.with_ui('swagger', cache_timeout=0))
@@ -45,7 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'utils.staticfiles.StaticFilesConfig',  # django.contrib.staticfiles без демо-файлов темы
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -55,6 +55,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.HealthCheckMiddleware',  # /healthz и /readyz, без остальных middleware
+    'utils.middleware.StaticFilesMiddleware',  # Статические файлы из STATIC_ROOT (при STATIC_SERVE)
+    'utils.middleware.ProfilingMiddleware',  # Профилирование запросов (при PROFILING_ENABLED)
+    'utils.middleware.CompressionMiddleware',  # gzip ответов, кроме webhook
+    'django.middleware.http.ConditionalGetMiddleware',  # ETag и 304 для GET
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,8 +76,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса (и при DEBUG)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -136,7 +147,27 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = '/templates/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'templates')
+# Каталог сборки manage.py collectstatic (utils/staticfiles.py)
+STATIC_ROOT = os.getenv('STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
+STATICFILES_DIRS = [
+    ('assets', os.path.join(BASE_DIR, 'templates', 'assets')),
+]
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'utils.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+# Раздача статики приложением (False — если её раздаёт веб-сервер)
+STATIC_SERVE = os.getenv('STATIC_SERVE', 'True').lower() in ('1', 'true', 'yes')
+# Cache-Control для файлов без хеша в имени; файлы с хешем кешируются на год
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 3600))
+
+# Сжатие ответов (utils/middleware.py): минимальный размер и пути без сжатия
+GZIP_MIN_LENGTH = int(os.getenv('GZIP_MIN_LENGTH', 1024))
+GZIP_EXEMPT_PATHS = ['/webhook/']
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -145,8 +176,186 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users_app.User'
 
+# Сначала CachedModelBackend (users_app/auth_backends.py); ModelBackend нужен
+# для сессий, созданных до его подключения
+AUTHENTICATION_BACKENDS = [
+    'users_app.auth_backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Кеш пользователей сессий в процессе; USER_CACHE_TTL=0 — без кеша
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+# Кеши: default (по умолчанию в памяти процесса) и sessions для SESSION_ENGINE=cached_db/cache.
+# Файловый кеш сессий общий для процессов одного сервера; при нескольких серверах
+# нужен сетевой кеш (например, django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'sessions': {
+        'BACKEND': os.getenv('SESSION_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('SESSION_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'sessions')),
+        'TIMEOUT': int(os.getenv('SESSION_CACHE_TIMEOUT', 24 * 60 * 60)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 50000))},
+    },
+    'fragments': {
+        'BACKEND': os.getenv('FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('FRAGMENT_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'fragments')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 50000))},
+    },
+}
+# Кеш списков на страницах настроек (users_app/fragment_cache.py); общий для процессов
+FRAGMENT_CACHE_ALIAS = 'fragments'
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 600))
+# cached_db — чтение сессии из кеша, запись в кеш и БД; также db, cache, signed_cookies
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/about/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 TOKEN_BOT = os.getenv('TOKEN_BOT')
+# Дополнительные боты для пересылки SMS (токены через запятую), см. users_app/bot_pool.py
+TELEGRAM_EXTRA_BOT_TOKENS = [
+    token.strip() for token in os.getenv('TELEGRAM_EXTRA_BOT_TOKENS', '').split(',') if token.strip()
+]
+# Лимиты отправок одного бота (в секунду) и в один чат (в минуту). Лимиты
+# считаются в каждом процессе отдельно, а в чат отправляют и веб-воркер,
+# и планировщик: задавайте лимит чата с запасом до ограничения Telegram
+TELEGRAM_BOT_RATE_PER_SECOND = float(os.getenv('TELEGRAM_BOT_RATE_PER_SECOND', 25))
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MINUTE', 20))
+
+# Автоматическое отключение недоступных Telegram чатов (users_app/chat_health.py)
+# Количество постоянных ошибок подряд, после которого чат исключается из маршрутизации
+TELEGRAM_CHAT_MAX_ERRORS = int(os.getenv('TELEGRAM_CHAT_MAX_ERRORS', 3))
+# Базовая и максимальная задержка (в секундах) перед повторной проверкой отключенного чата
+TELEGRAM_CHAT_PROBE_BASE_DELAY = int(os.getenv('TELEGRAM_CHAT_PROBE_BASE_DELAY', 300))
+TELEGRAM_CHAT_PROBE_MAX_DELAY = int(os.getenv('TELEGRAM_CHAT_PROBE_MAX_DELAY', 86400))
+
+# Журнал доставки и повторные попытки (users_app/delivery.py)
+DELIVERY_MAX_ATTEMPTS = int(os.getenv('DELIVERY_MAX_ATTEMPTS', 8))
+# Базовая и максимальная задержка (в секундах) между попытками, к ней добавляется случайный разброс
+DELIVERY_RETRY_BASE_DELAY = int(os.getenv('DELIVERY_RETRY_BASE_DELAY', 5))
+DELIVERY_RETRY_MAX_DELAY = int(os.getenv('DELIVERY_RETRY_MAX_DELAY', 3600))
+# Время (в секундах), на которое попытка резервирует доставку за обработчиком
+DELIVERY_LEASE_SECONDS = int(os.getenv('DELIVERY_LEASE_SECONDS', 120))
+# Сколько секунд webhook суммарно ждёт отправки в Telegram и на HTTP адреса,
+# прежде чем оставить неотправленные доставки планировщику
+DELIVERY_INLINE_MAX_WAIT = float(os.getenv('DELIVERY_INLINE_MAX_WAIT', 3))
+# Ожидание (в секундах), после которого сообщение из любой очереди обслуживается как срочное
+DELIVERY_STARVATION_SECONDS = float(os.getenv('DELIVERY_STARVATION_SECONDS', 60))
+DELIVERY_POLL_INTERVAL = float(os.getenv('DELIVERY_POLL_INTERVAL', 1.0))
+DELIVERY_BATCH_SIZE = int(os.getenv('DELIVERY_BATCH_SIZE', 100))
+# Пересылка SMS на HTTP адреса клиентов (users_app/endpoints.py)
+# Таймаут запроса и подключения (в секундах)
+ENDPOINT_TIMEOUT = float(os.getenv('ENDPOINT_TIMEOUT', 10))
+ENDPOINT_CONNECT_TIMEOUT = float(os.getenv('ENDPOINT_CONNECT_TIMEOUT', 3))
+# Соединения общего HTTP клиента процесса и одновременные запросы к одному хосту
+ENDPOINT_MAX_CONNECTIONS = int(os.getenv('ENDPOINT_MAX_CONNECTIONS', 100))
+ENDPOINT_HOST_CONCURRENCY = int(os.getenv('ENDPOINT_HOST_CONCURRENCY', 4))
+# Верхняя граница HttpEndpoint.batch_size
+ENDPOINT_MAX_BATCH_SIZE = int(os.getenv('ENDPOINT_MAX_BATCH_SIZE', 100))
+# Разрешить http и непубличные адреса (localhost, частные сети) — только для разработки (utils/network.py)
+ENDPOINT_ALLOW_PRIVATE_ADDRESSES = os.getenv('ENDPOINT_ALLOW_PRIVATE_ADDRESSES', 'False').lower() in ('1', 'true', 'yes')
+
+# Процессы планировщика доставки manage.py run_workers (users_app/workers.py); 0 — по числу ядер
+WORKER_PROCS = int(os.getenv('WORKER_PROCS', 0))
+# Время (в секундах) на остановку процессов после SIGTERM, затем они завершаются принудительно
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv('WORKER_SHUTDOWN_TIMEOUT', 30))
+
+# Интервал (в секундах) сброса гистограмм задержек доставки в БД (users_app/latency.py)
+LATENCY_FLUSH_INTERVAL = float(os.getenv('LATENCY_FLUSH_INTERVAL', 30))
+
+# Журнал изменений (users_app/audit.py)
+AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+# Приёмник событий: database (таблица AuditEvent) или jsonl (файл AUDIT_JSONL_PATH)
+AUDIT_SINK = os.getenv('AUDIT_SINK', 'database')
+AUDIT_JSONL_PATH = os.getenv('AUDIT_JSONL_PATH', BASE_DIR / 'logs' / 'audit.jsonl')
+# Буфер сбрасывается при AUDIT_BUFFER_SIZE событиях или раз в AUDIT_FLUSH_INTERVAL секунд
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 5))
+
+# Оплата пересылки SMS с User.balance (users_app/billing.py)
+BILLING_ENABLED = os.getenv('BILLING_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+# Стоимость пересылки одного SMS в единицах баланса
+BILLING_PRICE_PER_SMS = int(os.getenv('BILLING_PRICE_PER_SMS', 1))
+# Списания копятся в памяти процесса, фоновый поток записывает их в БД раз в BILLING_FLUSH_INTERVAL секунд
+BILLING_FLUSH_INTERVAL = float(os.getenv('BILLING_FLUSH_INTERVAL', 5))
+# Копия баланса для проверки перед пересылкой: обновляется из БД не реже BILLING_BALANCE_TTL секунд
+BILLING_BALANCE_CACHE_SIZE = int(os.getenv('BILLING_BALANCE_CACHE_SIZE', 10000))
+BILLING_BALANCE_TTL = float(os.getenv('BILLING_BALANCE_TTL', 30))
+
+# Кеш аутентификации webhook по токену (users_app/token_cache.py)
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', 300))
+# Негативный кеш неизвестных токенов
+TOKEN_NEGATIVE_CACHE_SIZE = int(os.getenv('TOKEN_NEGATIVE_CACHE_SIZE', 10000))
+TOKEN_NEGATIVE_CACHE_TTL = float(os.getenv('TOKEN_NEGATIVE_CACHE_TTL', 30))
+# Общий для процессов кеш событий смены токенов и интервал их проверки в секундах
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', FRAGMENT_CACHE_ALIAS)
+TOKEN_CACHE_VERSION_INTERVAL = float(os.getenv('TOKEN_CACHE_VERSION_INTERVAL', 1))
+
+# Ограничение частоты запросов к webhook (utils/rate_limit.py)
+# Допустимое количество запросов за окно WEBHOOK_RATE_LIMIT_WINDOW секунд; 0 — без ограничения
+WEBHOOK_RATE_LIMIT_PER_TOKEN = int(os.getenv('WEBHOOK_RATE_LIMIT_PER_TOKEN', 120))
+# Лимит по IP выключен: провайдеры присылают SMS всех клиентов с немногих адресов
+WEBHOOK_RATE_LIMIT_PER_IP = int(os.getenv('WEBHOOK_RATE_LIMIT_PER_IP', 0))
+# Адреса и сети провайдеров без лимита по IP (через запятую, например 185.45.152.0/24)
+WEBHOOK_RATE_LIMIT_IP_ALLOWLIST = [
+    network.strip() for network in os.getenv('WEBHOOK_RATE_LIMIT_IP_ALLOWLIST', '').split(',') if network.strip()
+]
+WEBHOOK_RATE_LIMIT_WINDOW = int(os.getenv('WEBHOOK_RATE_LIMIT_WINDOW', 60))
+# Хранилище счётчиков: MemoryBackend (в процессе), CacheBackend (Django cache) или SQLiteBackend (файл)
+WEBHOOK_RATE_LIMIT_BACKEND = os.getenv('WEBHOOK_RATE_LIMIT_BACKEND', 'utils.rate_limit.MemoryBackend')
+WEBHOOK_RATE_LIMIT_BACKEND_OPTIONS = {}
+WEBHOOK_RATE_LIMIT_SQLITE_PATH = os.getenv(
+    'WEBHOOK_RATE_LIMIT_SQLITE_PATH', os.path.join(BASE_DIR, 'rate_limit.sqlite3')
+)
+# Заголовок с IP клиента за прокси (например, HTTP_X_REAL_IP); по умолчанию REMOTE_ADDR
+WEBHOOK_RATE_LIMIT_IP_HEADER = os.getenv('WEBHOOK_RATE_LIMIT_IP_HEADER')
+
+# Защита от перегрузки очереди доставки (users_app/backpressure.py); 0 — без ограничения
+# Максимум одновременно обрабатываемых webhook запросов в одном процессе
+BACKPRESSURE_MAX_INFLIGHT = int(os.getenv('BACKPRESSURE_MAX_INFLIGHT', 200))
+# Максимум доставок в очереди
+BACKPRESSURE_MAX_BACKLOG = int(os.getenv('BACKPRESSURE_MAX_BACKLOG', 50000))
+# Как часто (в секундах) пересчитывается размер очереди
+BACKPRESSURE_REFRESH_INTERVAL = float(os.getenv('BACKPRESSURE_REFRESH_INTERVAL', 2))
+BACKPRESSURE_RETRY_AFTER = int(os.getenv('BACKPRESSURE_RETRY_AFTER', 30))
+
+# Адреса, с которых доступен /metrics/ (пустой список — без ограничения)
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+# Пробы балансировщика (utils/health.py)
+HEALTH_LIVENESS_PATH = os.getenv('HEALTH_LIVENESS_PATH', '/healthz')
+HEALTH_READINESS_PATH = os.getenv('HEALTH_READINESS_PATH', '/readyz')
+# Как часто (в секундах) фоновый поток проверяет БД и очередь доставки
+HEALTH_REFRESH_INTERVAL = float(os.getenv('HEALTH_REFRESH_INTERVAL', 5))
+# Как часто (в секундах) проверяется доступность Telegram API
+HEALTH_TELEGRAM_INTERVAL = float(os.getenv('HEALTH_TELEGRAM_INTERVAL', 60))
+# Отставание очереди доставки (в секундах), после которого состояние считается degraded
+HEALTH_MAX_DELIVERY_LAG = float(os.getenv('HEALTH_MAX_DELIVERY_LAG', 300))
+
+# Учёт SQL запросов в RequestLoggingMiddleware (число, время, самый медленный запрос)
+DB_QUERY_INSTRUMENTATION = os.getenv('DB_QUERY_INSTRUMENTATION', 'False').lower() in ('1', 'true', 'yes')
+# Пороги, после которых запрос записывается в database.log как проблемный
+DB_QUERY_WARN_COUNT = int(os.getenv('DB_QUERY_WARN_COUNT', 30))
+DB_QUERY_WARN_TIME_MS = float(os.getenv('DB_QUERY_WARN_TIME_MS', 300))
+
+# Профилирование запросов и обновлений бота (utils/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+# Доля случайно профилируемых запросов (0 — только по подписанному заголовку)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+# Префиксы путей для случайной выборки, через запятую (пусто — все пути)
+PROFILING_PATH_PREFIXES = [prefix.strip() for prefix in os.getenv('PROFILING_PATH_PREFIXES', '').split(',') if prefix.strip()]
+PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-Profile')
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'logs' / 'profiles')
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 100))
+
+# Количество записей на странице настроек правил и сервисов
+SETTINGS_PAGE_SIZE = int(os.getenv('SETTINGS_PAGE_SIZE', 30))
+# Количество вариантов в ответе автодополнения формы правила
+AUTOCOMPLETE_LIMIT = int(os.getenv('AUTOCOMPLETE_LIMIT', 20))
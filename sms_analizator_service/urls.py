@@ -1,27 +1,26 @@
+import functools
+
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
 
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from utils.metrics import metrics_view
+
+
+@functools.lru_cache(maxsize=None)
+def _swagger_ui_view():
+    from sms_analizator_service.schema import swagger_ui_view
+    return swagger_ui_view()
+
 
+def swagger_ui(request, *args, **kwargs):
+    # drf_yasg загружается при первом открытии документации (или при запуске ASGI приложения)
+    return _swagger_ui_view()(request, *args, **kwargs)
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="SMS analizator service API",
-        default_version='v1',
-        description="API documentation",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@yourapi.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('users_app.urls')),
 ]
@@ -1,32 +1,208 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 
-from users_app.models import User, Key, NumbersService, Rules, TelegramChats
+from users_app.audit import audited_delete, audited_update
+from users_app.billing import credit
+from users_app.fragment_cache import invalidate_fragments
+from users_app.models import (
+    User, Key, NumbersService, Rules, TelegramChats, HttpEndpoint, Delivery, DeadLetter, EndpointDelivery,
+    LatencyStats, AuditEvent, BalanceEntry
+)
+from utils.paginator import EstimatedCountPaginator
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Настройки списков для больших таблиц: оценка числа строк вместо
+    COUNT(*) и без повторного подсчёта всех строк при поиске.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+
+    def delete_queryset(self, request, queryset):
+        # Массовое удаление в журнале — по событию на модель, а не на объект;
+        # кеш страниц настроек сбрасывается один раз для всех владельцев
+        user_ids = self.owner_ids(queryset)
+        audited_delete(queryset)
+        invalidate_fragments(user_ids)
+
+    @staticmethod
+    def owner_ids(queryset):
+        if queryset.model is User:
+            return set(queryset.values_list('pk', flat=True))
+        if 'user' in {field.name for field in queryset.model._meta.fields}:
+            return set(queryset.values_list('user_id', flat=True))
+        return set()
+
+
+class UserActionForm(ActionForm):
+    amount = forms.IntegerField(required=False, label='Сумма')
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    ordering = ('email',)
-    search_fields = ('email',)
+class UserAdmin(ScalableAdmin):
+    list_display = ('phone', 'email', 'telegram_id', 'balance', 'date_joined')
+    # Поиск по префиксу и точному значению использует индексы
+    search_fields = ('^phone', '^email', '=telegram_id')
+    # Баланс меняется только с записью в журнал баланса (действие credit_balance)
+    readonly_fields = ('balance',)
+    action_form = UserActionForm
+    actions = ('credit_balance',)
+
+    @admin.action(description='Изменить баланс выбранных пользователей на сумму')
+    def credit_balance(self, request, queryset):
+        try:
+            amount = int(request.POST.get('amount') or 0)
+        except ValueError:
+            amount = 0
+        if not amount:
+            self.message_user(request, 'Укажите сумму (отрицательная — списание)', messages.ERROR)
+            return
+        updated = credit(queryset.values_list('pk', flat=True), amount, 'topup' if amount > 0 else 'adjustment')
+        self.message_user(request, f'Баланс изменён на {amount:+d} у пользователей: {updated}')
 
 
 @admin.register(Key)
-class KeyAdmin(admin.ModelAdmin):
-    search_fields = ('name', 'title')
-    list_display = ('name', 'user')
+class KeyAdmin(ScalableAdmin):
+    # Поиск только по индексированным столбцам; тип ключа — фильтром
+    search_fields = ('^user__phone',)
+    list_filter = ('name',)
+    list_display = ('name', 'title', 'user')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
 
 @admin.register(NumbersService)
-class NumbersServiceAdmin(admin.ModelAdmin):
-    list_display = ('name', 'telephone')
-    search_fields = ('name', 'telephone')
+class NumbersServiceAdmin(ScalableAdmin):
+    list_display = ('name', 'telephone', 'user')
+    list_select_related = ('user',)
+    search_fields = ('^telephone', '^user__phone')
+    autocomplete_fields = ('user',)
 
 
 @admin.register(TelegramChats)
-class TelegramChatsAdmin(admin.ModelAdmin):
-    list_display = ('title', 'chat_id')
-    search_fields = ('title', 'chat_id')
+class TelegramChatsAdmin(ScalableAdmin):
+    list_display = ('title', 'chat_id', 'user', 'is_suspended', 'error_count')
+    list_filter = ('is_suspended',)
+    list_select_related = ('user',)
+    search_fields = ('=chat_id', '^user__phone')
+    autocomplete_fields = ('user',)
+    actions = ('suspend_chats', 'resume_chats')
+
+    @admin.action(description='Отключить пересылку в выбранные чаты')
+    def suspend_chats(self, request, queryset):
+        # Без next_probe_at чат не проверяется автоматически: пересылку
+        # возобновляет действие resume_chats или /start в чате
+        updated = audited_update(
+            queryset, is_suspended=True, next_probe_at=None, last_error='Отключен администратором'
+        )
+        self.message_user(request, f'Отключено чатов: {updated}')
+
+    @admin.action(description='Возобновить пересылку в выбранные чаты')
+    def resume_chats(self, request, queryset):
+        updated = audited_update(queryset, is_suspended=False, error_count=0, last_error=None, next_probe_at=None)
+        self.message_user(request, f'Возобновлено чатов: {updated}')
+
+
+@admin.register(HttpEndpoint)
+class HttpEndpointAdmin(ScalableAdmin):
+    list_display = ('name', 'url', 'user', 'batch_size', 'is_active')
+    list_filter = ('is_active',)
+    list_select_related = ('user',)
+    search_fields = ('^name', '^user__phone')
+    autocomplete_fields = ('user',)
+
+
+class RulesActionForm(ActionForm):
+    target_chat = forms.IntegerField(required=False, label='ID канала')
 
 
 @admin.register(Rules)
-class RulesAdmin(admin.ModelAdmin):
-    list_display = ('from_whom', 'to_whom')
+class RulesAdmin(ScalableAdmin):
+    list_display = ('id', 'user', 'sender', 'from_whom', 'to_whom', 'to_endpoint')
+    list_select_related = ('user', 'from_whom', 'to_whom', 'to_endpoint')
+    search_fields = ('^user__phone', '=to_whom__chat_id')
+    autocomplete_fields = ('user', 'from_whom', 'to_whom', 'to_endpoint')
+    action_form = RulesActionForm
+    actions = ('reassign_rules',)
+
+    @admin.action(description='Перенести выбранные правила в канал (ID канала)')
+    def reassign_rules(self, request, queryset):
+        chat = TelegramChats.objects.filter(pk=request.POST.get('target_chat') or None).first()
+        if chat is None:
+            self.message_user(request, 'Укажите ID существующего канала', messages.ERROR)
+            return
+        # Правила переносятся только в канал того же пользователя
+        updated = audited_update(
+            queryset.filter(user_id=chat.user_id), user_id=chat.user_id, to_whom=chat, to_endpoint=None
+        )
+        invalidate_fragments([chat.user_id], ['rules'])
+        skipped = queryset.exclude(user_id=chat.user_id).count()
+        self.message_user(request, f"Перенесено правил в канал '{chat.title}': {updated}")
+        if skipped:
+            self.message_user(request, f'Пропущено правил других пользователей: {skipped}', messages.WARNING)
+
+
+@admin.register(Delivery)
+class DeliveryAdmin(ScalableAdmin):
+    list_display = ('id', 'chat', 'status', 'priority', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'priority')
+    list_select_related = ('chat',)
+    raw_id_fields = ('user', 'chat')
+
+
+@admin.register(EndpointDelivery)
+class EndpointDeliveryAdmin(ScalableAdmin):
+    list_display = ('id', 'endpoint', 'status', 'priority', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'priority')
+    list_select_related = ('endpoint',)
+    raw_id_fields = ('user', 'endpoint')
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'delivery', 'endpoint_delivery', 'reason', 'created_at')
+    list_select_related = ('delivery', 'endpoint_delivery')
+    raw_id_fields = ('delivery', 'endpoint_delivery')
+
+
+@admin.register(LatencyStats)
+class LatencyStatsAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'scope', 'key', 'stage', 'count')
+    list_filter = ('scope', 'stage')
+    search_fields = ('key',)
+
+
+@admin.register(BalanceEntry)
+class BalanceEntryAdmin(ScalableAdmin):
+    list_display = ('created_at', 'user', 'kind', 'amount', 'sms_count')
+    list_filter = ('kind',)
+    list_select_related = ('user',)
+    search_fields = ('^user__phone',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(ScalableAdmin):
+    list_display = ('created_at', 'operation', 'model', 'object_id', 'user_id', 'count')
+    list_filter = ('operation', 'model')
+    search_fields = ('=user_id', '=object_id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
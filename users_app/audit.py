@@ -0,0 +1,224 @@
+"""
+Журнал изменений пользовательских данных (аудит).
+
+События пишутся в буфер процесса после фиксации транзакции (откаченные
+изменения в журнал не попадают). Запрос только добавляет событие в память;
+пакеты записывает фоновый поток раз в AUDIT_FLUSH_INTERVAL секунд или
+раньше, когда в буфере накопилось AUDIT_BUFFER_SIZE событий, а также
+процесс при остановке. Приёмник задаётся AUDIT_SINK:
+- 'database' — таблица AuditEvent (одна вставка на пакет);
+- 'jsonl' — файл AUDIT_JSONL_PATH, одно событие на строку.
+
+Одиночные сохранения и удаления учитываются сигналами (users_app/signals.py).
+Массовые операции записываются одним событием через audited_bulk_create,
+audited_update и audited_delete; во время audited_delete события каскадно
+удаляемых объектов не пишутся по одному, а сводятся в счётчики по моделям.
+"""
+import atexit
+import contextvars
+import json
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from users_app.models import AuditEvent
+from utils.lifespan import on_shutdown, on_startup
+from utils.logger_config import get_database_logger
+
+# Внутри audited_delete события отдельных объектов не записываются
+_suppressed = contextvars.ContextVar('audit_suppressed', default=False)
+
+
+class DatabaseSink:
+    def write(self, events):
+        AuditEvent.objects.bulk_create([AuditEvent(**event) for event in events], batch_size=1000)
+
+
+class JsonlSink:
+    def __init__(self, path=None):
+        self.path = Path(path or settings.AUDIT_JSONL_PATH)
+        self._lock = threading.Lock()
+
+    def write(self, events):
+        lines = ''.join(
+            json.dumps({**event, 'created_at': event['created_at'].isoformat()}, ensure_ascii=False) + '\n'
+            for event in events
+        )
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as file:
+                file.write(lines)
+
+
+SINKS = {
+    'database': DatabaseSink,
+    'jsonl': JsonlSink,
+}
+
+
+class AuditBuffer:
+    """Буфер событий процесса с пакетной записью в приёмник."""
+
+    def __init__(self, sink=None, size=None, flush_interval=None):
+        self.sink = sink or SINKS[settings.AUDIT_SINK]()
+        self.size = size or settings.AUDIT_BUFFER_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL
+        self._events = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        # Буфер заполнен: поток записывает пакет, не дожидаясь интервала
+        self._full = threading.Event()
+
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+            full = len(self._events) >= self.size
+        if full:
+            self._full.set()
+
+    def start(self):
+        """Запуск фонового потока, записывающего события раз в flush_interval секунд."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-flush', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._full.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                get_database_logger().error(f"Ошибка фоновой записи событий аудита: {e}")
+            finally:
+                # Поток держит своё подключение: закрывается после обрыва или по CONN_MAX_AGE
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return
+        try:
+            self.sink.write(events)
+        except Exception as e:
+            get_database_logger().error(f"Не удалось записать {len(events)} событий аудита: {e}")
+            return
+        # Одна строка в лог на пакет вместо строки на каждое сохранение
+        summary = Counter(f"{event['operation']} {event['model']}" for event in events)
+        get_database_logger().debug(
+            f"Аудит: записано {len(events)} событий ("
+            + ', '.join(f'{name}: {count}' for name, count in sorted(summary.items())) + ')'
+        )
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    """Буфер процесса; при создании запускается поток записи событий."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = AuditBuffer()
+                _buffer.start()
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+@on_startup
+def start_audit_flush():
+    if settings.AUDIT_ENABLED:
+        get_audit_buffer()
+
+
+@on_shutdown
+def flush_audit_events():
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer.flush()
+
+
+def record(operation, model, object_id=None, user_id=None, count=1, details=None, force=False):
+    """
+    Запись события аудита после фиксации текущей транзакции.
+
+    Args:
+        operation: CREATE, UPDATE, DELETE или BULK_* (см. AUDIT_OPERATIONS)
+        model: Класс модели или её название
+        object_id: ID объекта (для одиночных операций)
+        user_id: ID владельца данных
+        count: Количество затронутых объектов
+        details: Дополнительные данные (JSON)
+        force: Записать и внутри audited_delete
+    """
+    if not settings.AUDIT_ENABLED or (_suppressed.get() and not force):
+        return
+    event = {
+        'created_at': timezone.now(),
+        'operation': operation,
+        'model': model if isinstance(model, str) else model.__name__,
+        'object_id': None if object_id is None else str(object_id),
+        'user_id': user_id,
+        'count': count,
+        'details': details,
+    }
+    transaction.on_commit(lambda: get_audit_buffer().add(event))
+
+
+def audited_bulk_create(model, objs, user_id=None, **kwargs):
+    """bulk_create с одним событием BULK_CREATE на вызов."""
+    created = model.objects.bulk_create(objs, **kwargs)
+    if created:
+        record('BULK_CREATE', model, user_id=user_id, count=len(created))
+    return created
+
+
+def audited_update(queryset, user_id=None, **values):
+    """UPDATE по выборке с одним событием BULK_UPDATE."""
+    updated = queryset.update(**values)
+    if updated:
+        record('BULK_UPDATE', queryset.model, user_id=user_id, count=updated,
+               details={'fields': sorted(values)})
+    return updated
+
+
+def object_events_suppressed():
+    return _suppressed.get()
+
+
+@contextmanager
+def suppress_object_events():
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def audited_delete(queryset, user_id=None):
+    """
+    Удаление выборки (с каскадом) с событием BULK_DELETE на каждую модель
+    вместо события на каждый удалённый объект.
+    """
+    with suppress_object_events():
+        total, per_model = queryset.delete()
+    for label, count in per_model.items():
+        if count:
+            record('BULK_DELETE', label.split('.')[-1], user_id=user_id, count=count, force=True)
+    return total, per_model
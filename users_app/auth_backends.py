@@ -0,0 +1,56 @@
+"""
+Бэкенд аутентификации с кешем пользователей.
+
+Для каждой страницы личного кабинета AuthenticationMiddleware загружает
+пользователя сессии отдельным запросом. CachedModelBackend хранит
+загруженных пользователей в LRU кеше процесса с коротким временем жизни
+USER_CACHE_TTL, каждый запрос получает свою копию объекта.
+
+При сохранении или удалении User запись сбрасывается сигналом
+(users_app/signals.py), в том числе при входе (обновление last_login).
+Сброс действует в пределах процесса: в других процессах изменения
+пользователя (смена пароля, блокировка) вступают в силу не позже чем
+через USER_CACHE_TTL секунд.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from users_app.token_cache import MISS, TTLCache
+
+
+class UserCache:
+    def __init__(self, maxsize=None, ttl=None):
+        self.users = TTLCache(maxsize or settings.USER_CACHE_SIZE, ttl or settings.USER_CACHE_TTL)
+
+    def get(self, user_id, load):
+        user = self.users.get(user_id)
+        if user is MISS:
+            user = load(user_id)
+            if user is None:
+                return None
+            self.users.set(user_id, user)
+        return copy.copy(user)
+
+    def invalidate_user(self, user):
+        self.users.delete(user.pk)
+
+    def clear(self):
+        self.users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, загружающий пользователя сессии через user_cache."""
+
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_TTL:
+            return super().get_user(user_id)
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        return user_cache.get(user_id, super().get_user)
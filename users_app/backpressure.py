@@ -0,0 +1,139 @@
+"""
+Защита приёма SMS от перегрузки (backpressure).
+
+Если Telegram не успевает принимать сообщения, очередь доставки растёт,
+а незавершённые webhook запросы копятся в памяти процесса. Приём
+отклоняется с 503 и Retry-After (Novofon повторяет такие запросы), когда:
+- число обрабатываемых процессом webhook запросов достигло
+  BACKPRESSURE_MAX_INFLIGHT;
+- число доставок в очереди (Telegram и HTTP адреса клиентов) достигло
+  BACKPRESSURE_MAX_BACKLOG.
+
+Размер очереди считается запросом к каждой таблице доставок не чаще раза в
+BACKPRESSURE_REFRESH_INTERVAL секунд. Значения доступны на /metrics/.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from users_app.models import Delivery, EndpointDelivery
+from utils.logger_config import get_webhook_logger
+from utils.metrics import registry
+
+inflight_gauge = registry.gauge('webhook_inflight', 'Webhook requests being processed by this worker')
+backlog_gauge = registry.gauge('delivery_backlog', 'Pending Telegram and endpoint deliveries')
+lag_gauge = registry.gauge('delivery_oldest_pending_seconds', 'Age of the oldest pending delivery')
+shed_counter = registry.counter('webhook_shed_total', 'Webhook requests rejected by backpressure')
+
+
+class DeliveryBacklog:
+    """Размер очереди доставки с кешированием на BACKPRESSURE_REFRESH_INTERVAL."""
+
+    def __init__(self):
+        self.pending = 0
+        self.oldest_pending_at = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self):
+        return (self._refreshed_at is None
+                or time.monotonic() - self._refreshed_at >= settings.BACKPRESSURE_REFRESH_INTERVAL)
+
+    @property
+    def lag_seconds(self):
+        if not self.oldest_pending_at:
+            return 0.0
+        return max((timezone.now() - self.oldest_pending_at).total_seconds(), 0.0)
+
+    def refresh(self):
+        # Пока один поток обновляет значение, остальные используют прежнее
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            stats = [
+                model.objects.filter(status='pending').aggregate(pending=Count('pk'), oldest=Min('created_at'))
+                for model in (Delivery, EndpointDelivery)
+            ]
+            oldest = [item['oldest'] for item in stats if item['oldest']]
+            self.pending = sum(item['pending'] for item in stats)
+            self.oldest_pending_at = min(oldest) if oldest else None
+            self._refreshed_at = time.monotonic()
+        except Exception as e:
+            get_webhook_logger().error(f"Не удалось получить размер очереди доставки: {e}")
+        finally:
+            self._lock.release()
+
+    def refresh_if_stale(self):
+        if self.is_stale:
+            self.refresh()
+
+    async def arefresh_if_stale(self):
+        if self.is_stale:
+            await sync_to_async(self.refresh)()
+
+
+backlog = DeliveryBacklog()
+
+
+def _backlog_pending():
+    backlog.refresh_if_stale()
+    return backlog.pending
+
+
+def _backlog_lag():
+    backlog.refresh_if_stale()
+    return round(backlog.lag_seconds, 3)
+
+
+backlog_gauge.set_function(_backlog_pending)
+lag_gauge.set_function(_backlog_lag)
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+def inflight_count():
+    return _inflight
+
+
+@contextmanager
+def track_inflight():
+    """Учёт webhook запроса, обрабатываемого процессом."""
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+    inflight_gauge.inc()
+    try:
+        yield
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+        inflight_gauge.dec()
+
+
+async def check_backpressure():
+    """
+    Проверка перегрузки перед приёмом SMS.
+
+    Returns:
+        0, если SMS можно принять, иначе значение Retry-After в секундах
+    """
+    reason = None
+    if settings.BACKPRESSURE_MAX_INFLIGHT and _inflight >= settings.BACKPRESSURE_MAX_INFLIGHT:
+        reason = f"in-flight {_inflight}"
+    elif settings.BACKPRESSURE_MAX_BACKLOG:
+        await backlog.arefresh_if_stale()
+        if backlog.pending >= settings.BACKPRESSURE_MAX_BACKLOG:
+            reason = f"backlog {backlog.pending}"
+
+    if reason is None:
+        return 0
+    shed_counter.inc()
+    get_webhook_logger().warning(f"Webhook отклонён из-за перегрузки: {reason}")
+    return settings.BACKPRESSURE_RETRY_AFTER
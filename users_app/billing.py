@@ -0,0 +1,261 @@
+"""
+Оплата пересылки SMS с баланса пользователя.
+
+Списание в webhook отдельным UPDATE строки пользователя выстраивало бы
+одновременные SMS одного пользователя в очередь на блокировке этой
+строки. Поэтому Meter копит списания в памяти процесса, а фоновый поток
+раз в BILLING_FLUSH_INTERVAL секунд записывает их одной транзакцией: один
+UPDATE balance = balance - CASE ... на пакет пользователей и записи
+BalanceEntry. Поток запускается при создании Meter процесса (а также
+хуком lifespan startup и планировщиком доставки), запрос webhook только
+увеличивает счётчик в памяти. Журнал баланса только дополняется и меняется в одной
+транзакции с балансом, поэтому сумма журнала пользователя равна его
+балансу; manage.py reconcile_balances проверяет это и записывает
+корректировки для расхождений (например, после правки баланса в БД).
+
+Проверка баланса перед пересылкой обходится без запроса к БД: процесс
+хранит копию баланса (обновляется после сброса и не реже
+BILLING_BALANCE_TTL секунд) и вычитает из неё свои ещё не записанные
+списания. Списания других процессов видны после их сброса, поэтому
+перерасход ограничен списаниями за BILLING_FLUSH_INTERVAL +
+BILLING_BALANCE_TTL секунд. Списания процесса, завершённого без хуков
+остановки (kill -9), теряются.
+"""
+import atexit
+import threading
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from users_app.models import BalanceEntry, User
+from users_app.token_cache import MISS, TTLCache
+from utils.lifespan import on_shutdown, on_startup
+from utils.logger_config import get_database_logger
+from utils.metrics import registry
+
+# Пользователей в одном UPDATE ... CASE
+CHUNK_SIZE = 500
+
+charged_counter = registry.counter('billing_charged_sms_total', 'SMS charged to user balances')
+rejected_counter = registry.counter('billing_rejected_sms_total', 'SMS not forwarded because of a low balance')
+
+
+def apply_charges(counts, price):
+    """
+    Запись списаний одной транзакцией: UPDATE баланса на каждые CHUNK_SIZE
+    пользователей и записи журнала. Удалённые пользователи пропускаются.
+
+    Args:
+        counts: {user_id: количество SMS}
+        price: Стоимость одного SMS
+
+    Returns:
+        {user_id: баланс после списания}
+    """
+    user_ids = list(counts)
+    balances = {}
+    with transaction.atomic():
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            chunk = user_ids[start:start + CHUNK_SIZE]
+            User.objects.filter(pk__in=chunk).update(balance=F('balance') - Case(
+                *[When(pk=user_id, then=Value(counts[user_id] * price)) for user_id in chunk],
+                default=Value(0), output_field=IntegerField(),
+            ))
+            # Строки заблокированы UPDATE до конца транзакции: балансы уже с учётом списания
+            balances.update(User.objects.filter(pk__in=chunk).values_list('pk', 'balance'))
+        BalanceEntry.objects.bulk_create([
+            BalanceEntry(user_id=user_id, kind='charge', amount=-counts[user_id] * price, sms_count=counts[user_id])
+            for user_id in user_ids if user_id in balances
+        ], batch_size=CHUNK_SIZE)
+    return balances
+
+
+def credit(user_ids, amount, kind='topup'):
+    """
+    Пополнение (или списание при amount < 0) балансов с записью в журнал.
+
+    Returns:
+        Количество изменённых балансов
+    """
+    with transaction.atomic():
+        user_ids = list(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        User.objects.filter(pk__in=user_ids).update(balance=F('balance') + amount)
+        BalanceEntry.objects.bulk_create(
+            [BalanceEntry(user_id=user_id, kind=kind, amount=amount) for user_id in user_ids],
+            batch_size=CHUNK_SIZE,
+        )
+    # Другие процессы увидят новый баланс не позже чем через BILLING_BALANCE_TTL
+    for user_id in user_ids:
+        invalidate_balance(user_id)
+    get_database_logger().info(f"Баланс изменён на {amount:+d} у {len(user_ids)} пользователей ({kind})")
+    return len(user_ids)
+
+
+def balance_mismatches(user_ids=None, chunk_size=2000):
+    """
+    Пользователи, у которых баланс не равен сумме журнала.
+
+    Yields:
+        (user_id, баланс, сумма журнала)
+    """
+    users = User.objects.order_by('pk')
+    if user_ids:
+        users = users.filter(pk__in=user_ids)
+    last_pk = 0
+    while True:
+        # Баланс и журнал пачки читаются в одной транзакции, чтобы не
+        # разойтись из-за сброса списаний между двумя запросами
+        with transaction.atomic():
+            rows = list(users.filter(pk__gt=last_pk).values_list('pk', 'balance')[:chunk_size])
+            if not rows:
+                return
+            totals = dict(
+                BalanceEntry.objects.filter(user_id__in=[pk for pk, _ in rows])
+                .values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total')
+            )
+        for pk, balance in rows:
+            if balance != totals.get(pk, 0):
+                yield pk, balance, totals.get(pk, 0)
+        last_pk = rows[-1][0]
+
+
+class Meter:
+    """Списания за SMS и копия балансов пользователей в памяти процесса."""
+
+    def __init__(self, price=None, flush_interval=None, balance_ttl=None):
+        self.price = settings.BILLING_PRICE_PER_SMS if price is None else price
+        self.flush_interval = flush_interval or settings.BILLING_FLUSH_INTERVAL
+        self.balances = TTLCache(settings.BILLING_BALANCE_CACHE_SIZE, balance_ttl or settings.BILLING_BALANCE_TTL)
+        # user_id -> количество SMS: ещё не записанные и записываемые сейчас
+        self._pending = Counter()
+        self._flushing = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def load(self, user_id):
+        """Баланс из БД с сохранением в копию процесса."""
+        balance = User.objects.filter(pk=user_id).values_list('balance', flat=True).first() or 0
+        self.balances.set(user_id, balance)
+        return balance
+
+    def covers(self, user_id, balance, count=1):
+        """Хватит ли баланса на count SMS с учётом незаписанных списаний процесса."""
+        with self._lock:
+            unpaid = self._pending[user_id] + self._flushing[user_id]
+        if balance - (unpaid + count) * self.price >= 0:
+            return True
+        rejected_counter.inc(count)
+        return False
+
+    def can_forward(self, user_id, count=1):
+        if not settings.BILLING_ENABLED:
+            return True
+        balance = self.balances.get(user_id)
+        if balance is MISS:
+            balance = self.load(user_id)
+        return self.covers(user_id, balance, count)
+
+    async def acan_forward(self, user_id, count=1):
+        """Асинхронная проверка: при актуальной копии баланса без перехода в поток."""
+        if not settings.BILLING_ENABLED:
+            return True
+        balance = self.balances.get(user_id)
+        if balance is MISS:
+            balance = await sync_to_async(self.load)(user_id)
+        return self.covers(user_id, balance, count)
+
+    def charge(self, user_id, count=1):
+        """Учёт списания в памяти; в БД его запишет фоновый поток (start)."""
+        if not settings.BILLING_ENABLED or not self.price:
+            return
+        charged_counter.inc(count)
+        with self._lock:
+            self._pending[user_id] += count
+
+    def start(self):
+        """Запуск фонового потока, записывающего списания раз в flush_interval секунд."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='billing-flush', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                get_database_logger().error(f"Ошибка фоновой записи списаний: {e}")
+            finally:
+                # Поток держит своё подключение: закрывается после обрыва или по CONN_MAX_AGE
+                close_old_connections()
+
+    def flush(self):
+        """Запись накопленных списаний в БД."""
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            self._flushing.update(counts)
+        if not counts:
+            return
+
+        try:
+            balances = apply_charges(counts, self.price)
+        except Exception as e:
+            get_database_logger().error(f"Не удалось записать списания {len(counts)} пользователей: {e}")
+            # Списания не теряются: они будут записаны при следующем сбросе
+            with self._lock:
+                self._flushing.subtract(counts)
+                self._flushing = +self._flushing
+                self._pending.update(counts)
+            return
+
+        with self._lock:
+            self._flushing.subtract(counts)
+            self._flushing = +self._flushing
+            for user_id, balance in balances.items():
+                self.balances.set(user_id, balance)
+        get_database_logger().debug(
+            f"Списано за {sum(counts.values())} SMS у {len(balances)} пользователей"
+        )
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_meter():
+    """Meter процесса; при создании запускается поток записи списаний."""
+    global _meter
+    if _meter is None:
+        with _meter_lock:
+            if _meter is None:
+                _meter = Meter()
+                _meter.start()
+                atexit.register(_meter.flush)
+    return _meter
+
+
+@on_startup
+def start_billing_flush():
+    get_meter()
+
+
+def invalidate_balance(user_id):
+    """Сброс копии баланса процесса (после пополнения или изменения пользователя)."""
+    if _meter is not None:
+        _meter.balances.delete(user_id)
+
+
+@on_shutdown
+def flush_charges():
+    if _meter is not None:
+        _meter.stop()
+        _meter.flush()
@@ -0,0 +1,256 @@
+"""
+Пул Telegram ботов для пересылки SMS.
+
+Пропускная способность одного бота ограничена Telegram, поэтому пересылка
+может выполняться несколькими ботами: TOKEN_BOT (основной) и
+TELEGRAM_EXTRA_BOT_TOKENS. Каждый чат закреплён за одним ботом
+(TelegramChats.bot_id) — тем, который состоит в чате. Если в чате
+несколько ботов из пула, бот выбирается rendezvous-хешированием: выбор
+стабилен, а при добавлении бота в пул переезжает только часть чатов
+(manage.py rebalance_bots).
+
+Отправки каждого бота и каждого чата проходят через TokenBucket, поэтому
+пул не превышает лимиты Telegram в пределах процесса. Лимиты не общие для
+процессов: в один чат отправляют и веб-воркер, принявший SMS (первая
+попытка), и раздел планировщика, за которым закреплён чат. Поэтому
+TELEGRAM_CHAT_RATE_PER_MINUTE следует задавать с запасом; превышение
+Telegram отклоняет с RetryAfter, и доставка повторяется не раньше
+указанного им времени (delivery.retry_delay).
+"""
+import asyncio
+import hashlib
+import time
+import weakref
+
+from django.conf import settings
+
+from utils.logger_config import get_telegram_logger
+
+
+def bot_id_from_token(token):
+    """ID бота — числовая часть токена до двоеточия."""
+    return token.split(':', 1)[0]
+
+
+def rendezvous_choice(chat_id, bot_ids):
+    """
+    Стабильный выбор бота для чата (highest random weight).
+
+    Returns:
+        ID выбранного бота или None, если список пуст
+    """
+    def weight(bot_id):
+        digest = hashlib.md5(f'{bot_id}:{chat_id}'.encode()).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+    return max(bot_ids, key=weight, default=None)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты отправок с приоритетами.
+
+    Ожидающие отправки обслуживаются по возрастанию приоритета (0 — самый
+    срочный), при равном приоритете — в порядке очереди. Защита от
+    голодания: ожидание дольше starvation_seconds поднимает отправку до
+    наивысшего приоритета.
+
+    Не использует примитивы asyncio, поэтому один экземпляр можно
+    разделять между несколькими циклами событий процесса.
+    """
+
+    # Минимальный интервал повторной проверки очереди ожидания
+    MIN_POLL_INTERVAL = 0.01
+
+    def __init__(self, rate, capacity=None, starvation_seconds=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.starvation_seconds = starvation_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._waiters = []
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _try_take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def _next_waiter(self, now):
+        def key(waiter):
+            priority, enqueued_at = waiter
+            if self.starvation_seconds is not None and now - enqueued_at >= self.starvation_seconds:
+                priority = 0
+            return priority, enqueued_at
+
+        return min(self._waiters, key=key)
+
+    @property
+    def is_idle(self):
+        self._refill()
+        return not self._waiters and self.tokens >= self.capacity
+
+    async def acquire(self, priority=0, timeout=None):
+        """
+        Ожидание разрешения на отправку.
+
+        Args:
+            priority: Приоритет отправки, меньше — срочнее
+            timeout: Максимальное время ожидания в секундах
+
+        Returns:
+            True, если разрешение получено, False по истечении timeout
+        """
+        if not self._waiters and self._try_take():
+            return True
+
+        waiter = [priority, time.monotonic()]
+        self._waiters.append(waiter)
+        try:
+            while True:
+                now = time.monotonic()
+                if self._next_waiter(now) is waiter and self._try_take():
+                    return True
+                delay = max((1 - self.tokens) / self.rate, self.MIN_POLL_INTERVAL)
+                if timeout is not None:
+                    remaining = waiter[1] + timeout - now
+                    if remaining <= 0:
+                        return False
+                    delay = min(delay, remaining)
+                await asyncio.sleep(delay)
+        finally:
+            self._waiters.remove(waiter)
+
+
+class BotPool:
+    """Набор ботов с лимитами частоты отправок."""
+
+    # Количество лимитов чатов, после которого простаивающие лимиты удаляются
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, tokens, bot_rate=None, chat_rate_per_minute=None):
+        if not tokens:
+            raise ValueError('Не задан ни один токен Telegram бота (TOKEN_BOT)')
+        self._tokens = {}
+        for token in tokens:
+            self._tokens.setdefault(bot_id_from_token(token), token)
+        self.primary_id = bot_id_from_token(tokens[0])
+
+        bot_rate = bot_rate or settings.TELEGRAM_BOT_RATE_PER_SECOND
+        self._chat_rate = (chat_rate_per_minute or settings.TELEGRAM_CHAT_RATE_PER_MINUTE) / 60
+        self._starvation_seconds = settings.DELIVERY_STARVATION_SECONDS
+        self._bot_buckets = {
+            bot_id: TokenBucket(bot_rate, starvation_seconds=self._starvation_seconds)
+            for bot_id in self._tokens
+        }
+        self._chat_buckets = {}
+        # Экземпляры Bot привязаны к циклу событий через HTTP клиент
+        self._bots = weakref.WeakKeyDictionary()
+
+    @property
+    def bot_ids(self):
+        return list(self._tokens)
+
+    @property
+    def tokens(self):
+        return list(self._tokens.values())
+
+    def resolve_bot_id(self, chat):
+        """ID бота, обслуживающего чат; для незакреплённых чатов — основной бот."""
+        if chat.bot_id and chat.bot_id in self._tokens:
+            return chat.bot_id
+        return self.primary_id
+
+    def get_bot(self, bot_id=None):
+        """Экземпляр Bot для текущего цикла событий."""
+        bot_id = bot_id or self.primary_id
+        loop = asyncio.get_running_loop()
+        bots = self._bots.setdefault(loop, {})
+        if bot_id not in bots:
+            # Импорт telegram (вместе с httpx) занимает заметную часть запуска
+            # процесса, поэтому откладывается до первой отправки
+            from telegram import Bot
+            bots[bot_id] = Bot(self._tokens[bot_id])
+        return bots[bot_id]
+
+    def bot_for_chat(self, chat):
+        return self.get_bot(self.resolve_bot_id(chat))
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(
+                self._chat_rate, capacity=3, starvation_seconds=self._starvation_seconds
+            )
+        return bucket
+
+    async def acquire(self, chat, priority=0, timeout=None):
+        """
+        Ожидание лимитов чата и бота перед отправкой.
+
+        Args:
+            chat: TelegramChats получателя
+            priority: Приоритет отправки (очередь из users_app/classifier.py)
+            timeout: Максимальное время ожидания обоих лимитов в секундах
+
+        Returns:
+            Bot, через который следует отправить сообщение, или None,
+            если лимиты не освободились за timeout
+        """
+        started = time.monotonic()
+        bot_id = self.resolve_bot_id(chat)
+        if not await self._chat_bucket(chat.chat_id).acquire(priority, timeout):
+            return None
+        if timeout is not None:
+            timeout = max(timeout - (time.monotonic() - started), 0)
+        # Разрешение чата при отказе не возвращается: лимит чата только строже
+        if not await self._bot_buckets[bot_id].acquire(priority, timeout):
+            return None
+        return self.get_bot(bot_id)
+
+    async def member_bot_ids(self, chat_id):
+        """ID ботов пула, состоящих в чате."""
+        members = []
+        for bot_id in self._tokens:
+            bot = self.get_bot(bot_id)
+            await self._bot_buckets[bot_id].acquire()
+            try:
+                member = await bot.get_chat_member(chat_id=chat_id, user_id=int(bot_id))
+            except Exception as e:
+                get_telegram_logger().debug(f"Бот {bot_id} не найден в чате {chat_id}: {e}")
+                continue
+            if member.status not in ('left', 'kicked'):
+                members.append(bot_id)
+        return members
+
+
+_pool = None
+
+
+def configure_bot_pool(bot_rate=None):
+    """
+    Создание пула ботов процесса с лимитом отправок бота bot_rate
+    (по умолчанию TELEGRAM_BOT_RATE_PER_SECOND).
+    """
+    global _pool
+    tokens = [settings.TOKEN_BOT] if settings.TOKEN_BOT else []
+    tokens += settings.TELEGRAM_EXTRA_BOT_TOKENS
+    _pool = BotPool(tokens, bot_rate=bot_rate)
+    return _pool
+
+
+def get_bot_pool():
+    """Пул ботов процесса, создаётся при первом обращении."""
+    if _pool is None:
+        configure_bot_pool()
+    return _pool
@@ -0,0 +1,220 @@
+"""
+Учёт состояния Telegram чатов и автоматическое отключение недоступных чатов.
+
+Если бота удалили из группы или группа стала супергруппой, каждая отправка
+в такой чат заканчивается ошибкой. После TELEGRAM_CHAT_MAX_ERRORS постоянных
+ошибок подряд чат исключается из маршрутизации, а попытки доставки в него
+(пробы) выполняются с экспоненциально растущим интервалом.
+"""
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users_app.bot_pool import get_bot_pool
+from users_app.models import Delivery, Rules, TelegramChats
+from utils.logger_config import get_telegram_logger
+
+# Фрагменты текста BadRequest, означающие, что чат недоступен навсегда
+PERMANENT_BAD_REQUEST_MARKERS = (
+    'chat not found',
+    'chat_write_forbidden',
+    'have no rights to send',
+    'not enough rights',
+    'need administrator rights',
+)
+
+
+def is_permanent_error(exc):
+    """Является ли ошибка Telegram постоянной (повтор не поможет)."""
+    from telegram.error import BadRequest, Forbidden
+    if isinstance(exc, Forbidden):
+        return True
+    if isinstance(exc, BadRequest):
+        message = str(exc).lower()
+        return any(marker in message for marker in PERMANENT_BAD_REQUEST_MARKERS)
+    return False
+
+
+def probe_delay(error_count):
+    """Интервал до следующей пробы: удваивается с каждой ошибкой сверх порога."""
+    exponent = max(0, error_count - settings.TELEGRAM_CHAT_MAX_ERRORS)
+    delay = settings.TELEGRAM_CHAT_PROBE_BASE_DELAY * (2 ** min(exponent, 32))
+    return timedelta(seconds=min(delay, settings.TELEGRAM_CHAT_PROBE_MAX_DELAY))
+
+
+def routable_q(prefix=''):
+    """
+    Условие для выборки чатов, в которые можно отправлять сообщения:
+    активные чаты и отключенные чаты, для которых подошло время пробы.
+
+    Args:
+        prefix: Префикс пути до модели TelegramChats (например, 'to_whom__')
+    """
+    return (
+        Q(**{f'{prefix}is_suspended': False})
+        | Q(**{f'{prefix}next_probe_at__lte': timezone.now()})
+    )
+
+
+def claim_probe(chat):
+    """
+    Захват пробы отключенного чата.
+
+    Переносит время следующей пробы вперёд одним UPDATE, поэтому при
+    параллельных запросах пробу выполняет только один из них.
+    Для активного чата всегда возвращает True.
+    """
+    if not chat.is_suspended:
+        return True
+    now = timezone.now()
+    next_probe_at = now + probe_delay(chat.error_count + 1)
+    claimed = TelegramChats.objects.filter(
+        pk=chat.pk, is_suspended=True, next_probe_at__lte=now
+    ).update(next_probe_at=next_probe_at)
+    if claimed:
+        chat.next_probe_at = next_probe_at
+    return bool(claimed)
+
+
+def record_success(chat):
+    """
+    Сброс счётчика ошибок после успешной отправки.
+
+    Returns:
+        True, если чат был отключен и теперь снова активен
+    """
+    if not chat.is_suspended and not chat.error_count:
+        return False
+    was_suspended = chat.is_suspended
+    TelegramChats.objects.filter(pk=chat.pk).update(
+        is_suspended=False, error_count=0, last_error=None, next_probe_at=None
+    )
+    chat.is_suspended = False
+    chat.error_count = 0
+    chat.last_error = None
+    chat.next_probe_at = None
+    if was_suspended:
+        get_telegram_logger().info(f"Чат '{chat.title}' ({chat.chat_id}) снова доступен, пересылка возобновлена")
+    return was_suspended
+
+
+def record_failure(chat, exc):
+    """
+    Учёт постоянной ошибки отправки в чат.
+
+    Returns:
+        True, если чат был отключен в результате этой ошибки
+    """
+    with transaction.atomic():
+        locked = TelegramChats.objects.select_for_update().get(pk=chat.pk)
+        locked.error_count += 1
+        locked.last_error = str(exc)[:1000]
+        just_suspended = False
+        if locked.error_count >= settings.TELEGRAM_CHAT_MAX_ERRORS:
+            just_suspended = not locked.is_suspended
+            locked.is_suspended = True
+            locked.next_probe_at = timezone.now() + probe_delay(locked.error_count)
+        locked.save(update_fields=['error_count', 'last_error', 'is_suspended', 'next_probe_at'])
+
+    chat.error_count = locked.error_count
+    chat.last_error = locked.last_error
+    chat.is_suspended = locked.is_suspended
+    chat.next_probe_at = locked.next_probe_at
+
+    if just_suspended:
+        get_telegram_logger().warning(
+            f"Чат '{chat.title}' ({chat.chat_id}) отключен после {chat.error_count} ошибок: {exc}"
+        )
+    return just_suspended
+
+
+def migrate_chat_id(old_chat_id, new_chat_id):
+    """
+    Замена chat_id после преобразования группы в супергруппу.
+
+    Если у пользователя уже есть запись нового чата (бота добавили в
+    супергруппу заново), старая запись объединяется с ней: правила и
+    доставки переносятся, старая запись удаляется — иначе UPDATE нарушил
+    бы уникальность (user, chat_id).
+
+    Returns:
+        Количество обновлённых записей TelegramChats
+    """
+    old_chat_id, new_chat_id = str(old_chat_id), str(new_chat_id)
+    with transaction.atomic():
+        existing = dict(
+            TelegramChats.objects.select_for_update().filter(chat_id=new_chat_id).values_list('user_id', 'pk')
+        )
+        duplicates = list(
+            TelegramChats.objects.select_for_update()
+            .filter(chat_id=old_chat_id, user_id__in=existing).values_list('pk', 'user_id')
+        )
+        for duplicate_pk, user_id in duplicates:
+            Rules.objects.filter(to_whom_id=duplicate_pk).update(to_whom_id=existing[user_id])
+            Delivery.objects.filter(chat_id=duplicate_pk).update(chat_id=existing[user_id])
+        if duplicates:
+            TelegramChats.objects.filter(pk__in=[pk for pk, _ in duplicates]).delete()
+        health = dict(is_suspended=False, error_count=0, last_error=None, next_probe_at=None)
+        TelegramChats.objects.filter(pk__in=[existing[user_id] for _, user_id in duplicates]).update(**health)
+        updated = TelegramChats.objects.filter(chat_id=old_chat_id).update(chat_id=new_chat_id, **health)
+        updated += len(duplicates)
+    if updated:
+        get_telegram_logger().info(f"Чат {old_chat_id} перенесён в {new_chat_id} (записей: {updated})")
+    return updated
+
+
+def _get_owner_telegram_id(chat):
+    return chat.user.telegram_id
+
+
+async def notify_owner_suspended(bot, chat):
+    """Уведомление владельца чата об отключении пересылки."""
+    telegram_id = await sync_to_async(_get_owner_telegram_id)(chat)
+    if not telegram_id:
+        return
+    try:
+        await bot.send_message(
+            chat_id=telegram_id,
+            text=(f"Не удаётся отправить сообщения в чат '{chat.title}': {chat.last_error}\n"
+                  f"Пересылка в этот чат приостановлена. Чтобы возобновить её, "
+                  f"верните бота в чат и отправьте там команду /start.")
+        )
+    except Exception as e:
+        get_telegram_logger().error(f"Не удалось уведомить владельца чата '{chat.title}': {e}")
+
+
+async def send_to_chat(bot, chat, text):
+    """
+    Отправка сообщения в чат с учётом его состояния.
+
+    Переписывает chat_id при ChatMigrated и повторяет отправку, учитывает
+    постоянные ошибки и отключает чат, уведомляя владельца через основного
+    бота пула. Исключение отправки пробрасывается вызывающему коду.
+    """
+    from telegram.error import ChatMigrated
+    try:
+        try:
+            result = await bot.send_message(chat_id=chat.chat_id, text=text)
+        except ChatMigrated as e:
+            await sync_to_async(migrate_chat_id)(chat.chat_id, e.new_chat_id)
+            chat.chat_id = str(e.new_chat_id)
+            # Запись могла быть объединена с уже существующей записью нового чата
+            chat.pk = await TelegramChats.objects.filter(
+                user_id=chat.user_id, chat_id=chat.chat_id
+            ).values_list('pk', flat=True).afirst()
+            chat.is_suspended, chat.error_count = False, 0
+            result = await bot.send_message(chat_id=chat.chat_id, text=text)
+    except Exception as e:
+        if is_permanent_error(e):
+            just_suspended = await sync_to_async(record_failure)(chat, e)
+            if just_suspended:
+                await notify_owner_suspended(get_bot_pool().get_bot(), chat)
+        raise
+
+    if chat.is_suspended or chat.error_count:
+        await sync_to_async(record_success)(chat)
+    return result
@@ -0,0 +1,74 @@
+"""
+Классификация входящих SMS по приоритету доставки.
+
+Одноразовые коды должны доходить до Telegram раньше рекламных рассылок,
+поэтому каждое SMS при приёме относится к одной из очередей (lanes):
+коды подтверждения, транзакционные сообщения и массовые рассылки.
+Регулярные выражения компилируются один раз при импорте модуля.
+"""
+import re
+
+LANE_OTP = 0
+LANE_TRANSACTIONAL = 1
+LANE_BULK = 2
+
+LANES = (
+    (LANE_OTP, 'Код подтверждения'),
+    (LANE_TRANSACTIONAL, 'Транзакционное'),
+    (LANE_BULK, 'Рассылка'),
+)
+
+# Короткий номер отправителя (сервисные коды операторов и банков)
+_SHORT_CODE_SENDER = re.compile(r'^\+?\d{3,6}$')
+
+# Наибольшее расстояние (в символах) между ключевым словом и кодом:
+# «Код: 1234», «1234 — ваш код», но не «Покупка 1200р ... код магазина»
+OTP_KEYWORD_DISTANCE = 40
+
+_OTP_KEYWORDS = re.compile(
+    r'\b(?:код|пароль|подтвержд|одноразов|verif|otp|one[- ]?time|passcode|code)',
+    re.IGNORECASE,
+)
+# Отдельное число из 4-8 цифр (допускаются разделители: 123-456, 12 34)
+_OTP_CODE = re.compile(r'(?<!\d)(?<!\d[.,])\d{2,4}[- ]?\d{2,4}(?!\d)(?![.,]\d)')
+# SMS, состоящее только из кода (короткие номера присылают коды и без пояснений)
+_BARE_OTP_CODE = re.compile(r'^\s*\d{2,4}[- ]?\d{2,4}\s*$')
+
+_BULK_KEYWORDS = re.compile(
+    r'скидк|акци|распродаж|промокод|выгод|предложени|подар|бонус|кэшбэк|кешбэк|'
+    r'sale|promo|discount|offer|\d+\s?%|отписат',
+    re.IGNORECASE,
+)
+
+
+def has_code_near_keyword(text):
+    """Есть ли в тексте код из 4-8 цифр рядом с ключевым словом кода подтверждения."""
+    keywords = [match.span() for match in _OTP_KEYWORDS.finditer(text)]
+    if not keywords:
+        return False
+    for code in _OTP_CODE.finditer(text):
+        for start, end in keywords:
+            if code.start() - end <= OTP_KEYWORD_DISTANCE and start - code.end() <= OTP_KEYWORD_DISTANCE:
+                return True
+    return False
+
+
+def classify_sms(sender, text):
+    """
+    Определение очереди доставки SMS.
+
+    Args:
+        sender: Отправитель SMS (caller_id)
+        text: Текст SMS
+
+    Returns:
+        LANE_OTP, LANE_TRANSACTIONAL или LANE_BULK
+    """
+    text = text or ''
+    if has_code_near_keyword(text):
+        return LANE_OTP
+    if sender and _SHORT_CODE_SENDER.match(sender) and _BARE_OTP_CODE.match(text):
+        return LANE_OTP
+    if _BULK_KEYWORDS.search(text):
+        return LANE_BULK
+    return LANE_TRANSACTIONAL
@@ -0,0 +1,381 @@
+"""
+Журнал доставки SMS в Telegram с повторными попытками.
+
+Каждая пересылка записывается в Delivery до отправки. Временные ошибки
+(сеть, таймауты, 5xx, RetryAfter) переводят доставку в ожидание следующей
+попытки с экспоненциальной задержкой и случайным разбросом; такие доставки
+забирает фоновый планировщик (manage.py run_delivery). После
+DELIVERY_MAX_ATTEMPTS попыток доставка попадает в DeadLetter, откуда её
+можно отправить повторно командой manage.py redrive_dead_letters.
+
+Статус pending вместе с next_attempt_at работает как аренда: пока
+next_attempt_at в будущем, доставку обрабатывает тот, кто её взял. Если
+обработчик завершился посреди отправки, после окончания аренды доставку
+заберёт планировщик. При корректной остановке процесса (utils/lifespan.py)
+незавершённые доставки возвращаются планировщику сразу.
+
+Планировщик можно запустить в нескольких процессах (manage.py run_workers
+--procs N): чаты делятся между ними по остатку от деления ID чата
+(partitioned_deliveries), сообщения одного чата отправляет один процесс.
+Тот же планировщик повторяет доставки на HTTP адреса (users_app/endpoints.py).
+
+Доставки обслуживаются по приоритету очереди (users_app/classifier.py):
+коды подтверждения раньше транзакционных сообщений и рассылок. Доставки,
+ожидающие дольше DELIVERY_STARVATION_SECONDS, обслуживаются как срочные.
+"""
+import asyncio
+import random
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveSmallIntegerField, When
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from users_app.billing import get_meter
+from users_app.bot_pool import get_bot_pool
+from users_app.chat_health import claim_probe, is_permanent_error, routable_q, send_to_chat
+from users_app.classifier import LANE_OTP, LANE_TRANSACTIONAL
+from users_app.latency import record_delivery_latency
+from users_app.models import DeadLetter, Delivery, EndpointDelivery
+from utils.lifespan import on_shutdown
+from utils.logger_config import get_telegram_logger
+
+# Доставки, которые процесс взял в работу и ещё не записал результат
+_held = set()
+
+
+def is_transient_error(exc):
+    """Имеет ли смысл повторить отправку после этой ошибки."""
+    from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+    if isinstance(exc, BadRequest):
+        return False
+    if isinstance(exc, (NetworkError, RetryAfter)):
+        return True
+    if isinstance(exc, TelegramError):
+        return not is_permanent_error(exc)
+    # Ошибки вне Telegram API (например, обрыв соединения в HTTP клиенте)
+    return True
+
+
+def retry_delay(attempts, exc=None):
+    """Задержка перед следующей попыткой: экспонента с разбросом 50-100%."""
+    from telegram.error import RetryAfter
+    delay = settings.DELIVERY_RETRY_BASE_DELAY * (2 ** min(max(attempts - 1, 0), 32))
+    delay = min(delay, settings.DELIVERY_RETRY_MAX_DELAY)
+    delay = random.uniform(delay / 2, delay)
+    if isinstance(exc, RetryAfter):
+        retry_after = exc.retry_after
+        if isinstance(retry_after, timedelta):
+            retry_after = retry_after.total_seconds()
+        delay = max(delay, float(retry_after))
+    return timedelta(seconds=delay)
+
+
+def create_deliveries(user, rules, text, priority=LANE_TRANSACTIONAL,
+                      ingested_at=None, provider_at=None):
+    """
+    Запись доставок по сработавшим правилам до начала отправки.
+
+    Доставки сразу арендуются на DELIVERY_LEASE_SECONDS за текущим
+    обработчиком, который выполняет первую попытку.
+
+    Args:
+        user: Владелец правил
+        rules: Сработавшие правила с загруженными to_whom и from_whom
+        text: Текст сообщения для Telegram
+        priority: Очередь доставки
+        ingested_at: Время приёма webhook
+        provider_at: Время отправки SMS по данным провайдера
+    """
+    matched_at = timezone.now()
+    lease_until = matched_at + timedelta(seconds=settings.DELIVERY_LEASE_SECONDS)
+    deliveries = []
+    with transaction.atomic():
+        for rule in rules:
+            delivery = Delivery.objects.create(
+                user=user,
+                chat=rule.to_whom,
+                text=text,
+                priority=priority,
+                provider=rule.from_whom.name,
+                attempts=1,
+                next_attempt_at=lease_until,
+                provider_at=provider_at,
+                ingested_at=ingested_at or matched_at,
+                matched_at=matched_at,
+            )
+            # Чат уже загружен вместе с правилом
+            delivery.chat = rule.to_whom
+            deliveries.append(delivery)
+    return deliveries
+
+
+def partitioned_deliveries(partition, model=Delivery, field='chat_id'):
+    """
+    Доставки раздела: чаты делятся между процессами
+    по остатку от деления ID чата, поэтому сообщения одного чата
+    отправляет один процесс в порядке очереди.
+
+    Args:
+        partition: (номер раздела, число разделов) или None — все доставки
+        model: Модель доставок (Delivery или EndpointDelivery)
+        field: Поле получателя, по которому делятся доставки
+    """
+    if partition is None:
+        return model.objects.all()
+    index, count = partition
+    return model.objects.alias(partition=Mod(field, count)).filter(partition=index)
+
+
+def claim_due_deliveries(limit=None, partition=None):
+    """
+    Захват доставок, для которых подошло время повторной попытки.
+
+    Строки блокируются с SKIP LOCKED, поэтому несколько планировщиков
+    не возьмут одну и ту же доставку. Первыми берутся доставки срочных
+    очередей и давно ожидающие доставки. Захваченные доставки арендуются
+    на DELIVERY_LEASE_SECONDS, счётчик попыток увеличивается.
+
+    Args:
+        limit: Максимальное количество доставок (по умолчанию DELIVERY_BATCH_SIZE)
+        partition: Раздел чатов планировщика (см. partitioned_deliveries)
+    """
+    limit = limit or settings.DELIVERY_BATCH_SIZE
+    now = timezone.now()
+    starving_since = now - timedelta(seconds=settings.DELIVERY_STARVATION_SECONDS)
+    with transaction.atomic():
+        due = list(
+            partitioned_deliveries(partition).select_for_update(skip_locked=True, of=('self',))
+            .filter(status='pending', next_attempt_at__lte=now)
+            .filter(routable_q('chat__'))
+            .select_related('chat')
+            .order_by(
+                Case(
+                    When(next_attempt_at__lte=starving_since, then=LANE_OTP),
+                    default=F('priority'),
+                    output_field=PositiveSmallIntegerField(),
+                ),
+                'next_attempt_at',
+            )[:limit]
+        )
+        claimed = [delivery for delivery in due if claim_probe(delivery.chat)]
+        if not claimed:
+            return []
+
+        lease_until = now + timedelta(seconds=settings.DELIVERY_LEASE_SECONDS)
+        for delivery in claimed:
+            delivery.attempts += 1
+            delivery.next_attempt_at = lease_until
+        Delivery.objects.bulk_update(claimed, ['attempts', 'next_attempt_at'])
+    return claimed
+
+
+def mark_sent(delivery):
+    """Отметка об успешной доставке и учёт её задержки."""
+    delivery.status = 'sent'
+    delivery.sent_at = timezone.now()
+    delivery.next_attempt_at = None
+    delivery.last_error = None
+    Delivery.objects.filter(pk=delivery.pk).update(
+        status=delivery.status, sent_at=delivery.sent_at, dequeued_at=delivery.dequeued_at,
+        next_attempt_at=None, last_error=None
+    )
+    record_delivery_latency(delivery)
+
+
+def release_delivery(delivery):
+    """Возврат доставки планировщику без учёта попытки."""
+    delivery.attempts = max(delivery.attempts - 1, 0)
+    delivery.next_attempt_at = timezone.now()
+    Delivery.objects.filter(pk=delivery.pk).update(
+        attempts=delivery.attempts, next_attempt_at=delivery.next_attempt_at
+    )
+
+
+@on_shutdown
+def release_held_deliveries():
+    """Возврат планировщику доставок, отправка которых прервана остановкой процесса."""
+    held = list(_held)
+    _held.clear()
+    if held:
+        released = Delivery.objects.filter(pk__in=held, status='pending').update(next_attempt_at=timezone.now())
+        get_telegram_logger().info(f"Остановка: {released} незавершённых доставок переданы планировщику")
+
+
+def mark_failed(delivery, exc):
+    """Учёт неудачной попытки: повтор, постоянная ошибка или DeadLetter."""
+    delivery.last_error = str(exc)[:1000]
+
+    if not is_transient_error(exc):
+        delivery.status = 'failed'
+        delivery.next_attempt_at = None
+        Delivery.objects.filter(pk=delivery.pk).update(
+            status='failed', next_attempt_at=None, last_error=delivery.last_error
+        )
+        return
+
+    if delivery.attempts >= settings.DELIVERY_MAX_ATTEMPTS:
+        delivery.status = 'dead'
+        delivery.next_attempt_at = None
+        with transaction.atomic():
+            Delivery.objects.filter(pk=delivery.pk).update(
+                status='dead', next_attempt_at=None, last_error=delivery.last_error
+            )
+            DeadLetter.objects.create(delivery=delivery, reason=delivery.last_error)
+        get_telegram_logger().error(
+            f"Доставка {delivery.pk} в чат {delivery.chat.chat_id} перемещена в DeadLetter "
+            f"после {delivery.attempts} попыток: {exc}"
+        )
+        return
+
+    delivery.next_attempt_at = timezone.now() + retry_delay(delivery.attempts, exc)
+    Delivery.objects.filter(pk=delivery.pk).update(
+        next_attempt_at=delivery.next_attempt_at, last_error=delivery.last_error
+    )
+
+
+async def attempt_delivery(delivery, pool=None, max_wait=None):
+    """
+    Одна попытка отправки доставки с записью результата в журнал.
+
+    Сообщение отправляется ботом, за которым закреплён чат, после
+    ожидания лимитов частоты этого бота и чата с приоритетом доставки.
+
+    Args:
+        delivery: Delivery с загруженным чатом
+        pool: Пул ботов (по умолчанию — пул процесса)
+        max_wait: Максимальное ожидание лимитов чата и бота; если они не
+            освободились, доставка возвращается планировщику
+
+    Returns:
+        True, если сообщение доставлено
+    """
+    pool = pool or get_bot_pool()
+    # Запись снимается только после сохранения результата: если отправку
+    # прервёт остановка процесса, доставка вернётся планировщику
+    _held.add(delivery.pk)
+    try:
+        bot = await pool.acquire(delivery.chat, delivery.priority, timeout=max_wait)
+        if bot is None:
+            await sync_to_async(release_delivery)(delivery)
+            _held.discard(delivery.pk)
+            get_telegram_logger().info(
+                f"Доставка {delivery.pk} в чат '{delivery.chat.title}' передана планировщику: лимит отправок исчерпан"
+            )
+            return False
+        delivery.dequeued_at = timezone.now()
+        await send_to_chat(bot, delivery.chat, delivery.text)
+    except Exception as e:
+        get_telegram_logger().warning(
+            f"Попытка {delivery.attempts} доставки {delivery.pk} в чат '{delivery.chat.title}' не удалась: {e}"
+        )
+        await sync_to_async(mark_failed)(delivery, e)
+        _held.discard(delivery.pk)
+        return False
+
+    await sync_to_async(mark_sent)(delivery)
+    _held.discard(delivery.pk)
+    return True
+
+
+def redrive_dead_letters(queryset, batch_size=500):
+    """
+    Возврат доставок в Telegram и на HTTP адреса из DeadLetter в очередь пакетами.
+
+    Args:
+        queryset: Выборка DeadLetter для повторной отправки
+        batch_size: Размер пакета
+
+    Returns:
+        Количество возвращённых в очередь доставок
+    """
+    total = 0
+    while True:
+        letters = list(queryset.values_list('pk', 'delivery_id', 'endpoint_delivery_id')[:batch_size])
+        if not letters:
+            return total
+        with transaction.atomic():
+            for model, ids in ((Delivery, [delivery_id for _, delivery_id, _ in letters if delivery_id]),
+                               (EndpointDelivery, [delivery_id for _, _, delivery_id in letters if delivery_id])):
+                if ids:
+                    model.objects.filter(pk__in=ids).update(
+                        status='pending', attempts=0, next_attempt_at=timezone.now(), last_error=None
+                    )
+            DeadLetter.objects.filter(pk__in=[pk for pk, _, _ in letters]).delete()
+        total += len(letters)
+
+
+async def deliver_batch(deliveries, pool=None, deadline=None):
+    """
+    Отправка пакета доставок: чаты обслуживаются параллельно,
+    сообщения одного чата — последовательно в порядке захвата.
+
+    Args:
+        deliveries: Захваченные доставки
+        pool: Пул ботов (по умолчанию — пул процесса)
+        deadline: Момент time.monotonic(), после которого доставки не ждут
+            лимитов и остаются планировщику (общий срок для всего пакета)
+
+    Returns:
+        Количество доставленных сообщений
+    """
+    async def deliver_chat(chat_deliveries):
+        sent = 0
+        for delivery in chat_deliveries:
+            max_wait = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if await attempt_delivery(delivery, pool, max_wait=max_wait):
+                sent += 1
+        return sent
+
+    ordered = sorted(deliveries, key=lambda delivery: delivery.chat_id)
+    results = await asyncio.gather(*(
+        deliver_chat(list(chat_deliveries))
+        for _, chat_deliveries in groupby(ordered, key=lambda delivery: delivery.chat_id)
+    ))
+    return sum(results)
+
+
+async def _idle(seconds, stop_event=None):
+    """Пауза, прерываемая установкой stop_event."""
+    if stop_event is None:
+        await asyncio.sleep(seconds)
+        return
+    try:
+        await asyncio.wait_for(stop_event.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_delivery_scheduler(poll_interval=None, stop_event=None, partition=None):
+    """
+    Цикл фонового планировщика повторных попыток.
+
+    Args:
+        poll_interval: Пауза между опросами очереди, когда она пуста
+        stop_event: asyncio.Event для остановки цикла
+        partition: Раздел чатов, доставки которых обслуживает планировщик (см. partitioned_deliveries)
+    """
+    poll_interval = poll_interval or settings.DELIVERY_POLL_INTERVAL
+    pool = get_bot_pool()
+    suffix = f" (раздел {partition[0] + 1} из {partition[1]})" if partition else ""
+    get_telegram_logger().info(f"Планировщик повторной доставки запущен{suffix}")
+
+    # Импорт здесь: модуль доставки на HTTP адреса сам импортирует этот модуль
+    from users_app.endpoints import claim_due_endpoint_deliveries, deliver_endpoint_batch
+
+    # Поток записи списаний (users_app/billing.py) работает и в процессах планировщика
+    get_meter()
+
+    while not (stop_event and stop_event.is_set()):
+        deliveries = await sync_to_async(claim_due_deliveries)(partition=partition)
+        endpoint_deliveries = await sync_to_async(claim_due_endpoint_deliveries)(partition=partition)
+        await asyncio.gather(deliver_batch(deliveries, pool), deliver_endpoint_batch(endpoint_deliveries))
+        if not deliveries and not endpoint_deliveries:
+            await _idle(poll_interval, stop_event)
+
+    get_telegram_logger().info(f"Планировщик повторной доставки остановлен{suffix}")
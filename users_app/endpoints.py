@@ -0,0 +1,506 @@
+"""
+Пересылка SMS на HTTP адреса клиентов (HttpEndpoint).
+
+Как и доставки в Telegram (users_app/delivery.py), каждая пересылка
+записывается в EndpointDelivery до отправки, повторные попытки выполняет
+тот же планировщик (manage.py run_delivery или run_workers) с
+экспоненциальной задержкой, после DELIVERY_MAX_ATTEMPTS попыток доставка
+получает статус dead и попадает в DeadLetter (manage.py redrive_dead_letters).
+
+Запрос — POST с телом {"messages": [{"id": ..., "from": ..., "to": ...,
+"text": ..., "provider": ..., "received_at": ...}]} и заголовками:
+- X-Sms-Timestamp: unix-время отправки;
+- X-Sms-Signature: sha256=<HMAC-SHA256 секрета от "<timestamp>.<тело>">;
+- Idempotency-Key: одинаковый при повторе того же набора сообщений
+  (при повторе сообщения могут попасть в другой пакет, поэтому получателю
+  следует отбрасывать дубли по id сообщения).
+Ответ 2xx подтверждает все сообщения запроса; 408, 425, 429 (с учётом
+Retry-After), 5xx, ошибки сети и таймауты — повтор; прочие ответы —
+ошибка без повтора.
+
+Если адрес принимает несколько SMS в одном запросе (batch_size > 1),
+webhook только ставит сообщение в очередь, и планировщик отправляет
+накопившиеся сообщения адреса пакетами по порядку; иначе первая попытка
+выполняется сразу при обработке webhook, параллельно с отправкой в
+Telegram и в пределах того же срока DELIVERY_INLINE_MAX_WAIT.
+
+Запросы выполняет общий для процесса httpx.AsyncClient с пулом
+соединений ENDPOINT_MAX_CONNECTIONS; одновременных запросов к одному
+хосту не больше ENDPOINT_HOST_CONCURRENCY. Если хост занят дольше
+отведённого попытке времени или запрос прерван по сроку webhook,
+доставка возвращается планировщику без учёта попытки (EndpointDeferred).
+
+Перед запросом хост разрешается в IP, и если среди адресов есть
+непубличный (utils/network.py), доставка завершается ошибкой без повтора.
+Запрос выполняется на проверенный IP (с исходными Host и SNI), чтобы
+DNS запись не могла измениться между проверкой и подключением.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import socket
+import time
+import weakref
+from datetime import timedelta
+from itertools import groupby
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users_app.classifier import LANE_TRANSACTIONAL
+from users_app.delivery import partitioned_deliveries, retry_delay
+from users_app.latency import record_delivery_latency
+from users_app.models import DeadLetter, EndpointDelivery
+from utils.lifespan import on_shutdown
+from utils.logger_config import get_webhook_logger
+from utils.network import check_public_addresses, literal_address
+
+# Ответы, после которых запрос имеет смысл повторить (кроме 5xx)
+RETRY_STATUSES = (408, 425, 429)
+
+# Время (в секундах), на которое запоминается проверенный IP хоста
+RESOLVE_CACHE_SECONDS = 60
+
+# Доставки, которые процесс взял в работу и ещё не записал результат
+_held = set()
+
+
+class EndpointError(Exception):
+    """Неудачная отправка на HTTP адрес."""
+
+    def __init__(self, message, transient=True, retry_after=None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+
+class EndpointDeferred(EndpointError):
+    """Попытка не уложилась в отведённое время и не засчитывается: доставку отправит планировщик."""
+
+
+def parse_retry_after(value):
+    """Значение Retry-After в секундах (формат даты не поддерживается)."""
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def sign_payload(secret, timestamp, body):
+    """Подпись тела запроса: HMAC-SHA256 от "<timestamp>.<body>"."""
+    return hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+
+
+def build_message(caller_id, caller_did, text, received_at=None):
+    """Сообщение о SMS для тела запроса (id и provider добавляются для каждой доставки)."""
+    return {
+        'from': caller_id,
+        'to': caller_did,
+        'text': text,
+        'received_at': received_at.isoformat() if received_at else None,
+    }
+
+
+class EndpointClient:
+    """Общий HTTP клиент процесса с ограничением одновременных запросов к хосту."""
+
+    def __init__(self, host_concurrency=None):
+        self._host_concurrency = host_concurrency or settings.ENDPOINT_HOST_CONCURRENCY
+        # Клиент и семафоры привязаны к циклу событий
+        self._clients = weakref.WeakKeyDictionary()
+        self._host_limits = weakref.WeakKeyDictionary()
+        # (хост, порт) -> (проверенный IP, time.monotonic() окончания срока)
+        self._addresses = {}
+
+    def client(self):
+        # httpx загружается при первой отправке, как и telegram (users_app/bot_pool.py)
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.ENDPOINT_TIMEOUT, connect=settings.ENDPOINT_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.ENDPOINT_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ENDPOINT_MAX_CONNECTIONS,
+                ),
+                follow_redirects=False,
+            )
+        return client
+
+    def host_limit(self, url):
+        limits = self._host_limits.setdefault(asyncio.get_running_loop(), {})
+        host = urlsplit(url).netloc
+        if host not in limits:
+            limits[host] = asyncio.Semaphore(self._host_concurrency)
+        return limits[host]
+
+    async def resolve(self, host, port):
+        """
+        Публичный IP хоста для подключения.
+
+        Raises:
+            EndpointError: хост не разрешается (с повтором) или указывает
+                на непубличный адрес (без повтора)
+        """
+        address = literal_address(host)
+        if address:
+            addresses = [address]
+        else:
+            cached = self._addresses.get((host, port))
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except (socket.gaierror, UnicodeError) as e:
+                raise EndpointError(f'Не удалось определить IP адрес {host}: {e}') from e
+            addresses = [info[4][0] for info in infos]
+        try:
+            check_public_addresses(host, addresses)
+        except ValueError as e:
+            raise EndpointError(str(e), transient=False) from e
+        self._addresses[(host, port)] = (addresses[0], time.monotonic() + RESOLVE_CACHE_SECONDS)
+        return addresses[0]
+
+    async def post(self, url, body, headers, timeout=None):
+        """
+        POST запрос на адрес клиента.
+
+        Args:
+            url: Адрес
+            body: Тело запроса
+            headers: Заголовки
+            timeout: Время на ожидание хоста и запрос в секундах
+                (по умолчанию ожидание хоста не дольше ENDPOINT_TIMEOUT,
+                запрос — ENDPOINT_TIMEOUT)
+
+        Raises:
+            EndpointDeferred: хост занят или запрос прерван по timeout
+            EndpointError: ответ не 2xx, ошибка сети, таймаут или
+                недопустимый адрес
+        """
+        import httpx
+
+        parts = urlsplit(url)
+        if parts.scheme != 'https' and not settings.ENDPOINT_ALLOW_PRIVATE_ADDRESSES:
+            raise EndpointError(f'Адрес {parts.netloc} не использует https', transient=False)
+        started = time.monotonic()
+        limit = self.host_limit(url)
+        # Свободный семафор занимается без ожидания (wait_for с нулевым
+        # временем отменил бы и его)
+        if limit.locked():
+            try:
+                await asyncio.wait_for(limit.acquire(), settings.ENDPOINT_TIMEOUT if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                raise EndpointDeferred(f'Хост {urlsplit(url).netloc} занят')
+        else:
+            await limit.acquire()
+        try:
+            request_timeout = settings.ENDPOINT_TIMEOUT
+            if timeout is not None:
+                request_timeout = min(request_timeout, timeout - (time.monotonic() - started))
+                if request_timeout <= 0:
+                    raise EndpointDeferred('Время на попытку истекло')
+            try:
+                address = await asyncio.wait_for(
+                    self.resolve(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)),
+                    request_timeout,
+                )
+            except asyncio.TimeoutError:
+                message = f'Не удалось определить IP адрес {parts.hostname} за отведённое время'
+                if request_timeout < settings.ENDPOINT_TIMEOUT:
+                    raise EndpointDeferred(message)
+                raise EndpointError(message)
+            try:
+                # Подключение к проверенному IP; Host и SNI — исходного хоста
+                response = await self.client().post(
+                    httpx.URL(url).copy_with(host=address),
+                    content=body, headers={**headers, 'Host': parts.netloc.rpartition('@')[2]},
+                    extensions={'sni_hostname': parts.hostname},
+                    timeout=httpx.Timeout(
+                        request_timeout, connect=min(settings.ENDPOINT_CONNECT_TIMEOUT, request_timeout)
+                    ),
+                )
+            except httpx.TimeoutException as e:
+                if request_timeout < settings.ENDPOINT_TIMEOUT:
+                    # Запрос мог дойти до адреса: повтор отправит тот же Idempotency-Key
+                    raise EndpointDeferred(f'{type(e).__name__}: {e}') from e
+                raise EndpointError(f'{type(e).__name__}: {e}') from e
+            except httpx.HTTPError as e:
+                raise EndpointError(f'{type(e).__name__}: {e}') from e
+        finally:
+            limit.release()
+        if response.is_success:
+            return response
+        if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+            raise EndpointError(
+                f'HTTP {response.status_code}', retry_after=parse_retry_after(response.headers.get('Retry-After'))
+            )
+        raise EndpointError(f'HTTP {response.status_code}', transient=False)
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_client = None
+
+
+def get_endpoint_client():
+    """HTTP клиент процесса, создаётся при первом обращении."""
+    global _client
+    if _client is None:
+        _client = EndpointClient()
+    return _client
+
+
+def create_endpoint_deliveries(user, rules, message, priority=LANE_TRANSACTIONAL,
+                               ingested_at=None, provider_at=None):
+    """
+    Запись доставок на HTTP адреса по сработавшим правилам до начала отправки.
+
+    Доставки на адреса без пакетной отправки сразу арендуются за текущим
+    обработчиком (attempts=1), остальные ждут планировщика.
+
+    Args:
+        user: Владелец правил
+        rules: Сработавшие правила с загруженными to_endpoint и from_whom
+        message: Сообщение (build_message)
+        priority: Очередь доставки
+        ingested_at: Время приёма webhook
+        provider_at: Время отправки SMS по данным провайдера
+    """
+    matched_at = timezone.now()
+    lease_until = matched_at + timedelta(seconds=settings.DELIVERY_LEASE_SECONDS)
+    deliveries = []
+    with transaction.atomic():
+        for rule in rules:
+            immediate = rule.to_endpoint.batch_size <= 1
+            delivery = EndpointDelivery.objects.create(
+                user=user,
+                endpoint=rule.to_endpoint,
+                payload={**message, 'provider': rule.from_whom.name},
+                priority=priority,
+                provider=rule.from_whom.name,
+                attempts=1 if immediate else 0,
+                next_attempt_at=lease_until if immediate else matched_at,
+                provider_at=provider_at,
+                ingested_at=ingested_at or matched_at,
+                matched_at=matched_at,
+            )
+            delivery.endpoint = rule.to_endpoint
+            deliveries.append(delivery)
+    return deliveries
+
+
+def claim_due_endpoint_deliveries(limit=None, partition=None):
+    """
+    Захват доставок на HTTP адреса, для которых подошло время попытки
+    (аналог delivery.claim_due_deliveries, разделы — по ID адреса).
+    """
+    limit = limit or settings.DELIVERY_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            partitioned_deliveries(partition, EndpointDelivery, 'endpoint_id')
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(status='pending', next_attempt_at__lte=now, endpoint__is_active=True)
+            .select_related('endpoint')
+            .order_by('priority', 'next_attempt_at', 'id')[:limit]
+        )
+        if not claimed:
+            return []
+
+        lease_until = now + timedelta(seconds=settings.DELIVERY_LEASE_SECONDS)
+        for delivery in claimed:
+            delivery.attempts += 1
+            delivery.next_attempt_at = lease_until
+        EndpointDelivery.objects.bulk_update(claimed, ['attempts', 'next_attempt_at'])
+    return claimed
+
+
+def mark_endpoint_sent(deliveries):
+    """Отметка об успешной доставке пакета одним UPDATE и учёт задержек."""
+    sent_at = timezone.now()
+    for delivery in deliveries:
+        delivery.status = 'sent'
+        delivery.sent_at = sent_at
+        delivery.next_attempt_at = None
+        delivery.last_error = None
+    EndpointDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+        status='sent', sent_at=sent_at, dequeued_at=deliveries[0].dequeued_at, next_attempt_at=None, last_error=None
+    )
+    for delivery in deliveries:
+        record_delivery_latency(delivery)
+
+
+def mark_endpoint_failed(deliveries, exc):
+    """Учёт неудачной попытки пакета: повтор всего пакета, ошибка или DeadLetter."""
+    last_error = str(exc)[:1000]
+    for delivery in deliveries:
+        delivery.last_error = last_error
+
+    if not exc.transient:
+        failed = deliveries
+        retry, dead = [], []
+    else:
+        failed = []
+        dead = [delivery for delivery in deliveries if delivery.attempts >= settings.DELIVERY_MAX_ATTEMPTS]
+        retry = [delivery for delivery in deliveries if delivery.attempts < settings.DELIVERY_MAX_ATTEMPTS]
+
+    for status, group in (('failed', failed), ('dead', dead)):
+        if group:
+            for delivery in group:
+                delivery.status = status
+                delivery.next_attempt_at = None
+            with transaction.atomic():
+                EndpointDelivery.objects.filter(pk__in=[delivery.pk for delivery in group]).update(
+                    status=status, next_attempt_at=None, last_error=last_error
+                )
+                if status == 'dead':
+                    DeadLetter.objects.bulk_create(
+                        [DeadLetter(endpoint_delivery=delivery, reason=last_error) for delivery in group]
+                    )
+    if dead:
+        get_webhook_logger().error(
+            f"{len(dead)} доставок на '{dead[0].endpoint.name}' перемещены в DeadLetter после "
+            f"{settings.DELIVERY_MAX_ATTEMPTS} попыток: {exc}"
+        )
+
+    if retry:
+        # Пакет повторяется целиком, чтобы сообщения адреса шли по порядку
+        delay = retry_delay(max(delivery.attempts for delivery in retry))
+        if exc.retry_after:
+            delay = max(delay, timedelta(seconds=exc.retry_after))
+        next_attempt_at = timezone.now() + delay
+        for delivery in retry:
+            delivery.next_attempt_at = next_attempt_at
+        EndpointDelivery.objects.filter(pk__in=[delivery.pk for delivery in retry]).update(
+            next_attempt_at=next_attempt_at, last_error=last_error
+        )
+
+
+def postpone_endpoint_deliveries(deliveries, until):
+    """Возврат в очередь доставок, к отправке которых процесс не приступал, без учёта попытки."""
+    for delivery in deliveries:
+        delivery.attempts -= 1
+        delivery.next_attempt_at = until
+    EndpointDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+        attempts=F('attempts') - 1, next_attempt_at=until
+    )
+
+
+@on_shutdown
+def release_held_endpoint_deliveries():
+    """Возврат планировщику доставок, отправка которых прервана остановкой процесса."""
+    held = list(_held)
+    _held.clear()
+    if held:
+        released = EndpointDelivery.objects.filter(pk__in=held, status='pending').update(
+            next_attempt_at=timezone.now()
+        )
+        get_webhook_logger().info(f"Остановка: {released} незавершённых доставок на HTTP адреса переданы планировщику")
+
+
+@on_shutdown
+async def close_endpoint_client():
+    if _client is not None:
+        await _client.aclose()
+
+
+async def attempt_endpoint_batch(endpoint, deliveries, client=None, timeout=None):
+    """
+    Одна попытка отправки пакета доставок на адрес с записью результата.
+
+    Args:
+        endpoint: Адрес
+        deliveries: Захваченные доставки адреса
+        client: HTTP клиент (по умолчанию — клиент процесса)
+        timeout: Время на попытку; не уложившиеся в него доставки
+            возвращаются в очередь без учёта попытки
+
+    Returns:
+        True, если адрес подтвердил получение
+    """
+    client = client or get_endpoint_client()
+    ids = [delivery.pk for delivery in deliveries]
+    # Доставки снимаются только после записи результата: если отправку
+    # прервёт остановка процесса, их вернёт планировщику хук остановки
+    _held.update(ids)
+    dequeued_at = timezone.now()
+    for delivery in deliveries:
+        delivery.dequeued_at = dequeued_at
+    body = json.dumps(
+        {'messages': [{'id': delivery.pk, **delivery.payload} for delivery in deliveries]}, ensure_ascii=False
+    ).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Sms-Timestamp': timestamp,
+        'X-Sms-Signature': f'sha256={sign_payload(endpoint.secret, timestamp, body)}',
+        'Idempotency-Key': hashlib.sha256(','.join(map(str, ids)).encode()).hexdigest(),
+    }
+    try:
+        await client.post(endpoint.url, body, headers, timeout=timeout)
+    except EndpointDeferred as e:
+        get_webhook_logger().info(f"{len(deliveries)} SMS на '{endpoint.name}' переданы планировщику: {e}")
+        await sync_to_async(postpone_endpoint_deliveries)(deliveries, timezone.now())
+        _held.difference_update(ids)
+        return False
+    except Exception as e:
+        error = e if isinstance(e, EndpointError) else EndpointError(str(e))
+        get_webhook_logger().warning(
+            f"Попытка отправки {len(deliveries)} SMS на '{endpoint.name}' не удалась: {error}"
+        )
+        await sync_to_async(mark_endpoint_failed)(deliveries, error)
+        _held.difference_update(ids)
+        return False
+    await sync_to_async(mark_endpoint_sent)(deliveries)
+    _held.difference_update(ids)
+    return True
+
+
+async def deliver_endpoint_batch(deliveries, client=None, deadline=None):
+    """
+    Отправка захваченных доставок: адреса обслуживаются параллельно,
+    сообщения одного адреса — пакетами до batch_size по порядку захвата.
+
+    Args:
+        deliveries: Захваченные доставки
+        client: HTTP клиент (по умолчанию — клиент процесса)
+        deadline: Момент time.monotonic(), после которого попытки не
+            выполняются и доставки остаются планировщику
+
+    Returns:
+        Количество доставленных сообщений
+    """
+    async def deliver_endpoint(endpoint_deliveries):
+        endpoint = endpoint_deliveries[0].endpoint
+        size = max(1, min(endpoint.batch_size, settings.ENDPOINT_MAX_BATCH_SIZE))
+        sent = 0
+        for start in range(0, len(endpoint_deliveries), size):
+            batch = endpoint_deliveries[start:start + size]
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if await attempt_endpoint_batch(endpoint, batch, client, timeout=timeout):
+                sent += len(batch)
+            elif batch[0].status == 'pending':
+                # Следующие пакеты ждут повтора неудачного, чтобы не нарушить порядок
+                await sync_to_async(postpone_endpoint_deliveries)(
+                    endpoint_deliveries[start + size:], batch[0].next_attempt_at
+                )
+                break
+        return sent
+
+    ordered = sorted(deliveries, key=lambda delivery: delivery.endpoint_id)
+    results = await asyncio.gather(*(
+        deliver_endpoint(list(endpoint_deliveries))
+        for _, endpoint_deliveries in groupby(ordered, key=lambda delivery: delivery.endpoint_id)
+    ))
+    return sum(results)
@@ -3,7 +3,7 @@ import re
 from django import forms
 from django.core.exceptions import ValidationError
 
-from users_app.models import KEY_TYPES, NumbersService, TelegramChats
+from users_app.models import KEY_TYPES, HttpEndpoint, NumbersService, TelegramChats
 
 
 class ServiceForm(forms.Form):
@@ -16,11 +16,19 @@ class ServiceForm(forms.Form):
         empty_label='Выберите телефон'
     )
 
-    # Это поле будет содержать канал Telegram, выбранный пользователем
+    # Получатель: канал Telegram или HTTP адрес пользователя (одно из двух)
     telegram_chat = forms.ModelChoiceField(
         queryset=TelegramChats.objects.none(),
         label='Канал Telegram',
-        empty_label='Выберите канал Telegram'
+        empty_label='Выберите канал Telegram',
+        required=False
+    )
+
+    endpoint = forms.ModelChoiceField(
+        queryset=HttpEndpoint.objects.none(),
+        label='HTTP адрес',
+        empty_label='Выберите HTTP адрес',
+        required=False
     )
 
     any_sender = forms.BooleanField(required=False, label="Любой отправитель")
@@ -33,6 +41,13 @@ class ServiceForm(forms.Form):
             # Ограничиваем выборы только данными для конкретного пользователя
             self.fields['telephone'].queryset = NumbersService.objects.filter(user=user)
             self.fields['telegram_chat'].queryset = TelegramChats.objects.filter(user=user)
+            self.fields['endpoint'].queryset = HttpEndpoint.objects.filter(user=user)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if bool(cleaned_data.get('telegram_chat')) == bool(cleaned_data.get('endpoint')):
+            raise ValidationError('Выберите канал Telegram или HTTP адрес.')
+        return cleaned_data
 
 
 class ServiceKeyForm(forms.Form):
@@ -0,0 +1,60 @@
+"""
+Кеш фрагментов страниц настроек: списков правил, ключей и номеров.
+
+Списки кешируются тегом {% cache %} в кеше FRAGMENT_CACHE_ALIAS, в ключ
+фрагмента входит версия раздела пользователя (fragment_version). При
+сохранении или удалении Rules, Key, NumbersService, TelegramChats и
+HttpEndpoint сигналы (users_app/signals.py) после фиксации транзакции
+меняют версию, и следующий запрос рендерит список заново; старые
+фрагменты вытесняются по истечении FRAGMENT_CACHE_TIMEOUT.
+
+Кеш должен быть общим для процессов (файловый или сетевой): каналы,
+например, добавляет процесс Telegram бота.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Разделы страниц и модели, от которых зависит их содержимое
+# (в списке правил выводятся телефон и название канала или HTTP адреса)
+SECTIONS = {
+    'rules': ('Rules', 'NumbersService', 'TelegramChats', 'HttpEndpoint'),
+    'services': ('Key', 'NumbersService'),
+}
+
+
+def _cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _version_key(section, user_id):
+    return f'fragment_version:{section}:{user_id}'
+
+
+def sections_for(model_name):
+    return [section for section, models in SECTIONS.items() if model_name in models]
+
+
+def fragment_version(section, user_id):
+    """Текущая версия раздела пользователя для ключа {% cache %}."""
+    key = _version_key(section, user_id)
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, uuid.uuid4().hex, timeout=None)
+        version = _cache().get(key)
+    return version
+
+
+def invalidate_fragments(user_ids, sections=None):
+    """Смена версий разделов пользователей после фиксации транзакции."""
+    keys = [
+        _version_key(section, user_id)
+        for user_id in user_ids if user_id is not None
+        for section in (sections or SECTIONS)
+    ]
+    if keys:
+        transaction.on_commit(
+            lambda: _cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        )
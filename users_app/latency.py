@@ -0,0 +1,197 @@
+"""
+Учёт задержки доставки SMS от провайдера до Telegram.
+
+Для каждой доставки сохраняются отметки времени: время провайдера (если
+передано), приём webhook, совпадение правила, выход из очереди и
+подтверждение Telegram. При подтверждении задержки этапов добавляются в
+компактные гистограммы по пользователю и по провайдеру, которые
+периодически сбрасываются в LatencyStats (одна строка на час, область,
+ключ и этап).
+
+Гистограмма логарифмическая: каждая корзина шире предыдущей на ~19%
+(4 корзины на удвоение), поэтому перцентили считаются с относительной
+погрешностью не более 10% при нескольких десятках корзин на строку.
+"""
+import atexit
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from utils.lifespan import on_shutdown
+from utils.logger_config import get_database_logger
+
+# Этапы доставки: (название, начальная отметка, конечная отметка)
+STAGES = (
+    ('ingest', 'ingested_at', 'matched_at'),
+    ('queue', 'matched_at', 'dequeued_at'),
+    ('send', 'dequeued_at', 'sent_at'),
+    ('total', 'ingested_at', 'sent_at'),
+    ('provider', 'provider_at', 'sent_at'),
+)
+
+# Ключи, в которых провайдер может передать время отправки SMS
+PROVIDER_TIME_KEYS = ('timestamp', 'time', 'date', 'created_at', 'sent_at')
+
+
+class LatencyHistogram:
+    """Логарифмическая гистограмма задержек в миллисекундах."""
+
+    BUCKETS_PER_DOUBLING = 4
+
+    def __init__(self, buckets=None, count=0, total_ms=0.0):
+        self.buckets = defaultdict(int, {int(key): value for key, value in (buckets or {}).items()})
+        self.count = count
+        self.total_ms = total_ms
+
+    @classmethod
+    def bucket_index(cls, value_ms):
+        if value_ms < 1:
+            return 0
+        return int(math.log2(value_ms) * cls.BUCKETS_PER_DOUBLING) + 1
+
+    @classmethod
+    def bucket_upper_bound(cls, index):
+        if index == 0:
+            return 1.0
+        return 2 ** (index / cls.BUCKETS_PER_DOUBLING)
+
+    def add(self, value_ms):
+        self.buckets[self.bucket_index(value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+
+    def merge(self, other):
+        for index, value in other.buckets.items():
+            self.buckets[index] += value
+        self.count += other.count
+        self.total_ms += other.total_ms
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-й перцентиль (0-100)."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.bucket_upper_bound(index)
+        return self.bucket_upper_bound(max(self.buckets))
+
+    @property
+    def mean(self):
+        return self.total_ms / self.count if self.count else None
+
+    def to_json(self):
+        return {str(index): value for index, value in sorted(self.buckets.items()) if value}
+
+
+def parse_provider_time(result):
+    """
+    Время отправки SMS провайдером из данных webhook.
+
+    Поддерживает unix-время в секундах или миллисекундах и строки ISO 8601.
+
+    Returns:
+        datetime с часовым поясом или None
+    """
+    for key in PROVIDER_TIME_KEYS:
+        value = result.get(key)
+        if value in (None, ''):
+            continue
+        try:
+            if isinstance(value, str) and not value.replace('.', '', 1).isdigit():
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    continue
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed, dt_timezone.utc)
+                return parsed
+            value = float(value)
+            if value > 1e12:
+                value /= 1000
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            continue
+    return None
+
+
+class LatencyRecorder:
+    """Накопление гистограмм в памяти процесса с периодическим сбросом в БД."""
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval or settings.LATENCY_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(LatencyHistogram)
+        self._last_flush = time.monotonic()
+
+    def record(self, delivery):
+        """Учёт задержек этапов доставленного сообщения."""
+        period = delivery.sent_at.replace(minute=0, second=0, microsecond=0)
+        scopes = [('user', str(delivery.user_id))]
+        if delivery.provider:
+            scopes.append(('provider', delivery.provider))
+
+        with self._lock:
+            for stage, start_field, end_field in STAGES:
+                start, end = getattr(delivery, start_field), getattr(delivery, end_field)
+                if not start or not end:
+                    continue
+                value_ms = max((end - start).total_seconds() * 1000, 0)
+                for scope, key in scopes:
+                    self._histograms[(period, scope, key, stage)].add(value_ms)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Слияние накопленных гистограмм с LatencyStats."""
+        from users_app.models import LatencyStats
+
+        with self._lock:
+            histograms, self._histograms = self._histograms, defaultdict(LatencyHistogram)
+            self._last_flush = time.monotonic()
+        if not histograms:
+            return
+
+        try:
+            with transaction.atomic():
+                for (period, scope, key, stage), histogram in histograms.items():
+                    stats, _ = LatencyStats.objects.select_for_update().get_or_create(
+                        period_start=period, scope=scope, key=key, stage=stage
+                    )
+                    merged = stats.histogram
+                    merged.merge(histogram)
+                    stats.set_histogram(merged)
+                    stats.save()
+        except Exception as e:
+            get_database_logger().error(f"Не удалось сохранить статистику задержек доставки: {e}")
+
+
+_recorder = None
+
+
+def get_latency_recorder():
+    global _recorder
+    if _recorder is None:
+        _recorder = LatencyRecorder()
+        atexit.register(_recorder.flush)
+    return _recorder
+
+
+def record_delivery_latency(delivery):
+    get_latency_recorder().record(delivery)
+
+
+@on_shutdown
+def flush_latency_stats():
+    if _recorder is not None:
+        _recorder.flush()
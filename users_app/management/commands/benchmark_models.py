@@ -0,0 +1,150 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from users_app import views
+from users_app.auth_backends import user_cache
+from users_app.management.commands.generate_fixtures import SENDERS
+from users_app.models import NumbersService, Rules, TelegramChats, User
+
+SESSION_ENGINES = ('db', 'cached_db', 'signed_cookies')
+DASHBOARD_PAGES = ('about', 'settings_rules', 'settings_service')
+
+
+class Command(BaseCommand):
+    help = ('Times the webhook rule match, settings pages, admin changelists and '
+            'authenticated page requests on the current database (see generate_fixtures)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=50, help='Typical users to sample')
+        parser.add_argument('--hot', type=int, default=5, help='Users with the most rules to sample')
+        parser.add_argument('--iterations', type=int, default=3, help='Repetitions per sampled user')
+        parser.add_argument('--only', choices=['match', 'pages', 'admin', 'sessions'], help='Run one group only')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for sampling')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.iterations = options['iterations']
+        self.factory = RequestFactory()
+
+        typical = self._sample_users(options['samples'])
+        if not typical:
+            raise CommandError('No users in the database, run generate_fixtures first')
+        hot = self._hot_users(options['hot'])
+        self.stdout.write(
+            f'{User.objects.count()} users, {Rules.objects.count()} rules, '
+            f'{TelegramChats.objects.count()} chats, {NumbersService.objects.count()} numbers'
+        )
+        self.stdout.write(f"{'benchmark':<36}{'ops':>8}{'ops/s':>10}{'mean ms':>10}{'p95 ms':>10}{'queries':>9}")
+
+        groups = [options['only']] if options['only'] else ['match', 'pages', 'admin', 'sessions']
+        for group in groups:
+            getattr(self, f'bench_{group}')(typical, hot)
+
+    def bench_match(self, typical, hot):
+        for name, users in (('webhook match typical', typical), ('webhook match hot', hot)):
+            cases = [(user, self._sender_for(user)) for user in users]
+            self._run(name, cases, lambda case: views.match_rules(*case))
+
+    def bench_pages(self, typical, hot):
+        for view_name in ('settings_rules', 'settings_service'):
+            view = getattr(views, view_name)
+            for name, users in (('typical', typical), ('hot', hot)):
+                self._run(f'{view_name} {name}', users, lambda user: self._render(view, f'/{view_name}/', user))
+
+    def bench_admin(self, typical, hot):
+        superuser = User(phone='benchmark', is_staff=True, is_superuser=True, is_active=True)
+        for model in (User, Rules, TelegramChats, NumbersService):
+            model_admin = admin.site._registry[model]
+            path = f'/admin/users_app/{model._meta.model_name}/'
+            cases = [{}] * max(len(typical) // 5, 1)
+            if model is not User:
+                cases += [{'user__id__exact': user.pk} for user in hot]
+            self._run(
+                f'admin {model._meta.model_name}', cases,
+                lambda params: self._render(model_admin.changelist_view, path, superuser, params)
+            )
+
+    def bench_sessions(self, typical, hot):
+        # Полный цикл запроса через middleware: сессия, пользователь, страница
+        paths = [reverse(name) for name in DASHBOARD_PAGES]
+        for engine in SESSION_ENGINES:
+            for ttl in (0, settings.USER_CACHE_TTL or 30):
+                with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}', USER_CACHE_TTL=ttl):
+                    user_cache.clear()
+                    cases = []
+                    for user in typical:
+                        client = Client()
+                        client.force_login(user)
+                        cases += [(client, path) for path in paths]
+                    name = f"session {engine}{' +user cache' if ttl else ''}"
+                    self._run(name, cases, self._get_page)
+
+    def _get_page(self, case):
+        client, path = case
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        return response
+
+    def _render(self, view, path, user, params=None):
+        request = self.factory.get(path, params or {})
+        request.user = user
+        request.session = {}
+        response = view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def _run(self, name, cases, operation):
+        if not cases:
+            return
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        timings = []
+        with connection.execute_wrapper(count_queries):
+            for _ in range(self.iterations):
+                for case in cases:
+                    started = time.perf_counter()
+                    operation(case)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+        total_s = sum(timings) / 1000
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'{name:<36}{len(timings):>8}{len(timings) / total_s:>10.0f}'
+            f'{statistics.mean(timings):>10.2f}{p95:>10.2f}{queries / len(timings):>9.1f}'
+        )
+
+    def _sample_users(self, count):
+        bounds = User.objects.order_by('pk').values_list('pk', flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            return []
+        # Случайные id из диапазона вместо ORDER BY RAND() по всей таблице
+        ids = {self.random.randint(first, last) for _ in range(count * 2)}
+        return list(User.objects.filter(pk__in=ids)[:count])
+
+    def _hot_users(self, count):
+        ids = (
+            Rules.objects.values('user_id').annotate(rules=Count('id'))
+            .order_by('-rules').values_list('user_id', flat=True)[:count]
+        )
+        return list(User.objects.filter(pk__in=list(ids)))
+
+    def _sender_for(self, user):
+        sender = Rules.objects.filter(user=user).values_list('sender', flat=True).first()
+        return sender or self.random.choice(SENDERS)
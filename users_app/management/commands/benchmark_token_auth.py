@@ -0,0 +1,69 @@
+import random
+import secrets
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from users_app.models import User
+from users_app.token_cache import TokenCache
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks webhook token authentication with and without the token cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Temporary users to create')
+        parser.add_argument('--requests', type=int, default=20000, help='Lookups per run')
+        parser.add_argument('--invalid-ratio', type=float, default=0.5, help='Share of invalid tokens')
+        parser.add_argument('--invalid-pool', type=int, default=100,
+                            help='Distinct invalid tokens used by the simulated attacker')
+
+    def handle(self, *args, **options):
+        # Пользователи создаются во временной транзакции и удаляются откатом
+        with transaction.atomic():
+            tokens = self._create_users(options['users'])
+            invalid = [secrets.token_urlsafe(32) for _ in range(options['invalid_pool'])]
+            workload = [
+                random.choice(invalid) if random.random() < options['invalid_ratio'] else random.choice(tokens)
+                for _ in range(options['requests'])
+            ]
+
+            self._run('database', workload, lambda token: User.objects.filter(token_url=token).first())
+            cache = TokenCache()
+            self._run('cached', workload, cache.get_user)
+
+            transaction.set_rollback(True)
+
+    def _create_users(self, count):
+        suffix = secrets.token_hex(4)
+        users = [
+            User(
+                email=f'bench-{suffix}-{i}@example.com',
+                phone=f'bench-{suffix}-{i}',
+                token_url=secrets.token_urlsafe(32),
+                password='!',
+            )
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+        return [user.token_url for user in users]
+
+    def _run(self, name, workload, lookup):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            for token in workload:
+                lookup(token)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{name:<10} {len(workload) / elapsed:>12.0f} lookups/s  '
+            f'{queries:>8} queries  {elapsed:.2f}s'
+        )
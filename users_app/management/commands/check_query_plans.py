@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from users_app.models import Rules, TelegramChats, User
+from users_app.views import rules_for_sender
+
+
+class Command(BaseCommand):
+    help = ('Checks with EXPLAIN that the rule, chat and user lookups use their indexes. '
+            'Run on a database of realistic size (see generate_fixtures): on tiny tables '
+            'the planner may prefer a full scan')
+
+    def handle(self, *args, **options):
+        rule = Rules.objects.order_by('pk').first()
+        chat = TelegramChats.objects.order_by('pk').first()
+        user_id = rule.user_id if rule else 0
+
+        checks = [
+            ('webhook rule match', Rules, ['user_id', 'sender'],
+             rules_for_sender(User(pk=user_id), rule.sender if rule else 'sender')),
+            ('chat duplicate check', TelegramChats, ['user_id', 'chat_id'],
+             TelegramChats.objects.filter(user_id=chat.user_id if chat else 0, chat_id=chat.chat_id if chat else '0')),
+            ('user by telegram_id', User, ['telegram_id'],
+             User.objects.filter(telegram_id='0')),
+        ]
+
+        failed = []
+        for name, model, columns, queryset in checks:
+            index = self._index_name(model._meta.db_table, columns)
+            if index is None:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: no index on {model._meta.db_table}({", ".join(columns)})'))
+                continue
+            used = self._uses_index(queryset, index)
+            if not used:
+                failed.append(name)
+            style = self.style.SUCCESS if used else self.style.ERROR
+            self.stdout.write(style(f"{name}: {index} {'used' if used else 'NOT used'}"))
+            if options['verbosity'] > 1 or not used:
+                self.stdout.write(self._explain(queryset))
+
+        if failed:
+            raise CommandError(f"Indexes not used: {', '.join(failed)}")
+
+    @staticmethod
+    def _index_name(table, columns):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        for name, constraint in constraints.items():
+            if (constraint['index'] or constraint['unique']) and constraint['columns'] == columns:
+                if constraint['unique'] and connection.vendor == 'sqlite':
+                    # SQLite хранит ограничение уникальности таблицы как автоиндекс
+                    return f'sqlite_autoindex_{table}'
+                return name
+        return None
+
+    @staticmethod
+    def _explain(queryset):
+        if connection.vendor == 'mysql':
+            return queryset.explain(format='json')
+        return queryset.explain()
+
+    def _uses_index(self, queryset, index):
+        plan = self._explain(queryset)
+        if connection.vendor == 'mysql':
+            return index in self._mysql_keys(json.loads(plan))
+        # SQLite и PostgreSQL упоминают в плане только используемые индексы
+        return index in plan
+
+    def _mysql_keys(self, node):
+        keys = set()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'key' and isinstance(value, str):
+                    keys.add(value)
+                else:
+                    keys |= self._mysql_keys(value)
+        elif isinstance(node, list):
+            for value in node:
+                keys |= self._mysql_keys(value)
+        return keys
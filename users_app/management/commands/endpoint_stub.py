@@ -0,0 +1,88 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from users_app.endpoints import sign_payload
+
+
+class Command(BaseCommand):
+    help = ('Runs a local HTTP server that accepts SMS deliveries like a customer endpoint: '
+            'checks signatures, prints received messages and can simulate failures')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8085)
+        parser.add_argument('--secret', default=None, help='HttpEndpoint.secret; signatures are checked if given')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with --fail-status')
+        parser.add_argument('--fail-status', type=int, default=503)
+        parser.add_argument('--retry-after', type=int, default=None, help='Retry-After header of failed responses')
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering')
+
+    def handle(self, *args, **options):
+        command = self
+        stats = {'requests': 0, 'messages': 0, 'duplicates': 0, 'failed': 0, 'rejected': 0}
+        seen_ids = set()
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if options['delay']:
+                    time.sleep(options['delay'])
+
+                if options['secret']:
+                    expected = 'sha256=' + sign_payload(options['secret'], self.headers.get('X-Sms-Timestamp', ''), body)
+                    if self.headers.get('X-Sms-Signature') != expected:
+                        with lock:
+                            stats['rejected'] += 1
+                        command.stderr.write(f'{self.path}: invalid signature')
+                        return self.answer(401)
+
+                if random.random() < options['fail_rate']:
+                    with lock:
+                        stats['failed'] += 1
+                    headers = {'Retry-After': str(options['retry_after'])} if options['retry_after'] else {}
+                    return self.answer(options['fail_status'], headers)
+
+                try:
+                    messages = json.loads(body)['messages']
+                except (ValueError, KeyError, TypeError):
+                    return self.answer(400)
+                with lock:
+                    stats['requests'] += 1
+                    for message in messages:
+                        if message.get('id') in seen_ids:
+                            stats['duplicates'] += 1
+                        seen_ids.add(message.get('id'))
+                    stats['messages'] += len(messages)
+                    summary = dict(stats)
+                for message in messages:
+                    command.stdout.write(
+                        f"#{message.get('id')} {message.get('from')} -> {message.get('to')}: {message.get('text')!r}"
+                    )
+                command.stdout.write(f'  batch of {len(messages)}, totals: {summary}')
+                self.answer(200)
+
+            def answer(self, status, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"Listening on http://{options['host']}:{options['port']}/ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Stopped, totals: {stats}')
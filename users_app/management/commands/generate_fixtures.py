@@ -0,0 +1,138 @@
+import random
+import secrets
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users_app.audit import audited_bulk_create, audited_delete
+
+from users_app.models import KEY_TYPES, NumbersService, Rules, TelegramChats, User
+
+# Отправители SMS: сервисы с кодами, банки, магазины
+SENDERS = (
+    'Любой отправитель', 'Sberbank', 'Tinkoff', 'VTB', 'Alfa-Bank', 'Gosuslugi', 'Yandex', 'Ozon',
+    'Wildberries', 'Avito', 'Telegram', 'WhatsApp', 'Google', 'Apple', 'MTS', 'Beeline', 'MegaFon',
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates users, numbers, chats and rules at production scale for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200000, help='Users to create')
+        parser.add_argument('--rules', type=int, default=1000000, help='Approximate total number of rules')
+        parser.add_argument('--chats', type=float, default=2.0, help='Average Telegram chats per user')
+        parser.add_argument('--numbers', type=float, default=1.5, help='Average provider numbers per user')
+        parser.add_argument('--hot-users', type=int, default=100, help='Users with many rules and chats')
+        parser.add_argument('--hot-rules', type=int, default=2000, help='Rules per hot user')
+        parser.add_argument('--hot-chats', type=int, default=50, help='Telegram chats per hot user')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Users generated per batch')
+        parser.add_argument('--prefix', default='fixture', help='Prefix of generated emails and phones')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--clear', action='store_true', help='Delete data generated with this prefix and exit')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['clear']:
+            deleted, _ = audited_delete(User.objects.filter(email__startswith=f'{prefix}-'))
+            self.stdout.write(f'Deleted {deleted} objects')
+            return
+
+        self.random = random.Random(options['seed'])
+        self.options = options
+        users, hot = options['users'], min(options['hot_users'], options['users'])
+        # Правила, оставшиеся после горячих пользователей, распределяются
+        # между остальными по экспоненциальному закону
+        other_rules = max(options['rules'] - hot * options['hot_rules'], 0)
+        self.average_rules = other_rules / max(users - hot, 1)
+
+        offset = User.objects.filter(email__startswith=f'{prefix}-').count()
+        totals = {'users': 0, 'numbers': 0, 'chats': 0, 'rules': 0}
+        started = time.perf_counter()
+        for start in range(0, users, options['batch_size']):
+            indexes = range(start, min(start + options['batch_size'], users))
+            counts = self._create_batch(prefix, offset, indexes, hot)
+            for name, value in counts.items():
+                totals[name] += value
+            self.stdout.write(
+                f"{indexes[-1] + 1}/{users} users, {totals['rules']} rules "
+                f"({time.perf_counter() - started:.0f}s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{value} {name}' for name, value in totals.items())
+            + f' created in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _create_batch(self, prefix, offset, indexes, hot):
+        options = self.options
+        with transaction.atomic():
+            users = [
+                User(
+                    email=f'{prefix}-{offset + index}@example.com',
+                    phone=f'{prefix}-{offset + index}',
+                    telegram_id=str(self.random.randint(10 ** 8, 10 ** 10)),
+                    token_url=secrets.token_urlsafe(32),
+                    password='!',
+                )
+                for index in indexes
+            ]
+            audited_bulk_create(User, users)
+            # Первичные ключи перечитываются: MySQL не возвращает их из bulk_create
+            user_ids = dict(
+                User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'id')
+            )
+            is_hot = {user_ids[user.email]: index < hot for index, user in zip(indexes, users)}
+
+            numbers, chats = [], []
+            for user_id, hot_user in is_hot.items():
+                for _ in range(self._count(options['numbers'], minimum=1)):
+                    numbers.append(NumbersService(
+                        user_id=user_id,
+                        name=self.random.choice(KEY_TYPES)[0],
+                        telephone=f'{prefix}-{user_id}-{len(numbers)}',
+                    ))
+                chat_count = options['hot_chats'] if hot_user else self._count(options['chats'], minimum=1)
+                for _ in range(chat_count):
+                    chats.append(TelegramChats(
+                        user_id=user_id,
+                        title=f'Chat {len(chats)}',
+                        chat_id=str(-10 ** 12 - self.random.randint(0, 10 ** 10)),
+                    ))
+            audited_bulk_create(NumbersService, numbers, batch_size=5000)
+            audited_bulk_create(TelegramChats, chats, batch_size=5000)
+
+            user_numbers = self._ids_by_user(NumbersService, is_hot)
+            user_chats = self._ids_by_user(TelegramChats, is_hot)
+            rules = []
+            for user_id, hot_user in is_hot.items():
+                count = options['hot_rules'] if hot_user else self._count(self.average_rules)
+                for _ in range(count):
+                    rules.append(Rules(
+                        user_id=user_id,
+                        sender=self._sender(),
+                        from_whom_id=self.random.choice(user_numbers[user_id]),
+                        to_whom_id=self.random.choice(user_chats[user_id]),
+                    ))
+            audited_bulk_create(Rules, rules, batch_size=5000)
+
+        return {'users': len(users), 'numbers': len(numbers), 'chats': len(chats), 'rules': len(rules)}
+
+    def _count(self, average, minimum=0):
+        if average <= 0:
+            return minimum
+        return max(minimum, round(self.random.expovariate(1 / average)))
+
+    def _sender(self):
+        # Часть правил привязана к произвольным отправителям (номера телефонов)
+        if self.random.random() < 0.2:
+            return f'+7{self.random.randint(9000000000, 9999999999)}'
+        return self.random.choice(SENDERS)
+
+    @staticmethod
+    def _ids_by_user(model, user_ids):
+        ids = {}
+        for user_id, pk in model.objects.filter(user_id__in=list(user_ids)).values_list('user_id', 'id'):
+            ids.setdefault(user_id, []).append(pk)
+        return ids
@@ -0,0 +1,97 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Модули, которые загружает процесс каждой роли до начала работы
+TARGETS = {
+    'web': ['sms_analizator_service.asgi', 'sms_analizator_service.urls', 'users_app.views'],
+    'bot': ['users_app.telegram_bot'],
+    'delivery': ['users_app.management.commands.run_delivery'],
+}
+
+# Запуск в отдельном процессе: в текущем модули уже импортированы
+SCRIPT = '''
+import importlib, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+print(f"{(time.perf_counter() - started) * 1000:.1f}")
+'''
+
+IMPORT_LINE = re.compile(r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<module>\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Measures process start-up imports with python -X importtime and prints the slowest ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', default='web',
+                            help=f"Process role ({', '.join(TARGETS)}) or a dotted module path")
+        parser.add_argument('--top', type=int, default=25, help='Modules and packages to show')
+        parser.add_argument('--runs', type=int, default=3, help='Start-ups to measure (median is reported)')
+        parser.add_argument('--min-ms', type=float, default=1.0, help='Hide modules faster than this')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        modules = TARGETS.get(target, [target])
+        role = target if target in TARGETS else 'command'
+
+        totals, imports = [], []
+        for _ in range(max(options['runs'], 1)):
+            total_ms, imports = self.measure(modules, role)
+            totals.append(total_ms)
+
+        self.stdout.write(
+            f"{target}: start-up {statistics.median(totals):.0f} ms "
+            f"(median of {len(totals)}, min {min(totals):.0f}), {len(imports)} modules imported"
+        )
+        self.report_packages(imports, options['top'])
+        self.report_modules(imports, options['top'], options['min_ms'])
+
+    def measure(self, modules, role):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE),
+            'LOG_ROLE': os.environ.get('LOG_ROLE', role),
+        }
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, *modules],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Start-up failed:\n{result.stderr[-2000:]}')
+
+        imports = []
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                imports.append((
+                    match['module'], int(match['self']) / 1000, int(match['cumulative']) / 1000,
+                    (len(match['indent']) - 1) // 2,
+                ))
+        return float(result.stdout.strip().splitlines()[-1]), imports
+
+    def report_packages(self, imports, top):
+        packages = {}
+        for module, self_ms, _, _ in imports:
+            package = module.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_ms
+        self.stdout.write(f"\n{'package':<40}{'self ms':>10}")
+        for package, self_ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'{package:<40}{self_ms:>10.1f}')
+
+    def report_modules(self, imports, top, min_ms):
+        # Модули первого уровня вложенности: что именно тянет за собой проект
+        slowest = sorted(
+            (item for item in imports if item[3] == 0 and item[2] >= min_ms), key=lambda item: -item[2]
+        )
+        self.stdout.write(f"\n{'module (top-level import)':<60}{'cumulative ms':>14}{'self ms':>10}")
+        for module, self_ms, cumulative_ms, _ in slowest[:top]:
+            self.stdout.write(f'{module:<60}{cumulative_ms:>14.1f}{self_ms:>10.1f}')
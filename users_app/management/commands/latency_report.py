@@ -0,0 +1,42 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users_app.latency import STAGES, LatencyHistogram
+from users_app.models import LatencyStats
+
+
+class Command(BaseCommand):
+    help = 'Prints delivery latency percentiles per user and per provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Reporting window in hours')
+        parser.add_argument('--scope', choices=['user', 'provider'], help='Only this scope')
+        parser.add_argument('--key', help='Only this user ID or provider name')
+        parser.add_argument('--stage', choices=[stage for stage, _, _ in STAGES], default='total')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        queryset = LatencyStats.objects.filter(period_start__gte=since, stage=options['stage'])
+        if options['scope']:
+            queryset = queryset.filter(scope=options['scope'])
+        if options['key']:
+            queryset = queryset.filter(key=options['key'])
+
+        merged = defaultdict(LatencyHistogram)
+        for stats in queryset.iterator():
+            merged[(stats.scope, stats.key)].merge(stats.histogram)
+
+        if not merged:
+            self.stdout.write('No latency data for the selected window')
+            return
+
+        self.stdout.write(f"{'scope':<10}{'key':<20}{'count':>10}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}  (ms)")
+        for (scope, key), histogram in sorted(merged.items()):
+            self.stdout.write(
+                f'{scope:<10}{key:<20}{histogram.count:>10}{histogram.mean:>10.0f}'
+                f'{histogram.percentile(50):>10.0f}{histogram.percentile(90):>10.0f}'
+                f'{histogram.percentile(99):>10.0f}'
+            )
@@ -0,0 +1,51 @@
+import io
+import pstats
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.profiling import list_profiles, profile_dir, sign_profiling_request
+
+PROFILE_NAME = re.compile(r'^(?P<time>\d{8}-\d{6})-\d+_(?P<label>.+)_(?P<ms>\d+)ms\.prof$')
+
+
+class Command(BaseCommand):
+    help = 'Lists captured request profiles or prints a summary of one of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Profile file name (or its unique prefix) to summarize')
+        parser.add_argument('--limit', type=int, default=20, help='Number of profiles or functions to show')
+        parser.add_argument('--sort', default='cumulative', help='pstats sort key for the summary')
+        parser.add_argument('--sign', action='store_true', help='Print a signed value for the profiling header')
+
+    def handle(self, *args, **options):
+        if options['sign']:
+            self.stdout.write(sign_profiling_request())
+            return
+        if options['name']:
+            self.summarize(options['name'], options['sort'], options['limit'])
+            return
+
+        profiles = list_profiles()
+        if not profiles:
+            self.stdout.write(f'No profiles in {profile_dir()}')
+            return
+        self.stdout.write(f"{'captured':<17}{'ms':>8}  {'label':<50}file")
+        for path in profiles[:options['limit']]:
+            match = PROFILE_NAME.match(path.name)
+            if match is None:
+                continue
+            self.stdout.write(
+                f"{match['time']:<17}{match['ms']:>8}  {match['label']:<50}{path.name}"
+            )
+
+    def summarize(self, name, sort, limit):
+        matches = [path for path in list_profiles() if path.name.startswith(name)]
+        if not matches:
+            raise CommandError(f'Profile {name} not found in {profile_dir()}')
+        if len(matches) > 1:
+            raise CommandError(f'{len(matches)} profiles match {name}, use a longer prefix')
+        output = io.StringIO()
+        stats = pstats.Stats(str(matches[0]), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
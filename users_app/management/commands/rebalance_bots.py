@@ -0,0 +1,54 @@
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from users_app.bot_pool import get_bot_pool, rendezvous_choice
+from users_app.models import TelegramChats
+
+
+class Command(BaseCommand):
+    help = 'Reassigns Telegram chats to the bots of the pool that are members of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only report planned changes')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options['batch_size'], options['dry_run']))
+
+    async def _run(self, batch_size, dry_run):
+        pool = get_bot_pool()
+        last_pk = 0
+        moved = unreachable = 0
+
+        while True:
+            chats = await sync_to_async(list)(
+                TelegramChats.objects.filter(pk__gt=last_pk)
+                .order_by('pk').values_list('pk', 'chat_id', 'bot_id')[:batch_size]
+            )
+            if not chats:
+                break
+            last_pk = chats[-1][0]
+
+            changes = defaultdict(list)
+            for pk, chat_id, bot_id in chats:
+                members = await pool.member_bot_ids(chat_id)
+                if not members:
+                    unreachable += 1
+                    continue
+                target = rendezvous_choice(chat_id, members)
+                if target != bot_id:
+                    changes[target].append(pk)
+                    self.stdout.write(f'Chat {chat_id}: {bot_id or "-"} -> {target}')
+
+            for target, pks in changes.items():
+                moved += len(pks)
+                if not dry_run:
+                    await sync_to_async(TelegramChats.objects.filter(pk__in=pks).update)(bot_id=target)
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} chats across {len(pool.bot_ids)} bots; {unreachable} chats have no pool bot'
+        ))
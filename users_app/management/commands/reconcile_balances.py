@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from users_app.billing import balance_mismatches
+from users_app.models import BalanceEntry
+
+
+class Command(BaseCommand):
+    help = ('Compares user balances with the sum of their balance ledger entries; '
+            'with --fix records adjustment entries so that the ledger matches the balances')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Check only these user IDs')
+        parser.add_argument('--fix', action='store_true', help='Record adjustment entries for mismatches')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Users read per query')
+
+    def handle(self, *args, **options):
+        mismatches = list(balance_mismatches(options['users'], options['chunk_size']))
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('All balances match the ledger'))
+            return
+
+        self.stdout.write(f"{'user':>10}{'balance':>12}{'ledger':>12}{'difference':>12}")
+        for user_id, balance, total in mismatches:
+            self.stdout.write(f'{user_id:>10}{balance:>12}{total:>12}{balance - total:>+12}')
+        self.stdout.write(self.style.WARNING(f'{len(mismatches)} balances differ from the ledger'))
+
+        if options['fix']:
+            # Баланс считается верным: журнал дополняется разницей, сам баланс не меняется.
+            # Разница не зависит от списаний, записанных после проверки
+            BalanceEntry.objects.bulk_create([
+                BalanceEntry(user_id=user_id, kind='adjustment', amount=balance - total)
+                for user_id, balance, total in mismatches
+            ], batch_size=1000)
+            self.stdout.write(self.style.SUCCESS(f'Recorded {len(mismatches)} adjustment entries'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from users_app.delivery import redrive_dead_letters
+from users_app.models import DeadLetter
+
+
+class Command(BaseCommand):
+    help = 'Puts dead-lettered Telegram and HTTP endpoint deliveries back into the retry queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only deliveries of this user ID')
+        parser.add_argument('--chat', type=int, help='Only deliveries to this TelegramChats ID')
+        parser.add_argument('--endpoint', type=int, help='Only deliveries to this HttpEndpoint ID')
+        parser.add_argument('--since', help='Only dead letters created after this ISO datetime')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count matching dead letters')
+
+    def handle(self, *args, **options):
+        queryset = DeadLetter.objects.order_by('pk')
+        if options['user']:
+            queryset = queryset.filter(
+                Q(delivery__user_id=options['user']) | Q(endpoint_delivery__user_id=options['user'])
+            )
+        if options['chat']:
+            queryset = queryset.filter(delivery__chat_id=options['chat'])
+        if options['endpoint']:
+            queryset = queryset.filter(endpoint_delivery__endpoint_id=options['endpoint'])
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=parse_datetime(options['since']))
+
+        if options['dry_run']:
+            self.stdout.write(f'Dead letters to redrive: {queryset.count()}')
+            return
+
+        total = redrive_dead_letters(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Requeued {total} deliveries'))
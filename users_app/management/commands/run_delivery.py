@@ -0,0 +1,29 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from users_app.delivery import run_delivery_scheduler
+from utils.lifespan import shutdown
+
+
+class Command(BaseCommand):
+    help = 'Runs the scheduler that retries failed Telegram deliveries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options['poll_interval']))
+
+    async def _run(self, poll_interval):
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        try:
+            await run_delivery_scheduler(poll_interval=poll_interval, stop_event=stop_event)
+        finally:
+            # Возврат незавершённых доставок и запись буферов (utils/lifespan.py)
+            await shutdown()
@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users_app.workers import WorkerSupervisor
+
+
+class Command(BaseCommand):
+    help = 'Runs the delivery scheduler in several processes, partitioned by chat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procs', type=int, default=None,
+                            help='Worker processes (default: WORKER_PROCS or the number of CPU cores)')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--shutdown-timeout', type=float, default=None,
+                            help='Seconds to wait for workers to stop before killing them')
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('run_workers requires the fork start method; use run_delivery instead')
+        procs = options['procs'] or settings.WORKER_PROCS or os.cpu_count() or 1
+        if procs < 1:
+            raise CommandError('--procs must be at least 1')
+
+        WorkerSupervisor(
+            procs, poll_interval=options['poll_interval'], shutdown_timeout=options['shutdown_timeout'],
+        ).run()
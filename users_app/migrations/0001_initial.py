@@ -0,0 +1,97 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='Email')),
+                ('balance', models.IntegerField(default=0, verbose_name='Баланс')),
+                ('token_url', models.CharField(blank=True, max_length=500, null=True, verbose_name='Токен для Вебхука')),
+                ('telegram_id', models.CharField(blank=True, max_length=500, null=True, verbose_name='ID TG')),
+                ('phone', models.CharField(max_length=100, null=True, unique=True, verbose_name='Телефон')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'Пользователь',
+                'verbose_name_plural': 'Пользователи',
+            },
+        ),
+        migrations.CreateModel(
+            name='Key',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('Novofon', 'Novofon'), ('Telfin', 'Telfin'), ('Mango', 'Mango')], max_length=50, verbose_name='Тип ключа')),
+                ('title', models.TextField(blank=True, null=True, verbose_name='Название кабинета')),
+                ('token', models.CharField(max_length=1000, verbose_name='Токен')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='key', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ключ',
+                'verbose_name_plural': 'Ключи',
+            },
+        ),
+        migrations.CreateModel(
+            name='NumbersService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('Novofon', 'Novofon'), ('Telfin', 'Telfin'), ('Mango', 'Mango')], max_length=50, verbose_name='Сервис')),
+                ('telephone', models.CharField(max_length=100, unique=True, verbose_name='Номер телефона')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Телефон',
+                'verbose_name_plural': 'Телефоны',
+            },
+        ),
+        migrations.CreateModel(
+            name='TelegramChats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.TextField(verbose_name='Название канала')),
+                ('chat_id', models.CharField(max_length=250, verbose_name='ID чата ТГ')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'ТГ канал',
+                'verbose_name_plural': 'ТГ каналы',
+            },
+        ),
+        migrations.CreateModel(
+            name='Rules',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender', models.CharField(max_length=1000, verbose_name='Отравитель')),
+                ('from_whom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users_app.numbersservice', verbose_name='От кого')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('to_whom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users_app.telegramchats', verbose_name='Куда')),
+            ],
+            options={
+                'verbose_name': 'Правило',
+                'verbose_name_plural': 'Правила',
+            },
+        ),
+    ]
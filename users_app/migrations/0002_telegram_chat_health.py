@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramchats',
+            name='error_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ошибок подряд'),
+        ),
+        migrations.AddField(
+            model_name='telegramchats',
+            name='is_suspended',
+            field=models.BooleanField(default=False, verbose_name='Приостановлен'),
+        ),
+        migrations.AddField(
+            model_name='telegramchats',
+            name='last_error',
+            field=models.TextField(blank=True, null=True, verbose_name='Последняя ошибка'),
+        ),
+        migrations.AddField(
+            model_name='telegramchats',
+            name='next_probe_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Следующая проверка'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0002_telegram_chat_health'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Delivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст сообщения')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('sent', 'Доставлено'), ('failed', 'Ошибка'), ('dead', 'Попытки исчерпаны')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='users_app.telegramchats', verbose_name='Чат')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Доставка',
+                'verbose_name_plural': 'Доставки',
+            },
+        ),
+        migrations.CreateModel(
+            name='DeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.TextField(blank=True, null=True, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('delivery', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='users_app.delivery', verbose_name='Доставка')),
+            ],
+            options={
+                'verbose_name': 'Недоставленное сообщение',
+                'verbose_name_plural': 'Недоставленные сообщения',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='users_app_d_status_151a22_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0003_delivery_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramchats',
+            name='bot_id',
+            field=models.CharField(blank=True, max_length=32, null=True, verbose_name='ID бота'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0004_bot_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Код подтверждения'), (1, 'Транзакционное'), (2, 'Рассылка')], default=1, verbose_name='Приоритет'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0005_delivery_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='dequeued_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Выход из очереди'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='ingested_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Принято'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='matched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Правило найдено'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='provider',
+            field=models.CharField(blank=True, choices=[('Novofon', 'Novofon'), ('Telfin', 'Telfin'), ('Mango', 'Mango')], max_length=50, null=True, verbose_name='Провайдер'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='provider_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время провайдера'),
+        ),
+        migrations.CreateModel(
+            name='LatencyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(verbose_name='Начало часа')),
+                ('scope', models.CharField(choices=[('user', 'Пользователь'), ('provider', 'Провайдер')], max_length=20, verbose_name='Область')),
+                ('key', models.CharField(max_length=100, verbose_name='Ключ')),
+                ('stage', models.CharField(max_length=20, verbose_name='Этап')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Сумма, мс')),
+                ('buckets', models.JSONField(default=dict, verbose_name='Гистограмма')),
+            ],
+            options={
+                'verbose_name': 'Задержка доставки',
+                'verbose_name_plural': 'Задержки доставки',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key', 'stage', 'period_start'), name='latency_stats_unique_period')],
+            },
+        ),
+    ]
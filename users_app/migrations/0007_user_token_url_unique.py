@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:37
+
+import secrets
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def regenerate_duplicate_tokens(apps, schema_editor):
+    """
+    Новые токены для пользователей с одинаковым token_url перед ограничением
+    уникальности: токен остаётся у пользователя с меньшим ID, остальные
+    получают новый токен (и новый адрес webhook). Пустые токены заменяются
+    на NULL: такой адрес webhook не работал.
+    """
+    User = apps.get_model('users_app', 'User')
+    User.objects.filter(token_url='').update(token_url=None)
+    duplicates = (
+        User.objects.exclude(token_url=None).values('token_url')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra_ids = (
+            User.objects.filter(token_url=duplicate['token_url'])
+            .exclude(id=duplicate['keep_id']).values_list('id', flat=True)
+        )
+        for user_id in list(extra_ids):
+            User.objects.filter(id=user_id).update(token_url=secrets.token_urlsafe(32))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0006_delivery_latency'),
+    ]
+
+    operations = [
+        migrations.RunPython(regenerate_duplicate_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='token_url',
+            field=models.CharField(blank=True, max_length=500, null=True, unique=True, verbose_name='Токен для Вебхука'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:56
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Length, Substr
+
+SENDER_MAX_LENGTH = 255
+
+
+def truncate_long_senders(apps, schema_editor):
+    """
+    Обрезка отправителя до SENDER_MAX_LENGTH символов перед сужением поля.
+
+    Форма правил не принимает отправителя длиннее 255 символов, а имя
+    отправителя SMS не бывает таким длинным, поэтому такие правила могли
+    появиться только в обход формы. Без обрезки MySQL в строгом режиме
+    прервёт ALTER TABLE.
+    """
+    Rules = apps.get_model('users_app', 'Rules')
+    Rules.objects.annotate(sender_length=Length('sender')).filter(
+        sender_length__gt=SENDER_MAX_LENGTH
+    ).update(sender=Substr('sender', 1, SENDER_MAX_LENGTH))
+
+
+def merge_duplicate_chats(apps, schema_editor):
+    """Объединение повторно добавленных чатов перед ограничением уникальности (user, chat_id)."""
+    TelegramChats = apps.get_model('users_app', 'TelegramChats')
+    Rules = apps.get_model('users_app', 'Rules')
+    Delivery = apps.get_model('users_app', 'Delivery')
+
+    duplicates = (
+        TelegramChats.objects.values('user_id', 'chat_id')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra_ids = list(
+            TelegramChats.objects.filter(user_id=duplicate['user_id'], chat_id=duplicate['chat_id'])
+            .exclude(id=duplicate['keep_id']).values_list('id', flat=True)
+        )
+        Rules.objects.filter(to_whom_id__in=extra_ids).update(to_whom_id=duplicate['keep_id'])
+        Delivery.objects.filter(chat_id__in=extra_ids).update(chat_id=duplicate['keep_id'])
+        TelegramChats.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0007_user_token_url_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(truncate_long_senders, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='rules',
+            name='sender',
+            field=models.CharField(max_length=255, verbose_name='Отравитель'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='telegram_id',
+            field=models.CharField(blank=True, db_index=True, max_length=500, null=True, verbose_name='ID TG'),
+        ),
+        migrations.AddIndex(
+            model_name='rules',
+            index=models.Index(fields=['user', 'sender'], name='rules_user_sender_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_chats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='telegramchats',
+            constraint=models.UniqueConstraint(fields=('user', 'chat_id'), name='telegram_chats_user_chat_unique'),
+        ),
+    ]
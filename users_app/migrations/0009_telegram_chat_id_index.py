@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0008_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='telegramchats',
+            name='chat_id',
+            field=models.CharField(db_index=True, max_length=250, verbose_name='ID чата ТГ'),
+        ),
+    ]
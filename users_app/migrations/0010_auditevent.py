@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0009_telegram_chat_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Время')),
+                ('operation', models.CharField(choices=[('CREATE', 'Создание'), ('UPDATE', 'Изменение'), ('DELETE', 'Удаление'), ('BULK_CREATE', 'Массовое создание'), ('BULK_UPDATE', 'Массовое изменение'), ('BULK_DELETE', 'Массовое удаление')], max_length=20, verbose_name='Операция')),
+                ('model', models.CharField(max_length=50, verbose_name='Модель')),
+                ('object_id', models.CharField(blank=True, max_length=64, null=True, verbose_name='ID объекта')),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='ID пользователя')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Количество объектов')),
+                ('details', models.JSONField(blank=True, null=True, verbose_name='Подробности')),
+            ],
+            options={
+                'verbose_name': 'Событие аудита',
+                'verbose_name_plural': 'Журнал аудита',
+            },
+        ),
+    ]
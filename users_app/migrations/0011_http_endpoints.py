@@ -0,0 +1,74 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0010_auditevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rules',
+            name='to_whom',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='users_app.telegramchats', verbose_name='Куда'),
+        ),
+        migrations.CreateModel(
+            name='HttpEndpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Название')),
+                ('url', models.URLField(max_length=1000, verbose_name='Адрес')),
+                ('secret', models.CharField(blank=True, max_length=100, verbose_name='Секрет подписи')),
+                ('batch_size', models.PositiveSmallIntegerField(default=1, verbose_name='SMS в одном запросе')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'HTTP адрес',
+                'verbose_name_plural': 'HTTP адреса',
+            },
+        ),
+        migrations.CreateModel(
+            name='EndpointDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(verbose_name='Сообщение')),
+                ('priority', models.PositiveSmallIntegerField(choices=[(0, 'Код подтверждения'), (1, 'Транзакционное'), (2, 'Рассылка')], default=1, verbose_name='Приоритет')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('sent', 'Доставлено'), ('failed', 'Ошибка'), ('dead', 'Попытки исчерпаны')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+                ('provider', models.CharField(blank=True, choices=[('Novofon', 'Novofon'), ('Telfin', 'Telfin'), ('Mango', 'Mango')], max_length=50, null=True, verbose_name='Провайдер')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('provider_at', models.DateTimeField(blank=True, null=True, verbose_name='Время провайдера')),
+                ('ingested_at', models.DateTimeField(blank=True, null=True, verbose_name='Принято')),
+                ('matched_at', models.DateTimeField(blank=True, null=True, verbose_name='Правило найдено')),
+                ('dequeued_at', models.DateTimeField(blank=True, null=True, verbose_name='Выход из очереди')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='users_app.httpendpoint', verbose_name='HTTP адрес')),
+            ],
+            options={
+                'verbose_name': 'Доставка на HTTP адрес',
+                'verbose_name_plural': 'Доставки на HTTP адреса',
+            },
+        ),
+        migrations.AddField(
+            model_name='rules',
+            name='to_endpoint',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='users_app.httpendpoint', verbose_name='HTTP адрес'),
+        ),
+        migrations.AddConstraint(
+            model_name='rules',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('to_endpoint__isnull', True), ('to_whom__isnull', False)), models.Q(('to_endpoint__isnull', False), ('to_whom__isnull', True)), _connector='OR'), name='rules_single_destination'),
+        ),
+        migrations.AddIndex(
+            model_name='endpointdelivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='users_app_e_status_3c9a99_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0011_http_endpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('charge', 'Списание за SMS'), ('topup', 'Пополнение'), ('adjustment', 'Корректировка')], max_length=20, verbose_name='Тип')),
+                ('amount', models.IntegerField(verbose_name='Сумма')),
+                ('sms_count', models.PositiveIntegerField(default=0, verbose_name='Количество SMS')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Операция по балансу',
+                'verbose_name_plural': 'Журнал баланса',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0012_balance_entries'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='httpendpoint',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Название'),
+        ),
+    ]
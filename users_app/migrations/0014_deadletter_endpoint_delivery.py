@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:01
+
+import django.db.models.deletion
+import utils.network
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0013_httpendpoint_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deadletter',
+            name='endpoint_delivery',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='users_app.endpointdelivery', verbose_name='Доставка на HTTP адрес'),
+        ),
+        migrations.AlterField(
+            model_name='deadletter',
+            name='delivery',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='users_app.delivery', verbose_name='Доставка'),
+        ),
+        migrations.AlterField(
+            model_name='httpendpoint',
+            name='url',
+            field=models.URLField(max_length=1000, validators=[utils.network.validate_public_url], verbose_name='Адрес'),
+        ),
+        migrations.AddConstraint(
+            model_name='deadletter',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('delivery__isnull', False), ('endpoint_delivery__isnull', True)), models.Q(('delivery__isnull', True), ('endpoint_delivery__isnull', False)), _connector='OR'), name='dead_letters_single_delivery'),
+        ),
+    ]
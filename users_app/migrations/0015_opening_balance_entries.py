@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 2000
+
+
+def create_opening_entries(apps, schema_editor):
+    """
+    Начальная запись журнала баланса для каждого пользователя.
+
+    Таблица BalanceEntry создана пустой (0012_balance_entries), а балансы
+    пользователей накоплены до появления журнала. Без начальной записи
+    сумма журнала не совпадает с User.balance. Запись adjustment равна
+    разнице между балансом и уже записанными операциями, поэтому учитывает
+    и списания, сделанные после 0012.
+    """
+    User = apps.get_model('users_app', 'User')
+    BalanceEntry = apps.get_model('users_app', 'BalanceEntry')
+
+    last_id = 0
+    while True:
+        users = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk')
+            .annotate(total=Coalesce(Sum('balance_entries__amount'), 0))
+            .values_list('pk', 'balance', 'total')[:CHUNK_SIZE]
+        )
+        if not users:
+            return
+        BalanceEntry.objects.bulk_create([
+            BalanceEntry(user_id=user_id, kind='adjustment', amount=balance - total)
+            for user_id, balance, total in users
+            if balance != total
+        ], batch_size=1000)
+        last_id = users[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users_app', '0014_deadletter_endpoint_delivery'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_entries, migrations.RunPython.noop),
+    ]
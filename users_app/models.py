@@ -3,7 +3,10 @@ import secrets
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from users_app.classifier import LANES, LANE_TRANSACTIONAL
+from users_app.latency import LatencyHistogram
 from users_app.managers import UserManager
+from utils.network import validate_public_url
 
 KEY_TYPES = (
     ('Novofon', 'Novofon'),
@@ -26,13 +29,15 @@ class User(AbstractUser):
         max_length=500,
         verbose_name='Токен для Вебхука',
         null=True,
-        blank=True
+        blank=True,
+        unique=True
     )
     telegram_id = models.CharField(
         max_length=500,
         verbose_name='ID TG',
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
     phone = models.CharField(
         max_length=100,
@@ -49,9 +54,19 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
+    # Токен на момент загрузки из БД: после смены старый токен удаляется
+    # из кеша аутентификации webhook (users_app/token_cache.py)
+    loaded_token_url = None
+
     def __str__(self):
         return f'{self.phone}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_token_url = instance.__dict__.get('token_url')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.token_url:
             self.token_url = secrets.token_urlsafe(32)
@@ -87,17 +102,94 @@ class TelegramChats(models.Model):
     )
     chat_id = models.CharField(
         max_length=250,
-        verbose_name='ID чата ТГ'
+        verbose_name='ID чата ТГ',
+        db_index=True
+    )
+    # Бот из пула, через который отправляются сообщения (см. users_app/bot_pool.py)
+    bot_id = models.CharField(
+        max_length=32,
+        verbose_name='ID бота',
+        null=True,
+        blank=True
+    )
+    # Состояние доставки в чат (см. users_app/chat_health.py)
+    is_suspended = models.BooleanField(
+        default=False,
+        verbose_name='Приостановлен'
+    )
+    error_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ошибок подряд'
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        null=True,
+        blank=True
+    )
+    next_probe_at = models.DateTimeField(
+        verbose_name='Следующая проверка',
+        null=True,
+        blank=True
     )
 
     class Meta:
         verbose_name = 'ТГ канал'
         verbose_name_plural = 'ТГ каналы'
+        constraints = [
+            # Индекс ограничения используется при поиске чата пользователя по chat_id
+            models.UniqueConstraint(fields=['user', 'chat_id'], name='telegram_chats_user_chat_unique'),
+        ]
 
     def __str__(self):
         return f'{self.title}'
 
 
+class HttpEndpoint(models.Model):
+    """HTTP адрес клиента (CRM), на который пересылаются SMS (см. users_app/endpoints.py)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    name = models.CharField(
+        max_length=255,
+        verbose_name='Название',
+        db_index=True
+    )
+    url = models.URLField(
+        max_length=1000,
+        verbose_name='Адрес',
+        validators=[validate_public_url]
+    )
+    # Ключ HMAC подписи запросов (заголовок X-Sms-Signature)
+    secret = models.CharField(
+        max_length=100,
+        verbose_name='Секрет подписи',
+        blank=True
+    )
+    # Сколько SMS можно отправить одним запросом; при 1 каждая SMS отправляется сразу
+    batch_size = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='SMS в одном запросе'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активен'
+    )
+
+    class Meta:
+        verbose_name = 'HTTP адрес'
+        verbose_name_plural = 'HTTP адреса'
+
+    def __str__(self):
+        return f'{self.name}'
+
+    def save(self, *args, **kwargs):
+        if not self.secret:
+            self.secret = secrets.token_urlsafe(32)
+        super().save(*args, **kwargs)
+
+
 class NumbersService(models.Model):
     user = models.ForeignKey(
         User,
@@ -130,7 +222,7 @@ class Rules(models.Model):
         verbose_name='Пользователь'
     )
     sender = models.CharField(
-        max_length=1000,
+        max_length=255,
         verbose_name='Отравитель'
     )
     from_whom = models.ForeignKey(
@@ -138,15 +230,433 @@ class Rules(models.Model):
         on_delete=models.CASCADE,
         verbose_name='От кого'
     )
+    # Получатель — канал Telegram или HTTP адрес клиента (ровно один из них)
     to_whom = models.ForeignKey(
         TelegramChats,
         on_delete=models.CASCADE,
-        verbose_name='Куда'
+        verbose_name='Куда',
+        null=True,
+        blank=True
+    )
+    to_endpoint = models.ForeignKey(
+        HttpEndpoint,
+        on_delete=models.CASCADE,
+        verbose_name='HTTP адрес',
+        null=True,
+        blank=True
     )
 
     class Meta:
         verbose_name = 'Правило'
         verbose_name_plural = 'Правила'
+        indexes = [
+            # Поиск правил для входящей SMS (views.match_rules)
+            models.Index(fields=['user', 'sender'], name='rules_user_sender_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(models.Q(to_whom__isnull=False, to_endpoint__isnull=True)
+                           | models.Q(to_whom__isnull=True, to_endpoint__isnull=False)),
+                name='rules_single_destination',
+            ),
+        ]
+
+    @property
+    def destination(self):
+        return self.to_whom if self.to_whom_id else self.to_endpoint
 
     def __str__(self):
         return f'{self.user}'
+
+
+DELIVERY_STATUSES = (
+    ('pending', 'В очереди'),
+    ('sent', 'Доставлено'),
+    ('failed', 'Ошибка'),
+    ('dead', 'Попытки исчерпаны'),
+)
+
+
+class Delivery(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    chat = models.ForeignKey(
+        TelegramChats,
+        on_delete=models.CASCADE,
+        verbose_name='Чат',
+        related_name='deliveries'
+    )
+    text = models.TextField(
+        verbose_name='Текст сообщения'
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=LANES,
+        default=LANE_TRANSACTIONAL,
+        verbose_name='Приоритет'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=DELIVERY_STATUSES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    # Для статуса pending: время, после которого доставку может взять планировщик
+    next_attempt_at = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        null=True,
+        blank=True
+    )
+    provider = models.CharField(
+        max_length=50,
+        choices=KEY_TYPES,
+        verbose_name='Провайдер',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    # Отметки времени этапов доставки (см. users_app/latency.py)
+    provider_at = models.DateTimeField(
+        verbose_name='Время провайдера',
+        null=True,
+        blank=True
+    )
+    ingested_at = models.DateTimeField(
+        verbose_name='Принято',
+        null=True,
+        blank=True
+    )
+    matched_at = models.DateTimeField(
+        verbose_name='Правило найдено',
+        null=True,
+        blank=True
+    )
+    dequeued_at = models.DateTimeField(
+        verbose_name='Выход из очереди',
+        null=True,
+        blank=True
+    )
+    sent_at = models.DateTimeField(
+        verbose_name='Доставлено',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Доставка'
+        verbose_name_plural = 'Доставки'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.chat_id}: {self.status}'
+
+
+class DeadLetter(models.Model):
+    # Доставка в Telegram или на HTTP адрес (ровно одна из них)
+    delivery = models.OneToOneField(
+        Delivery,
+        on_delete=models.CASCADE,
+        verbose_name='Доставка',
+        related_name='dead_letter',
+        null=True,
+        blank=True
+    )
+    endpoint_delivery = models.OneToOneField(
+        'EndpointDelivery',
+        on_delete=models.CASCADE,
+        verbose_name='Доставка на HTTP адрес',
+        related_name='dead_letter',
+        null=True,
+        blank=True
+    )
+    reason = models.TextField(
+        verbose_name='Причина',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+
+    class Meta:
+        verbose_name = 'Недоставленное сообщение'
+        verbose_name_plural = 'Недоставленные сообщения'
+        constraints = [
+            models.CheckConstraint(
+                condition=(models.Q(delivery__isnull=False, endpoint_delivery__isnull=True)
+                           | models.Q(delivery__isnull=True, endpoint_delivery__isnull=False)),
+                name='dead_letters_single_delivery',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.delivery_id or self.endpoint_delivery_id}'
+
+
+class EndpointDelivery(models.Model):
+    """Пересылка SMS на HttpEndpoint: журнал и очередь повторных попыток."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    endpoint = models.ForeignKey(
+        HttpEndpoint,
+        on_delete=models.CASCADE,
+        verbose_name='HTTP адрес',
+        related_name='deliveries'
+    )
+    # Сообщение в теле запроса (users_app/endpoints.py, build_message)
+    payload = models.JSONField(
+        verbose_name='Сообщение'
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=LANES,
+        default=LANE_TRANSACTIONAL,
+        verbose_name='Приоритет'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=DELIVERY_STATUSES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    # Для статуса pending: время, после которого доставку может взять планировщик
+    next_attempt_at = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        null=True,
+        blank=True
+    )
+    provider = models.CharField(
+        max_length=50,
+        choices=KEY_TYPES,
+        verbose_name='Провайдер',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    # Отметки времени этапов доставки (см. users_app/latency.py)
+    provider_at = models.DateTimeField(
+        verbose_name='Время провайдера',
+        null=True,
+        blank=True
+    )
+    ingested_at = models.DateTimeField(
+        verbose_name='Принято',
+        null=True,
+        blank=True
+    )
+    matched_at = models.DateTimeField(
+        verbose_name='Правило найдено',
+        null=True,
+        blank=True
+    )
+    dequeued_at = models.DateTimeField(
+        verbose_name='Выход из очереди',
+        null=True,
+        blank=True
+    )
+    sent_at = models.DateTimeField(
+        verbose_name='Доставлено',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Доставка на HTTP адрес'
+        verbose_name_plural = 'Доставки на HTTP адреса'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.endpoint_id}: {self.status}'
+
+
+LATENCY_SCOPES = (
+    ('user', 'Пользователь'),
+    ('provider', 'Провайдер'),
+)
+
+
+class LatencyStats(models.Model):
+    period_start = models.DateTimeField(
+        verbose_name='Начало часа'
+    )
+    scope = models.CharField(
+        max_length=20,
+        choices=LATENCY_SCOPES,
+        verbose_name='Область'
+    )
+    key = models.CharField(
+        max_length=100,
+        verbose_name='Ключ'
+    )
+    stage = models.CharField(
+        max_length=20,
+        verbose_name='Этап'
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество'
+    )
+    total_ms = models.FloatField(
+        default=0,
+        verbose_name='Сумма, мс'
+    )
+    buckets = models.JSONField(
+        default=dict,
+        verbose_name='Гистограмма'
+    )
+
+    class Meta:
+        verbose_name = 'Задержка доставки'
+        verbose_name_plural = 'Задержки доставки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'key', 'stage', 'period_start'],
+                name='latency_stats_unique_period'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.scope}:{self.key} {self.stage} {self.period_start}'
+
+    @property
+    def histogram(self):
+        return LatencyHistogram(self.buckets, self.count, self.total_ms)
+
+    def set_histogram(self, histogram):
+        self.buckets = histogram.to_json()
+        self.count = histogram.count
+        self.total_ms = histogram.total_ms
+
+
+AUDIT_OPERATIONS = (
+    ('CREATE', 'Создание'),
+    ('UPDATE', 'Изменение'),
+    ('DELETE', 'Удаление'),
+    ('BULK_CREATE', 'Массовое создание'),
+    ('BULK_UPDATE', 'Массовое изменение'),
+    ('BULK_DELETE', 'Массовое удаление'),
+)
+
+
+class AuditEvent(models.Model):
+    """Запись журнала изменений (см. users_app/audit.py)."""
+    created_at = models.DateTimeField(
+        verbose_name='Время',
+        db_index=True
+    )
+    operation = models.CharField(
+        max_length=20,
+        choices=AUDIT_OPERATIONS,
+        verbose_name='Операция'
+    )
+    model = models.CharField(
+        max_length=50,
+        verbose_name='Модель'
+    )
+    object_id = models.CharField(
+        max_length=64,
+        verbose_name='ID объекта',
+        null=True,
+        blank=True
+    )
+    # Не внешний ключ: записи о пользователе сохраняются после его удаления
+    user_id = models.BigIntegerField(
+        verbose_name='ID пользователя',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+    count = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Количество объектов'
+    )
+    details = models.JSONField(
+        verbose_name='Подробности',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Событие аудита'
+        verbose_name_plural = 'Журнал аудита'
+
+    def __str__(self):
+        return f'{self.operation} {self.model} {self.object_id or self.count}'
+
+
+BALANCE_ENTRY_KINDS = (
+    ('charge', 'Списание за SMS'),
+    ('topup', 'Пополнение'),
+    ('adjustment', 'Корректировка'),
+)
+
+
+class BalanceEntry(models.Model):
+    """
+    Запись журнала баланса (см. users_app/billing.py). Журнал только
+    дополняется: сумма amount по пользователю равна User.balance.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='balance_entries',
+        verbose_name='Пользователь'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=BALANCE_ENTRY_KINDS,
+        verbose_name='Тип'
+    )
+    # Списания отрицательные, пополнения положительные
+    amount = models.IntegerField(
+        verbose_name='Сумма'
+    )
+    sms_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество SMS'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Время',
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Операция по балансу'
+        verbose_name_plural = 'Журнал баланса'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.amount:+d}'
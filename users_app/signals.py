@@ -1,111 +1,70 @@
 """
-Сигналы Django для логирования операций с базой данных.
+Сигналы Django: журнал изменений (аудит) и сброс кешей.
+
+События аудита не пишутся синхронно, а добавляются в буфер процесса
+(см. users_app/audit.py). Владелец берётся из instance.user_id, без
+обращения к связанному объекту и дополнительного запроса. Изменения
+данных пользователя также сбрасывают кеш фрагментов страниц настроек
+(users_app/fragment_cache.py).
 """
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from utils.logger_config import log_database_operation
-from .models import User, Key, NumbersService, TelegramChats, Rules
+from .audit import object_events_suppressed, record
+from .auth_backends import user_cache
+from .billing import invalidate_balance
+from .fragment_cache import invalidate_fragments, sections_for
+from .models import User, Key, NumbersService, TelegramChats, HttpEndpoint, Rules
+from .token_cache import token_cache
+
+# Модели, изменения которых попадают в журнал
+AUDITED_MODELS = (Key, NumbersService, TelegramChats, HttpEndpoint, Rules)
+
+
+@receiver(post_save, sender=User)
+def audit_user_save(sender, instance, created, raw=False, **kwargs):
+    """Аудит создания и изменения пользователей."""
+    if raw:
+        return
+    record("CREATE" if created else "UPDATE", User, instance.pk, user_id=instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def audit_user_delete(sender, instance, **kwargs):
+    """Аудит удаления пользователей."""
+    record("DELETE", User, instance.pk, user_id=instance.pk)
 
 
 @receiver(post_save, sender=User)
-def log_user_operations(sender, instance, created, **kwargs):
-    """Логирование операций с пользователями."""
-    operation = "CREATE" if created else "UPDATE"
-    log_database_operation(
-        operation=operation,
-        model="User",
-        instance_id=instance.id,
-        user_id=instance.id
-    )
-
-
-@receiver(post_save, sender=Key)
-def log_key_operations(sender, instance, created, **kwargs):
-    """Логирование операций с API ключами."""
-    operation = "CREATE" if created else "UPDATE"
-    log_database_operation(
-        operation=operation,
-        model="Key",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_save, sender=NumbersService)
-def log_numbers_service_operations(sender, instance, created, **kwargs):
-    """Логирование операций с номерами телефонов."""
-    operation = "CREATE" if created else "UPDATE"
-    log_database_operation(
-        operation=operation,
-        model="NumbersService",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_save, sender=TelegramChats)
-def log_telegram_chats_operations(sender, instance, created, **kwargs):
-    """Логирование операций с Telegram каналами."""
-    operation = "CREATE" if created else "UPDATE"
-    log_database_operation(
-        operation=operation,
-        model="TelegramChats",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_save, sender=Rules)
-def log_rules_operations(sender, instance, created, **kwargs):
-    """Логирование операций с правилами переадресации."""
-    operation = "CREATE" if created else "UPDATE"
-    log_database_operation(
-        operation=operation,
-        model="Rules",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_delete, sender=Key)
-def log_key_deletion(sender, instance, **kwargs):
-    """Логирование удаления API ключей."""
-    log_database_operation(
-        operation="DELETE",
-        model="Key",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_delete, sender=NumbersService)
-def log_numbers_service_deletion(sender, instance, **kwargs):
-    """Логирование удаления номеров телефонов."""
-    log_database_operation(
-        operation="DELETE",
-        model="NumbersService",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_delete, sender=TelegramChats)
-def log_telegram_chats_deletion(sender, instance, **kwargs):
-    """Логирование удаления Telegram каналов."""
-    log_database_operation(
-        operation="DELETE",
-        model="TelegramChats",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
-
-
-@receiver(post_delete, sender=Rules)
-def log_rules_deletion(sender, instance, **kwargs):
-    """Логирование удаления правил переадресации."""
-    log_database_operation(
-        operation="DELETE",
-        model="Rules",
-        instance_id=instance.id,
-        user_id=instance.user.id
-    )
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender, instance, **kwargs):
+    """Сброс кешей аутентификации (webhook и сессий) и копии баланса при изменении пользователя."""
+    token_cache.invalidate_user(instance, deleted=kwargs['signal'] is post_delete)
+    user_cache.invalidate_user(instance)
+    invalidate_balance(instance.pk)
+
+
+def audit_save(sender, instance, created, raw=False, **kwargs):
+    """Аудит создания и изменения данных пользователя."""
+    if raw:
+        return
+    record("CREATE" if created else "UPDATE", sender, instance.pk, user_id=instance.user_id)
+
+
+def audit_delete(sender, instance, **kwargs):
+    """Аудит удаления данных пользователя."""
+    record("DELETE", sender, instance.pk, user_id=instance.user_id)
+
+
+def invalidate_page_fragments(sender, instance, raw=False, **kwargs):
+    """Сброс кешированных списков на страницах настроек владельца."""
+    # Массовые операции (audited_delete) сбрасывают кеш сами, один раз
+    if raw or object_events_suppressed():
+        return
+    invalidate_fragments([instance.user_id], sections_for(sender.__name__))
+
+
+for model in AUDITED_MODELS:
+    post_save.connect(audit_save, sender=model, dispatch_uid=f'audit_save_{model.__name__}')
+    post_delete.connect(audit_delete, sender=model, dispatch_uid=f'audit_delete_{model.__name__}')
+    post_save.connect(invalidate_page_fragments, sender=model, dispatch_uid=f'fragments_save_{model.__name__}')
+    post_delete.connect(invalidate_page_fragments, sender=model, dispatch_uid=f'fragments_delete_{model.__name__}')
@@ -1,9 +1,11 @@
+import asyncio
 import random
+import signal
 import string
 
 from asgiref.sync import sync_to_async
-from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from telegram import Update, KeyboardButton, ReplyKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder,
@@ -12,8 +14,11 @@ from telegram.ext import (
 )
 from loguru import logger
 
+from users_app.bot_pool import get_bot_pool
+from users_app.chat_health import migrate_chat_id, record_success
 from users_app.models import TelegramChats, User
 from utils.logger_config import log_telegram_event, get_telegram_logger
+from utils.profiling import profiled_handler
 
 
 # Обработчик полученного контакта
@@ -48,6 +53,21 @@ def get_existing_user_by_telegram_id(telegram_id):
     return User.objects.filter(telegram_id=telegram_id).first()
 
 
+@sync_to_async
+def add_chat(user, chat_id, title, bot_id):
+    """
+    Добавление чата пользователю.
+
+    Returns:
+        (TelegramChats, True) для нового чата или (TelegramChats, False) для уже добавленного
+    """
+    try:
+        with transaction.atomic():
+            return TelegramChats.objects.create(user=user, title=title, chat_id=chat_id, bot_id=bot_id), True
+    except IntegrityError:
+        return TelegramChats.objects.get(user=user, chat_id=chat_id), False
+
+
 @sync_to_async
 def get_existing_user_by_phone(phone):
     User = get_user_model()
@@ -86,24 +106,26 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             chat_id = update.message.chat_id
             chat_title = update.message.chat.title or "Без названия"
 
-            # Проверяем, добавлен ли этот чат ранее
-            existing_chat_query = TelegramChats.objects.filter(user=existing_user, chat_id=chat_id)
-            chat_exists = await sync_to_async(existing_chat_query.exists)()
+            # Сохраняем чат одной вставкой и закрепляем его за ботом, получившим команду;
+            # если чат уже добавлен, вставка упирается в ограничение уникальности
+            chat, created = await add_chat(existing_user, chat_id, chat_title, str(context.bot.id))
 
-            if chat_exists:
-                await update.message.reply_text("Этот чат уже добавлен.")
-                log_telegram_event("chat_add_duplicate", telegram_id, f"Chat already exists: {chat_title}")
-            else:
-                # Сохраняем новый чат в базе
-                await sync_to_async(TelegramChats.objects.create)(
-                    user=existing_user,
-                    title=chat_title,
-                    chat_id=chat_id
-                )
+            if created:
                 await update.message.reply_text(
                     f"Чат '{chat_title}' успешно добавлен в вашу учетную запись."
                 )
                 log_telegram_event("chat_add_success", telegram_id, f"Chat added: {chat_title}")
+            else:
+                if not chat.bot_id:
+                    chat.bot_id = str(context.bot.id)
+                    await sync_to_async(chat.save)(update_fields=['bot_id'])
+                # Повторный /start в отключенном чате возобновляет пересылку
+                if await sync_to_async(record_success)(chat):
+                    await update.message.reply_text("Пересылка сообщений в этот чат возобновлена.")
+                    log_telegram_event("chat_resumed", telegram_id, f"Chat resumed: {chat_title}")
+                else:
+                    await update.message.reply_text("Этот чат уже добавлен.")
+                    log_telegram_event("chat_add_duplicate", telegram_id, f"Chat already exists: {chat_title}")
         else:
             # Если Telegram ID не найден, уведомляем пользователя
             await update.message.reply_text(
@@ -143,16 +165,59 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
         log_telegram_event("registration_failed", telegram_id, "Telegram ID already registered", False)
 
 
+async def handle_migrate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обрабатывает перевод группы в супергруппу: переписывает chat_id
+    сохранённых чатов на новый из migrate_to_chat_id.
+    """
+    message = update.message
+    if not message or not message.migrate_to_chat_id:
+        return
+
+    old_chat_id = message.chat_id
+    new_chat_id = message.migrate_to_chat_id
+    updated = await sync_to_async(migrate_chat_id)(old_chat_id, new_chat_id)
+    log_telegram_event("chat_migrated", None, f"Chat {old_chat_id} -> {new_chat_id}, records: {updated}")
+
+
+def build_application(token):
+    app = ApplicationBuilder().token(token).build()
+
+    app.add_handler(CommandHandler("start", profiled_handler('start')(start)))
+    app.add_handler(MessageHandler(filters.CONTACT, profiled_handler('contact')(handle_contact)))
+    app.add_handler(MessageHandler(filters.StatusUpdate.MIGRATE, profiled_handler('migrate')(handle_migrate)))
+    return app
+
+
+async def run_applications(tokens):
+    """
+    Опрос обновлений всех ботов пула в одном цикле событий.
+    Завершается по SIGINT/SIGTERM.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    apps = [build_application(token) for token in tokens]
+    for app in apps:
+        await app.initialize()
+        await app.start()
+        await app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        get_telegram_logger().info(f"Telegram бот @{app.bot.username} запущен и готов к работе")
+
+    await stop_event.wait()
+
+    for app in apps:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+
+
 def main():
     logger.info("Запуск Telegram бота...")
     try:
-        app = ApplicationBuilder().token(settings.TOKEN_BOT).build()
-
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(MessageHandler(filters.CONTACT, handle_contact))
-
-        get_telegram_logger().info("Telegram бот запущен и готов к работе")
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        asyncio.run(run_applications(get_bot_pool().tokens))
     except Exception as e:
         logger.error(f"Ошибка запуска Telegram бота: {e}")
         raise
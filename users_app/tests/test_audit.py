@@ -0,0 +1,65 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from users_app.audit import AuditBuffer
+
+
+class ListSink:
+    """Приёмник, сохраняющий пакеты в памяти."""
+
+    def __init__(self):
+        self.batches = []
+        self.written = threading.Event()
+
+    def write(self, events):
+        self.batches.append(list(events))
+        self.written.set()
+
+
+def make_event(index):
+    return {'operation': 'CREATE', 'model': 'Rules', 'object_id': str(index)}
+
+
+class AuditBufferTests(SimpleTestCase):
+    def make_buffer(self, size=3, flush_interval=60):
+        buffer = AuditBuffer(sink=ListSink(), size=size, flush_interval=flush_interval)
+        self.addCleanup(buffer.stop)
+        return buffer
+
+    def test_add_does_not_write(self):
+        buffer = self.make_buffer()
+
+        for index in range(5):
+            buffer.add(make_event(index))
+
+        self.assertEqual(buffer.sink.batches, [])
+
+    def test_flush_writes_one_batch(self):
+        buffer = self.make_buffer()
+        buffer.add(make_event(1))
+        buffer.add(make_event(2))
+
+        buffer.flush()
+        buffer.flush()
+
+        self.assertEqual([len(batch) for batch in buffer.sink.batches], [2])
+
+    def test_thread_writes_after_interval(self):
+        buffer = self.make_buffer(flush_interval=0.05)
+        buffer.start()
+
+        buffer.add(make_event(1))
+
+        self.assertTrue(buffer.sink.written.wait(5))
+        self.assertEqual(buffer.sink.batches, [[make_event(1)]])
+
+    def test_full_buffer_wakes_thread(self):
+        buffer = self.make_buffer(size=2)
+        buffer.start()
+
+        buffer.add(make_event(1))
+        buffer.add(make_event(2))
+
+        self.assertTrue(buffer.sink.written.wait(5))
+        self.assertEqual(len(buffer.sink.batches[0]), 2)
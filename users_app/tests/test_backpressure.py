@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users_app.backpressure import DeliveryBacklog, backlog, check_backpressure, inflight_count, track_inflight
+from users_app.models import Delivery, EndpointDelivery, HttpEndpoint, TelegramChats, User
+
+
+@override_settings(BACKPRESSURE_REFRESH_INTERVAL=0, BACKPRESSURE_RETRY_AFTER=30)
+class BackpressureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+        cls.chat = TelegramChats.objects.create(user=cls.user, title='chat', chat_id='-100')
+        cls.endpoint = HttpEndpoint.objects.create(
+            user=cls.user, name='crm', url='https://crm.example.com/sms', secret='s3cret'
+        )
+
+    def make_delivery(self, age, status='pending'):
+        delivery = Delivery.objects.create(user=self.user, chat=self.chat, text='SMS', status=status)
+        Delivery.objects.filter(pk=delivery.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+
+    def make_endpoint_delivery(self, age, status='pending'):
+        delivery = EndpointDelivery.objects.create(
+            user=self.user, endpoint=self.endpoint, payload={'text': 'SMS'}, status=status
+        )
+        EndpointDelivery.objects.filter(pk=delivery.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+
+    def test_backlog_counts_telegram_and_endpoint_deliveries(self):
+        self.make_delivery(10)
+        self.make_delivery(500, status='sent')
+        self.make_endpoint_delivery(60)
+        self.make_endpoint_delivery(900, status='dead')
+        state = DeliveryBacklog()
+
+        state.refresh()
+
+        self.assertEqual(state.pending, 2)
+        self.assertAlmostEqual(state.lag_seconds, 60, delta=5)
+
+    def test_empty_backlog_has_no_lag(self):
+        state = DeliveryBacklog()
+
+        state.refresh()
+
+        self.assertEqual(state.pending, 0)
+        self.assertEqual(state.lag_seconds, 0.0)
+
+    @override_settings(BACKPRESSURE_MAX_INFLIGHT=0, BACKPRESSURE_MAX_BACKLOG=2)
+    def test_webhook_is_shed_when_backlog_reaches_limit(self):
+        self.make_delivery(1)
+        self.assertEqual(async_to_sync(check_backpressure)(), 0)
+
+        self.make_endpoint_delivery(1)
+        self.assertEqual(async_to_sync(check_backpressure)(), 30)
+
+    @override_settings(BACKPRESSURE_MAX_INFLIGHT=1, BACKPRESSURE_MAX_BACKLOG=0)
+    def test_webhook_is_shed_when_inflight_reaches_limit(self):
+        self.assertEqual(async_to_sync(check_backpressure)(), 0)
+        with track_inflight():
+            self.assertEqual(inflight_count(), 1)
+            self.assertEqual(async_to_sync(check_backpressure)(), 30)
+        self.assertEqual(inflight_count(), 0)
+
+    def tearDown(self):
+        backlog.pending = 0
+        backlog.oldest_pending_at = None
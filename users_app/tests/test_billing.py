@@ -0,0 +1,94 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from users_app.billing import Meter, apply_charges, balance_mismatches, credit
+from users_app.models import BalanceEntry, User
+
+
+@override_settings(BILLING_ENABLED=True)
+class BillingTestCase(TestCase):
+    def make_user(self, phone, balance=0):
+        return User.objects.create_user(phone=phone, email=f'{phone}@example.com', password='secret', balance=balance)
+
+
+class ApplyChargesTests(BillingTestCase):
+    def test_charges_balances_and_records_entries(self):
+        first, second = self.make_user('79990000001', 100), self.make_user('79990000002', 10)
+
+        balances = apply_charges({first.pk: 3, second.pk: 1, 999999: 5}, price=2)
+
+        self.assertEqual(balances, {first.pk: 94, second.pk: 8})
+        self.assertEqual(User.objects.get(pk=first.pk).balance, 94)
+        entries = {entry.user_id: entry for entry in BalanceEntry.objects.all()}
+        self.assertEqual(set(entries), {first.pk, second.pk})
+        self.assertEqual((entries[first.pk].kind, entries[first.pk].amount, entries[first.pk].sms_count),
+                         ('charge', -6, 3))
+
+
+class MeterTests(BillingTestCase):
+    def test_covers_counts_unflushed_charges(self):
+        user = self.make_user('79990000001', 10)
+        meter = Meter(price=2)
+
+        self.assertTrue(meter.covers(user.pk, 10, count=5))
+        self.assertFalse(meter.covers(user.pk, 10, count=6))
+        meter.charge(user.pk, 4)
+        self.assertTrue(meter.covers(user.pk, 10))
+        self.assertFalse(meter.covers(user.pk, 10, count=2))
+
+    def test_flush_writes_charges(self):
+        user = self.make_user('79990000001', 10)
+        meter = Meter(price=2)
+        meter.charge(user.pk, 2)
+
+        meter.flush()
+
+        self.assertEqual(User.objects.get(pk=user.pk).balance, 6)
+        self.assertEqual(meter.balances.get(user.pk), 6)
+        self.assertFalse(meter._pending)
+
+    def test_failed_flush_requeues_charges(self):
+        user = self.make_user('79990000001', 10)
+        meter = Meter(price=2)
+        meter.charge(user.pk, 2)
+
+        with mock.patch('users_app.billing.apply_charges', side_effect=DatabaseError('gone away')):
+            meter.flush()
+
+        self.assertEqual(meter._pending[user.pk], 2)
+        self.assertFalse(meter._flushing)
+        self.assertFalse(meter.covers(user.pk, 10, count=4))
+        self.assertEqual(User.objects.get(pk=user.pk).balance, 10)
+
+        meter.flush()
+        self.assertEqual(User.objects.get(pk=user.pk).balance, 6)
+        self.assertEqual(BalanceEntry.objects.filter(user=user).count(), 1)
+
+
+class ReconcileTests(BillingTestCase):
+    def test_balance_mismatches(self):
+        edited, consistent = self.make_user('79990000001', 50), self.make_user('79990000002')
+        credit([consistent.pk], 30)
+
+        self.assertEqual(list(balance_mismatches()), [(edited.pk, 50, 0)])
+        self.assertEqual(list(balance_mismatches([consistent.pk])), [])
+        # Пачки меньше числа пользователей не теряют расхождений
+        self.assertEqual(list(balance_mismatches(chunk_size=1)), [(edited.pk, 50, 0)])
+
+    def test_reconcile_balances_fix_records_adjustments(self):
+        user = self.make_user('79990000001', 50)
+        BalanceEntry.objects.create(user=user, kind='topup', amount=20)
+
+        call_command('reconcile_balances', stdout=StringIO())
+        self.assertFalse(BalanceEntry.objects.filter(kind='adjustment').exists())
+
+        call_command('reconcile_balances', '--fix', stdout=StringIO())
+
+        adjustment = BalanceEntry.objects.get(kind='adjustment')
+        self.assertEqual((adjustment.user_id, adjustment.amount), (user.pk, 30))
+        self.assertEqual(list(balance_mismatches()), [])
+        self.assertEqual(User.objects.get(pk=user.pk).balance, 50)
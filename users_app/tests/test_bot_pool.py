@@ -0,0 +1,139 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from users_app.bot_pool import BotPool, TokenBucket, rendezvous_choice
+from users_app.classifier import LANE_BULK, LANE_OTP, LANE_TRANSACTIONAL
+
+TOKENS = ['111:first', '222:second', '333:third']
+
+
+class RendezvousTests(SimpleTestCase):
+    def test_choice_is_stable(self):
+        self.assertEqual(
+            rendezvous_choice('-100', ['111', '222', '333']), rendezvous_choice('-100', ['333', '111', '222'])
+        )
+        self.assertIsNone(rendezvous_choice('-100', []))
+
+    def test_chats_are_spread_over_bots(self):
+        chosen = {rendezvous_choice(f'-{index}', ['111', '222', '333']) for index in range(100)}
+
+        self.assertEqual(chosen, {'111', '222', '333'})
+
+    def test_new_bot_takes_chats_only_from_others(self):
+        chats = [f'-{index}' for index in range(300)]
+        before = {chat: rendezvous_choice(chat, ['111', '222']) for chat in chats}
+        after = {chat: rendezvous_choice(chat, ['111', '222', '333']) for chat in chats}
+
+        moved = [chat for chat in chats if before[chat] != after[chat]]
+        self.assertTrue(moved)
+        self.assertTrue(all(after[chat] == '333' for chat in moved))
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_capacity_then_refill_by_rate(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertTrue(bucket._try_take())
+        self.assertTrue(bucket._try_take())
+        self.assertFalse(bucket._try_take())
+
+        bucket.updated -= 0.25
+
+        self.assertTrue(bucket._try_take())
+        self.assertTrue(bucket._try_take())
+        self.assertFalse(bucket._try_take())
+
+    def test_refill_is_capped(self):
+        bucket = TokenBucket(rate=10, capacity=3)
+        bucket.updated -= 60
+
+        self.assertTrue(bucket.is_idle)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_acquire_times_out(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        self.assertTrue(async_to_sync(bucket.acquire)())
+
+        started = time.monotonic()
+        self.assertFalse(async_to_sync(bucket.acquire)(timeout=0.05))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(bucket._waiters, [])
+
+
+class BotPoolTests(SimpleTestCase):
+    def make_chat(self, chat_id='-100', bot_id=None):
+        return SimpleNamespace(chat_id=chat_id, bot_id=bot_id)
+
+    def test_chat_is_served_by_its_bot(self):
+        pool = BotPool(TOKENS, bot_rate=30, chat_rate_per_minute=20)
+
+        self.assertEqual(pool.primary_id, '111')
+        self.assertEqual(pool.resolve_bot_id(self.make_chat(bot_id='222')), '222')
+        # Бот, которого нет в пуле, заменяется основным
+        self.assertEqual(pool.resolve_bot_id(self.make_chat(bot_id='999')), '111')
+        self.assertEqual(pool.resolve_bot_id(self.make_chat()), '111')
+
+    def test_chat_limit_bounds_acquire(self):
+        pool = BotPool(TOKENS, bot_rate=30, chat_rate_per_minute=1)
+        chat = self.make_chat(bot_id='222')
+
+        async def acquire_all():
+            return [await pool.acquire(chat, timeout=0.05) for _ in range(4)]
+
+        bots = async_to_sync(acquire_all)()
+
+        self.assertEqual([bot is not None for bot in bots], [True, True, True, False])
+        self.assertEqual(bots[0].token, '222:second')
+
+    def test_pool_requires_token(self):
+        with self.assertRaises(ValueError):
+            BotPool([])
+
+
+class PriorityTests(SimpleTestCase):
+    def serve_order(self, bucket, waiters):
+        """Порядок, в котором пустой bucket пропускает ожидающих (priority, имя)."""
+        order = []
+
+        async def wait(priority, name):
+            await bucket.acquire(priority, timeout=5)
+            order.append(name)
+
+        async def run():
+            tasks = []
+            for priority, name in waiters:
+                tasks.append(asyncio.ensure_future(wait(priority, name)))
+                # Ожидающие встают в очередь в заданном порядке
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+
+        async_to_sync(run)()
+        return order
+
+    def test_urgent_lane_is_served_first(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        bucket.tokens = 0
+
+        order = self.serve_order(
+            bucket, [(LANE_BULK, 'bulk'), (LANE_TRANSACTIONAL, 'transactional'), (LANE_OTP, 'otp')]
+        )
+
+        self.assertEqual(order, ['otp', 'transactional', 'bulk'])
+
+    def test_equal_priority_is_fifo(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        bucket.tokens = 0
+
+        self.assertEqual(self.serve_order(bucket, [(1, 'first'), (1, 'second'), (1, 'third')]),
+                         ['first', 'second', 'third'])
+
+    def test_starving_waiter_is_promoted(self):
+        bucket = TokenBucket(rate=50, capacity=1, starvation_seconds=30)
+        now = time.monotonic()
+        starving, fresh = [LANE_BULK, now - 31], [LANE_OTP, now]
+        bucket._waiters = [fresh, starving]
+
+        self.assertIs(bucket._next_waiter(now), starving)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users_app.chat_health import claim_probe, migrate_chat_id, probe_delay, record_failure, record_success
+from users_app.models import Delivery, NumbersService, Rules, TelegramChats, User
+
+
+@override_settings(TELEGRAM_CHAT_MAX_ERRORS=3, TELEGRAM_CHAT_PROBE_BASE_DELAY=300, TELEGRAM_CHAT_PROBE_MAX_DELAY=3600)
+class ChatHealthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+
+    def make_chat(self, chat_id='-100', user=None, **fields):
+        return TelegramChats.objects.create(user=user or self.user, title=f'chat {chat_id}', chat_id=chat_id, **fields)
+
+    def test_probe_delay_doubles_above_threshold_and_is_capped(self):
+        self.assertEqual(probe_delay(3), timedelta(seconds=300))
+        self.assertEqual(probe_delay(4), timedelta(seconds=600))
+        self.assertEqual(probe_delay(5), timedelta(seconds=1200))
+        self.assertEqual(probe_delay(50), timedelta(seconds=3600))
+
+    def test_chat_is_suspended_after_max_errors(self):
+        chat = self.make_chat()
+
+        results = [record_failure(chat, Exception('Forbidden')) for _ in range(4)]
+
+        self.assertEqual(results, [False, False, True, False])
+        chat.refresh_from_db()
+        self.assertTrue(chat.is_suspended)
+        self.assertEqual(chat.error_count, 4)
+        self.assertGreater(chat.next_probe_at, timezone.now() + timedelta(seconds=590))
+
+    def test_only_one_probe_is_claimed(self):
+        chat = self.make_chat(is_suspended=True, error_count=3, next_probe_at=timezone.now() - timedelta(seconds=1))
+        other = TelegramChats.objects.get(pk=chat.pk)
+
+        self.assertTrue(claim_probe(chat))
+        self.assertFalse(claim_probe(other))
+        self.assertGreater(chat.next_probe_at, timezone.now() + timedelta(seconds=590))
+
+    def test_probe_is_not_claimed_before_its_time(self):
+        chat = self.make_chat(is_suspended=True, error_count=3, next_probe_at=timezone.now() + timedelta(seconds=60))
+
+        self.assertFalse(claim_probe(chat))
+
+    def test_success_resumes_suspended_chat(self):
+        chat = self.make_chat(is_suspended=True, error_count=5, next_probe_at=timezone.now())
+
+        self.assertTrue(record_success(chat))
+        chat.refresh_from_db()
+        self.assertFalse(chat.is_suspended)
+        self.assertEqual(chat.error_count, 0)
+        self.assertIsNone(chat.next_probe_at)
+
+
+class MigrateChatIdTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+        cls.other = User.objects.create_user(phone='79990000002', email='other@example.com', password='secret')
+        cls.number = NumbersService.objects.create(user=cls.user, name='main', telephone='79990000001')
+
+    def test_chat_id_is_rewritten_and_health_reset(self):
+        chat = TelegramChats.objects.create(
+            user=self.user, title='group', chat_id='-100', is_suspended=True, error_count=4
+        )
+
+        self.assertEqual(migrate_chat_id(-100, -1001), 1)
+
+        chat.refresh_from_db()
+        self.assertEqual(chat.chat_id, '-1001')
+        self.assertFalse(chat.is_suspended)
+        self.assertEqual(chat.error_count, 0)
+
+    def test_existing_new_chat_is_merged(self):
+        old = TelegramChats.objects.create(user=self.user, title='group', chat_id='-100')
+        new = TelegramChats.objects.create(user=self.user, title='supergroup', chat_id='-1001', error_count=2)
+        other_old = TelegramChats.objects.create(user=self.other, title='group', chat_id='-100')
+        rule = Rules.objects.create(user=self.user, sender='Bank', from_whom=self.number, to_whom=old)
+        delivery = Delivery.objects.create(user=self.user, chat=old, text='SMS')
+
+        self.assertEqual(migrate_chat_id('-100', '-1001'), 2)
+
+        self.assertFalse(TelegramChats.objects.filter(pk=old.pk).exists())
+        rule.refresh_from_db()
+        delivery.refresh_from_db()
+        self.assertEqual(rule.to_whom_id, new.pk)
+        self.assertEqual(delivery.chat_id, new.pk)
+        new.refresh_from_db()
+        self.assertEqual(new.error_count, 0)
+        other_old.refresh_from_db()
+        self.assertEqual(other_old.chat_id, '-1001')
@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from users_app.classifier import LANE_BULK, LANE_OTP, LANE_TRANSACTIONAL, classify_sms
+
+
+class ClassifySmsTests(SimpleTestCase):
+    def assertLane(self, lane, sender, text):
+        self.assertEqual(classify_sms(sender, text), lane, f'{sender}: {text}')
+
+    def test_codes_next_to_keyword_are_otp(self):
+        for sender, text in (
+            ('Sberbank', 'Код подтверждения: 4821. Никому не сообщайте его.'),
+            ('Gosuslugi', '123-456 — ваш код для входа'),
+            ('Google', 'G-582913 is your Google verification code.'),
+            ('Bank', 'Пароль для входа 12 34'),
+            ('900', 'Никому не говорите код! Код: 5521'),
+        ):
+            self.assertLane(LANE_OTP, sender, text)
+
+    def test_short_code_with_amount_is_not_otp(self):
+        for text in ('Покупка 1200р', 'Покупка 1200р. Баланс 35400р', 'Списание 2500.00р, карта *1234'):
+            self.assertLane(LANE_TRANSACTIONAL, '900', text)
+
+    def test_code_far_from_keyword_is_not_otp(self):
+        self.assertLane(
+            LANE_TRANSACTIONAL, 'Shop',
+            'Заказ 48213 передан в доставку. Отслеживайте статус в приложении, для входа нужен код из SMS',
+        )
+
+    def test_bare_code_from_short_number_is_otp(self):
+        self.assertLane(LANE_OTP, '900', '5521')
+        self.assertLane(LANE_TRANSACTIONAL, 'Bank', '5521')
+
+    def test_promotions_are_bulk(self):
+        self.assertLane(LANE_BULK, 'Shop', 'Скидки до 50% на всё! Промокод SALE2024')
+        self.assertLane(LANE_BULK, '900', 'Промокод 1234 на скидку в нашем магазине')
+
+    def test_plain_text_is_transactional(self):
+        self.assertLane(LANE_TRANSACTIONAL, '79990000001', 'Перезвоните мне, пожалуйста')
+        self.assertLane(LANE_TRANSACTIONAL, None, None)
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from users_app.delivery import claim_due_deliveries, is_transient_error, mark_failed, redrive_dead_letters, retry_delay
+from users_app.models import DeadLetter, Delivery, TelegramChats, User
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def test_transient_errors(self):
+        for exc in (NetworkError('Connection reset'), TimedOut(), RetryAfter(10), ConnectionError()):
+            self.assertTrue(is_transient_error(exc), exc)
+        for exc in (BadRequest('Message text is empty'), Forbidden('bot was kicked from the group chat')):
+            self.assertFalse(is_transient_error(exc), exc)
+
+    @override_settings(DELIVERY_RETRY_BASE_DELAY=5, DELIVERY_RETRY_MAX_DELAY=60)
+    def test_delay_grows_exponentially_with_jitter_and_cap(self):
+        for attempts, full in ((1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (40, 60)):
+            for _ in range(20):
+                delay = retry_delay(attempts).total_seconds()
+                self.assertGreaterEqual(delay, full / 2, attempts)
+                self.assertLessEqual(delay, full, attempts)
+
+    @override_settings(DELIVERY_RETRY_BASE_DELAY=5, DELIVERY_RETRY_MAX_DELAY=60)
+    def test_retry_after_is_respected(self):
+        self.assertGreaterEqual(retry_delay(1, RetryAfter(300)), timedelta(seconds=300))
+
+
+@override_settings(DELIVERY_MAX_ATTEMPTS=3, DELIVERY_RETRY_BASE_DELAY=5, DELIVERY_RETRY_MAX_DELAY=60)
+class DeadLetterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+        cls.chat = TelegramChats.objects.create(user=cls.user, title='chat', chat_id='-100')
+
+    def make_delivery(self, attempts):
+        return Delivery.objects.create(
+            user=self.user, chat=self.chat, text='SMS', attempts=attempts,
+            next_attempt_at=timezone.now() + timedelta(seconds=120),
+        )
+
+    def test_transient_failure_is_retried_later(self):
+        delivery = self.make_delivery(attempts=1)
+
+        mark_failed(delivery, NetworkError('Connection reset'))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.last_error, 'Connection reset')
+        self.assertGreater(delivery.next_attempt_at, timezone.now() + timedelta(seconds=2))
+        self.assertFalse(DeadLetter.objects.exists())
+
+    def test_permanent_failure_is_not_retried(self):
+        delivery = self.make_delivery(attempts=1)
+
+        mark_failed(delivery, BadRequest('Message text is empty'))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'failed')
+        self.assertIsNone(delivery.next_attempt_at)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    def test_last_attempt_goes_to_dead_letters_and_is_redriven(self):
+        delivery = self.make_delivery(attempts=3)
+
+        mark_failed(delivery, NetworkError('Connection reset'))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'dead')
+        self.assertEqual(DeadLetter.objects.get().delivery_id, delivery.pk)
+
+        self.assertEqual(redrive_dead_letters(DeadLetter.objects.all()), 1)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.attempts, 0)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    def test_due_delivery_is_claimed_once(self):
+        due = self.make_delivery(attempts=1)
+        Delivery.objects.filter(pk=due.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.make_delivery(attempts=1)
+
+        claimed = claim_due_deliveries()
+
+        self.assertEqual([delivery.pk for delivery in claimed], [due.pk])
+        self.assertEqual(claimed[0].attempts, 2)
+        self.assertGreater(claimed[0].next_attempt_at, timezone.now())
+        self.assertEqual(claim_due_deliveries(), [])
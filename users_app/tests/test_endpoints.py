@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from users_app.delivery import redrive_dead_letters
+from users_app.endpoints import (
+    EndpointClient, EndpointDeferred, EndpointError, attempt_endpoint_batch, deliver_endpoint_batch, sign_payload
+)
+from users_app.models import DeadLetter, EndpointDelivery, HttpEndpoint, User
+from utils.network import is_public_address, validate_public_url
+
+
+class FakeClient:
+    """Клиент, записывающий запросы; errors — исключения для запросов по порядку (None — успех)."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.requests = []
+
+    async def post(self, url, body, headers, timeout=None):
+        self.requests.append((url, body, headers))
+        error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+
+
+class StaticResolveClient(EndpointClient):
+    """Клиент, разрешающий любой хост в заданный IP (без DNS запросов)."""
+
+    def __init__(self, address='93.184.216.34', **kwargs):
+        super().__init__(**kwargs)
+        self.address = address
+
+    async def resolve(self, host, port):
+        return self.address
+
+
+class EndpointTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+        cls.endpoint = HttpEndpoint.objects.create(
+            user=cls.user, name='crm', url='https://crm.example.com/sms', secret='s3cret', batch_size=2
+        )
+
+    def make_deliveries(self, count, attempts=1):
+        now = timezone.now()
+        return [
+            EndpointDelivery.objects.create(
+                user=self.user, endpoint=self.endpoint, payload={'from': '7900', 'text': f'SMS {index}'},
+                attempts=attempts, next_attempt_at=now + timedelta(seconds=120),
+            )
+            for index in range(count)
+        ]
+
+
+class SigningTests(EndpointTestCase):
+    def test_sign_payload_is_hmac_of_timestamp_and_body(self):
+        expected = hmac.new(b's3cret', b'1700000000.{"a":1}', hashlib.sha256).hexdigest()
+        self.assertEqual(sign_payload('s3cret', '1700000000', b'{"a":1}'), expected)
+
+    def test_request_is_signed_and_keyed_by_message_ids(self):
+        deliveries = self.make_deliveries(2)
+        client = FakeClient()
+
+        self.assertTrue(async_to_sync(attempt_endpoint_batch)(self.endpoint, deliveries, client))
+
+        url, body, headers = client.requests[0]
+        self.assertEqual(url, self.endpoint.url)
+        self.assertEqual(
+            headers['X-Sms-Signature'], f"sha256={sign_payload('s3cret', headers['X-Sms-Timestamp'], body)}"
+        )
+        self.assertEqual([message['id'] for message in json.loads(body)['messages']], [d.pk for d in deliveries])
+        ids = ','.join(str(delivery.pk) for delivery in deliveries)
+        self.assertEqual(headers['Idempotency-Key'], hashlib.sha256(ids.encode()).hexdigest())
+        self.assertEqual(EndpointDelivery.objects.filter(status='sent').count(), 2)
+
+
+class BatchingTests(EndpointTestCase):
+    def test_deliveries_are_sent_in_batches_of_endpoint_size(self):
+        deliveries = self.make_deliveries(5)
+        client = FakeClient()
+
+        self.assertEqual(async_to_sync(deliver_endpoint_batch)(deliveries, client), 5)
+
+        batches = [[message['id'] for message in json.loads(body)['messages']] for _, body, _ in client.requests]
+        self.assertEqual(batches, [[d.pk for d in deliveries[0:2]], [d.pk for d in deliveries[2:4]], [deliveries[4].pk]])
+
+    def test_failed_batch_postpones_following_batches(self):
+        deliveries = self.make_deliveries(4)
+        client = FakeClient([EndpointError('HTTP 503')])
+
+        self.assertEqual(async_to_sync(deliver_endpoint_batch)(deliveries, client), 0)
+
+        self.assertEqual(len(client.requests), 1)
+        failed_at = EndpointDelivery.objects.get(pk=deliveries[0].pk).next_attempt_at
+        for delivery in EndpointDelivery.objects.filter(pk__in=[d.pk for d in deliveries[2:]]):
+            self.assertEqual(delivery.status, 'pending')
+            self.assertEqual(delivery.attempts, 0)
+            self.assertEqual(delivery.next_attempt_at, failed_at)
+
+
+class ClassificationTests(EndpointTestCase):
+    def post_status(self, status, headers=None, requests=None):
+        """Код ответа адреса, преобразованный EndpointClient.post."""
+        client = StaticResolveClient()
+
+        def respond(request):
+            if requests is not None:
+                requests.append(request)
+            return httpx.Response(status, headers=headers)
+
+        async def post():
+            client._clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+            try:
+                return await client.post(self.endpoint.url, b'{}', {})
+            finally:
+                await client.aclose()
+
+        return async_to_sync(post)()
+
+    def test_response_classification(self):
+        self.assertEqual(self.post_status(200).status_code, 200)
+        for status in (408, 425, 429, 500, 503):
+            with self.assertRaises(EndpointError) as raised:
+                self.post_status(status)
+            self.assertTrue(raised.exception.transient, status)
+        with self.assertRaises(EndpointError) as raised:
+            self.post_status(400)
+        self.assertFalse(raised.exception.transient)
+        with self.assertRaises(EndpointError) as raised:
+            self.post_status(429, {'Retry-After': '30'})
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_transient_error_is_retried_after_retry_after(self):
+        delivery, = self.make_deliveries(1)
+        client = FakeClient([EndpointError('HTTP 429', retry_after=600)])
+
+        self.assertFalse(async_to_sync(attempt_endpoint_batch)(self.endpoint, [delivery], client))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertGreaterEqual(delivery.next_attempt_at, timezone.now() + timedelta(seconds=590))
+        self.assertEqual(delivery.last_error, 'HTTP 429')
+
+    def test_permanent_error_fails_without_retry(self):
+        delivery, = self.make_deliveries(1)
+        client = FakeClient([EndpointError('HTTP 400', transient=False)])
+
+        async_to_sync(attempt_endpoint_batch)(self.endpoint, [delivery], client)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'failed')
+        self.assertIsNone(delivery.next_attempt_at)
+
+    @override_settings(DELIVERY_MAX_ATTEMPTS=3)
+    def test_transient_error_on_last_attempt_is_dead(self):
+        delivery, = self.make_deliveries(1, attempts=3)
+        client = FakeClient([EndpointError('HTTP 503')])
+
+        async_to_sync(attempt_endpoint_batch)(self.endpoint, [delivery], client)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'dead')
+        self.assertTrue(DeadLetter.objects.filter(endpoint_delivery=delivery).exists())
+
+    @override_settings(DELIVERY_MAX_ATTEMPTS=1)
+    def test_dead_delivery_is_redriven(self):
+        delivery, = self.make_deliveries(1)
+        async_to_sync(attempt_endpoint_batch)(self.endpoint, [delivery], FakeClient([EndpointError('HTTP 503')]))
+
+        self.assertEqual(redrive_dead_letters(DeadLetter.objects.all()), 1)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.attempts, 0)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    def test_request_is_sent_to_checked_address(self):
+        requests = []
+
+        self.post_status(200, requests=requests)
+
+        request, = requests
+        self.assertEqual(request.url.host, '93.184.216.34')
+        self.assertEqual(request.headers['Host'], 'crm.example.com')
+        self.assertEqual(request.extensions['sni_hostname'], 'crm.example.com')
+
+    def test_private_address_is_rejected_at_send_time(self):
+        for url in ('https://127.0.0.1/sms', 'https://169.254.169.254/latest', 'https://[::ffff:10.0.0.1]/',
+                    'http://crm.example.com/sms'):
+            with self.assertRaises(EndpointError) as raised:
+                async_to_sync(EndpointClient().post)(url, b'{}', {})
+            self.assertFalse(raised.exception.transient, url)
+
+    def test_host_resolving_to_private_address_is_rejected(self):
+        with self.assertRaises(EndpointError) as raised:
+            async_to_sync(EndpointClient().resolve)('localhost', 443)
+        self.assertFalse(raised.exception.transient)
+
+    def test_deferred_attempt_is_not_counted(self):
+        delivery, = self.make_deliveries(1)
+        client = FakeClient([EndpointDeferred('Хост crm.example.com занят')])
+
+        self.assertFalse(async_to_sync(attempt_endpoint_batch)(self.endpoint, [delivery], client, timeout=1))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.attempts, 0)
+        self.assertLessEqual(delivery.next_attempt_at, timezone.now())
+
+    def test_busy_host_wait_is_bounded(self):
+        client = EndpointClient(host_concurrency=1)
+
+        async def post_to_busy_host():
+            limit = client.host_limit(self.endpoint.url)
+            await limit.acquire()
+            try:
+                await client.post(self.endpoint.url, b'{}', {}, timeout=0.05)
+            finally:
+                limit.release()
+
+        with self.assertRaises(EndpointDeferred):
+            async_to_sync(post_to_busy_host)()
+
+
+class AddressValidationTests(SimpleTestCase):
+    def test_public_addresses(self):
+        self.assertTrue(is_public_address('93.184.216.34'))
+        self.assertTrue(is_public_address('2606:2800:220:1:248:1893:25c8:1946'))
+        for address in ('127.0.0.1', '10.1.2.3', '192.168.0.1', '172.16.0.1', '169.254.169.254',
+                        '100.64.0.1', '0.0.0.0', '::1', 'fe80::1', 'fd00::1', '::ffff:127.0.0.1', 'bad'):
+            self.assertFalse(is_public_address(address), address)
+
+    def test_validator_requires_https_and_public_host(self):
+        validate_public_url('https://93.184.216.34/sms')
+        for url in ('http://93.184.216.34/sms', 'https://127.0.0.1/sms', 'https://[::1]/sms', 'https://localhost/'):
+            with self.assertRaises(ValidationError, msg=url):
+                validate_public_url(url)
+
+    @override_settings(ENDPOINT_ALLOW_PRIVATE_ADDRESSES=True)
+    def test_private_addresses_can_be_allowed_for_development(self):
+        validate_public_url('http://127.0.0.1:8085/')
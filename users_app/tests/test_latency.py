@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase
+
+from users_app.latency import LatencyHistogram, LatencyRecorder, parse_provider_time
+from users_app.models import LatencyStats
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_percentile_error_is_bounded(self):
+        for value in (0.5, 3, 47, 250, 1234.5, 98765):
+            histogram = LatencyHistogram()
+            histogram.add(value)
+
+            upper = histogram.percentile(50)
+
+            self.assertGreaterEqual(upper, value)
+            self.assertLess(upper, max(value, 1) * 1.2)
+
+    def test_percentiles_of_distribution(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.add(value * 10)
+
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=60)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=120)
+        self.assertEqual(histogram.mean, 505)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+    def test_merge_and_json_round_trip(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.add(10)
+        second.add(10)
+        second.add(1000)
+
+        first.merge(second)
+        restored = LatencyHistogram(first.to_json(), first.count, first.total_ms)
+
+        self.assertEqual(restored.count, 3)
+        self.assertEqual(restored.buckets, first.buckets)
+        self.assertEqual(restored.percentile(100), first.percentile(100))
+
+
+class ProviderTimeTests(SimpleTestCase):
+    def test_formats(self):
+        expected = datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+        for result in ({'timestamp': 1704164645}, {'time': '1704164645000'}, {'date': '2024-01-02T03:04:05Z'},
+                       {'created_at': '2024-01-02 03:04:05'}, {'timestamp': '', 'sent_at': 1704164645.0}):
+            self.assertEqual(parse_provider_time(result), expected, result)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_provider_time({}))
+        self.assertIsNone(parse_provider_time({'timestamp': 'вчера'}))
+
+
+class LatencyRecorderTests(TestCase):
+    def make_delivery(self, ingested_at, total_ms):
+        sent_at = ingested_at + timedelta(milliseconds=total_ms)
+        return SimpleNamespace(
+            user_id=7, provider='novofon', provider_at=None, ingested_at=ingested_at,
+            matched_at=ingested_at + timedelta(milliseconds=5), dequeued_at=ingested_at + timedelta(milliseconds=10),
+            sent_at=sent_at,
+        )
+
+    def test_flush_merges_into_hourly_rows(self):
+        recorder = LatencyRecorder(flush_interval=3600)
+        started = datetime(2024, 1, 2, 3, 10, tzinfo=dt_timezone.utc)
+
+        recorder.record(self.make_delivery(started, 200))
+        recorder.flush()
+        recorder.record(self.make_delivery(started, 400))
+        recorder.flush()
+
+        stats = LatencyStats.objects.get(scope='user', key='7', stage='total')
+        self.assertEqual(stats.period_start, datetime(2024, 1, 2, 3, tzinfo=dt_timezone.utc))
+        self.assertEqual(stats.count, 2)
+        self.assertAlmostEqual(stats.total_ms, 600)
+        self.assertTrue(LatencyStats.objects.filter(scope='provider', key='novofon', stage='queue').exists())
+        # Без времени провайдера этап provider не учитывается
+        self.assertFalse(LatencyStats.objects.filter(stage='provider').exists())
@@ -0,0 +1,25 @@
+from urllib.parse import parse_qs
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from users_app.views import _paginate
+
+
+@override_settings(SETTINGS_PAGE_SIZE=2)
+class PaginationTests(SimpleTestCase):
+    def test_links_keep_other_list_page_and_search(self):
+        request = RequestFactory().get('/services/', {'q': 'мтс', 'keys_page': '2', 'numbers_page': '3'})
+
+        page = _paginate(request, list(range(10)), 'keys_page')
+
+        self.assertEqual(parse_qs(page.previous_query), {'q': ['мтс'], 'keys_page': ['1'], 'numbers_page': ['3']})
+        self.assertEqual(parse_qs(page.next_query), {'q': ['мтс'], 'keys_page': ['3'], 'numbers_page': ['3']})
+
+    def test_partial_renders_links_from_page_queries(self):
+        request = RequestFactory().get('/rules/', {'page': '2', 'q': 'a&b'})
+
+        html = render_to_string('html/partials/pagination.html', {'page_obj': _paginate(request, list(range(10)))})
+
+        self.assertIn('href="?page=1&amp;q=a%26b"', html)
+        self.assertIn('href="?page=3&amp;q=a%26b"', html)
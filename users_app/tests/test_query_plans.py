@@ -0,0 +1,33 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from users_app.models import NumbersService, Rules, TelegramChats, User
+
+
+class QueryPlanTests(TestCase):
+    """Поиск правил, чатов и пользователей должен идти по индексам (check_query_plans)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(20):
+            user = User.objects.create_user(
+                phone=f'7999000{index:04d}', email=f'user{index}@example.com', password='secret',
+                telegram_id=str(1000 + index),
+            )
+            number = NumbersService.objects.create(user=user, name='main', telephone=user.phone)
+            for chat_index in range(3):
+                chat = TelegramChats.objects.create(user=user, title='chat', chat_id=f'-{index}{chat_index}')
+                Rules.objects.create(user=user, sender=f'Sender{chat_index}', from_whom=number, to_whom=chat)
+
+    def test_lookups_use_indexes(self):
+        out = StringIO()
+
+        call_command('check_query_plans', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('webhook rule match', output)
+        self.assertIn('chat duplicate check', output)
+        self.assertIn('user by telegram_id', output)
+        self.assertNotIn('NOT used', output)
@@ -0,0 +1,100 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.rate_limit import (
+    CacheBackend, MemoryBackend, SQLiteBackend, WebhookRateLimiter, sliding_window_check
+)
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def test_previous_window_is_weighted_by_remaining_time(self):
+        # 10 запросов в прошлом окне, прошла половина текущего: оценка 5 + current
+        self.assertEqual(sliding_window_check(10, 4, 30, 60, 10), 0)
+        self.assertGreater(sliding_window_check(10, 5, 30, 60, 10), 0)
+
+    def test_retry_after_when_current_window_is_full(self):
+        self.assertEqual(sliding_window_check(0, 10, 15, 60, 10), 45)
+
+
+class BackendTestsMixin:
+    def make_backend(self):
+        raise NotImplementedError
+
+    def test_limit_is_enforced_per_key(self):
+        backend = self.make_backend()
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            self.assertEqual([backend.hit('a', 3, 60) for _ in range(3)], [0, 0, 0])
+            self.assertGreater(backend.hit('a', 3, 60), 0)
+            self.assertEqual(backend.hit('b', 3, 60), 0)
+
+    def test_rejected_request_is_not_counted(self):
+        backend = self.make_backend()
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            for _ in range(5):
+                backend.hit('a', 2, 60)
+        # Середина следующего окна: 2 учтённых запроса дают оценку 1 (с отклонёнными было бы 2.5)
+        with mock.patch('utils.rate_limit.time.time', return_value=6090.0):
+            self.assertEqual(backend.hit('a', 2, 60), 0)
+
+
+class MemoryBackendTests(BackendTestsMixin, SimpleTestCase):
+    def make_backend(self):
+        return MemoryBackend()
+
+    def test_distinct_keys_in_one_window_are_capped(self):
+        backend = self.make_backend()
+        with mock.patch.object(MemoryBackend, 'MAX_KEYS', 100), \
+                mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            for index in range(1000):
+                backend.hit(f'token:{index}', 10, 60)
+            self.assertLessEqual(len(backend._counters), 100)
+            self.assertIn('token:999', backend._counters)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'rate-limit-tests'}})
+class CacheBackendTests(BackendTestsMixin, SimpleTestCase):
+    def make_backend(self):
+        caches['default'].clear()
+        return CacheBackend()
+
+
+class SQLiteBackendTests(BackendTestsMixin, SimpleTestCase):
+    def make_backend(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SQLiteBackend(path=Path(directory.name) / 'rate_limit.sqlite3')
+
+
+@override_settings(WEBHOOK_RATE_LIMIT_WINDOW=60, WEBHOOK_RATE_LIMIT_PER_TOKEN=2, WEBHOOK_RATE_LIMIT_PER_IP=3,
+                   WEBHOOK_RATE_LIMIT_IP_HEADER=None, WEBHOOK_RATE_LIMIT_IP_ALLOWLIST=['10.1.0.0/16'])
+class WebhookRateLimiterTests(SimpleTestCase):
+    def request(self, ip):
+        return RequestFactory().post('/webhook/token/', REMOTE_ADDR=ip)
+
+    def test_token_rejection_does_not_use_ip_budget(self):
+        limiter = WebhookRateLimiter(MemoryBackend())
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            results = [limiter.check(self.request('203.0.113.5'), 'token-a') for _ in range(5)]
+            self.assertEqual(results[:2], [0, 0])
+            self.assertTrue(all(results[2:]))
+            # IP израсходовал 2 из 3 запросов: ещё один запрос с другим токеном проходит
+            self.assertEqual(limiter.check(self.request('203.0.113.5'), 'token-b'), 0)
+            self.assertGreater(limiter.check(self.request('203.0.113.5'), 'token-c'), 0)
+
+    def test_allowlisted_ip_is_not_limited(self):
+        limiter = WebhookRateLimiter(MemoryBackend())
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            results = [limiter.check(self.request('10.1.2.3'), f'token-{index}') for index in range(10)]
+        self.assertEqual(results, [0] * 10)
+
+    @override_settings(WEBHOOK_RATE_LIMIT_PER_IP=0)
+    def test_ip_limit_is_off_by_zero(self):
+        limiter = WebhookRateLimiter(MemoryBackend())
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            results = [limiter.check(self.request('203.0.113.5'), f'token-{index}') for index in range(10)]
+        self.assertEqual(results, [0] * 10)
@@ -0,0 +1,85 @@
+import gzip
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from utils import staticfiles
+from utils.staticfiles import serve_static
+
+CSS = b'body { color: #000; }\n' * 100
+
+
+class ServeStaticTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        os.makedirs(os.path.join(self.root, 'css'))
+        with open(os.path.join(self.root, 'css', 'app.css'), 'wb') as file:
+            file.write(CSS)
+        with open(os.path.join(self.root, 'css', 'app.css.gz'), 'wb') as file:
+            file.write(gzip.compress(CSS))
+        settings_override = override_settings(STATIC_ROOT=self.root, STATIC_MAX_AGE=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        staticfiles._hashed_names = set()
+        self.addCleanup(setattr, staticfiles, '_hashed_names', None)
+
+    def serve(self, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/static/css/app.css', headers=headers)
+        response = serve_static(request, 'css/app.css')
+        self.addCleanup(response.close)
+        return response
+
+    def test_file_is_streamed_with_cache_headers(self):
+        response = self.serve()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Content-Length'], str(len(CSS)))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('Last-Modified', response)
+        self.assertNotIn('Content-Disposition', response)
+
+    def test_compressed_copy_is_served_when_accepted(self):
+        response = self.serve(accept_encoding='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), CSS)
+
+    def test_hashed_name_is_immutable(self):
+        staticfiles._hashed_names = {'css/app.css'}
+
+        response = self.serve()
+
+        self.assertEqual(response['Cache-Control'], f'public, max-age={staticfiles.IMMUTABLE_MAX_AGE}, immutable')
+
+    def test_head_has_length_without_body(self):
+        response = self.serve('head')
+
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Length'], str(len(CSS)))
+
+    def test_not_modified(self):
+        mtime = os.stat(os.path.join(self.root, 'css', 'app.css')).st_mtime
+
+        response = self.serve(if_modified_since=http_date(mtime + 1))
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_asgi_response_is_read_asynchronously(self):
+        request = AsyncRequestFactory().get('/static/css/app.css')
+        response = serve_static(request, 'css/app.css')
+        self.addCleanup(response.close)
+
+        async def read():
+            return b''.join([block async for block in response])
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(async_to_sync(read)(), CSS)
@@ -0,0 +1,94 @@
+from django.test import TestCase, override_settings
+
+from users_app.models import User
+from users_app.token_cache import MAX_EVENTS, TokenCache
+
+
+@override_settings(TOKEN_CACHE_ALIAS='default')
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        # Кеш другого процесса: версия сверяется при каждом обращении
+        self.cache = TokenCache(version_interval=0)
+
+    def make_user(self, phone='79990000001'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return User.objects.create_user(phone=phone, email=f'{phone}@example.com', password='secret')
+
+    def test_hit_does_not_query_database(self):
+        user = self.make_user()
+        self.assertEqual(self.cache.get_user(user.token_url), user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_user(user.token_url), user)
+
+    def test_token_change_in_other_process_invalidates_old_token(self):
+        user = self.make_user()
+        old_token = user.token_url
+        self.assertEqual(self.cache.get_user(old_token), user)
+
+        user.token_url = 'new-token'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        self.assertIsNone(self.cache.get_user(old_token))
+        self.assertEqual(self.cache.get_user('new-token'), user)
+
+    def test_new_user_token_is_not_kept_in_negative_cache(self):
+        self.assertIsNone(self.cache.get_user('future-token'))
+
+        user = self.make_user()
+        user.token_url = 'future-token'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        self.assertEqual(self.cache.get_user('future-token'), user)
+
+    def test_save_without_token_change_keeps_cache(self):
+        user = self.make_user()
+        other = self.make_user('79990000002')
+        self.assertEqual(self.cache.get_user(user.token_url), user)
+        self.assertEqual(self.cache.get_user(other.token_url), other)
+        self.assertIsNone(self.cache.get_user('unknown-token'))
+
+        user = User.objects.get(pk=user.pk)
+        user.last_name = 'Иванов'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_user(user.token_url), user)
+            self.assertEqual(self.cache.get_user(other.token_url), other)
+            self.assertIsNone(self.cache.get_user('unknown-token'))
+
+    def test_token_change_evicts_only_that_user(self):
+        user = self.make_user()
+        other = self.make_user('79990000002')
+        old_token = user.token_url
+        self.cache.get_user(old_token)
+        self.cache.get_user(other.token_url)
+
+        user = User.objects.get(pk=user.pk)
+        user.token_url = 'new-token'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        self.assertIsNone(self.cache.get_user(old_token))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_user(other.token_url), other)
+
+    def test_missing_events_clear_cache(self):
+        user = self.make_user()
+        self.cache.get_user(user.token_url)
+        self.cache._version -= MAX_EVENTS + 1
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get_user(user.token_url), user)
+
+    def test_deleted_user_is_not_served_from_cache(self):
+        user = self.make_user()
+        token = user.token_url
+        self.assertEqual(self.cache.get_user(token), user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+
+        self.assertIsNone(self.cache.get_user(token))
@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from users_app import bot_pool
+from users_app.bot_pool import configure_bot_pool, get_bot_pool
+from users_app.delivery import partitioned_deliveries
+from users_app.models import Delivery, TelegramChats, User
+
+
+@override_settings(TOKEN_BOT='111:first', TELEGRAM_EXTRA_BOT_TOKENS=['222:second'], TELEGRAM_BOT_RATE_PER_SECOND=30)
+class WorkerBotRateTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(setattr, bot_pool, '_pool', bot_pool._pool)
+
+    def test_bot_rate_is_split_between_worker_processes(self):
+        # Так пул настраивает каждый из 4 процессов run_workers (users_app/workers.py)
+        pool = configure_bot_pool(bot_rate=30 / 4)
+
+        self.assertIs(get_bot_pool(), pool)
+        self.assertEqual({bot_id: bucket.rate for bot_id, bucket in pool._bot_buckets.items()},
+                         {'111': 7.5, '222': 7.5})
+
+    def test_single_process_uses_full_rate(self):
+        pool = configure_bot_pool()
+
+        self.assertEqual(pool._bot_buckets['111'].rate, 30)
+
+
+class PartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(phone='79990000001', email='owner@example.com', password='secret')
+        for index in range(7):
+            chat = TelegramChats.objects.create(user=user, title=f'chat {index}', chat_id=f'-{index}')
+            Delivery.objects.create(user=user, chat=chat, text='SMS 1')
+            Delivery.objects.create(user=user, chat=chat, text='SMS 2')
+
+    def test_partitions_split_chats_without_overlap(self):
+        partitions = [set(partitioned_deliveries((index, 3)).values_list('chat_id', flat=True)) for index in range(3)]
+
+        self.assertEqual(set().union(*partitions), set(Delivery.objects.values_list('chat_id', flat=True)))
+        self.assertEqual(sum(len(chats) for chats in partitions), 7)
+        self.assertTrue(all(partitions))
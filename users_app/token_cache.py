@@ -0,0 +1,201 @@
+"""
+Кеш аутентификации webhook по токену.
+
+Каждый webhook ищет пользователя по token_url. Найденные пользователи
+хранятся в LRU кеше процесса с ограниченным временем жизни, неизвестные
+токены — в отдельном негативном кеше с коротким временем жизни, поэтому
+поток запросов с неверным токеном не доходит до БД.
+
+Сбрасываются только записи токенов, которые перестали или начали
+действовать: старый и новый токен при смене token_url, токен удалённого
+пользователя и токен нового пользователя (из негативного кеша). Прочие
+изменения пользователя (вход, правка в админке) кеш не затрагивают.
+Сигналы (users_app/signals.py) удаляют записи в кеше процесса и после
+фиксации транзакции публикуют их в общем для процессов кеше
+TOKEN_CACHE_ALIAS: номер последнего события и список токенов каждого
+события. Остальные процессы сверяют номер не чаще раза в
+TOKEN_CACHE_VERSION_INTERVAL секунд и удаляют токены новых событий; если
+часть событий уже недоступна, кеш процесса очищается целиком. Номер
+увеличивается через cache.incr, который атомарен в memcached и Redis; в
+файловом кеше одновременные события разных процессов могут затереть
+друг друга, и устаревшая запись тогда живёт до TOKEN_CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from users_app.models import User
+
+VERSION_KEY = 'token_cache_version'
+EVENT_KEY = 'token_cache_event:{}'
+# Больше пропущенных событий — кеш процесса очищается целиком
+MAX_EVENTS = 1000
+
+# Отсутствующее значение (в отличие от закешированного "токен не найден")
+MISS = object()
+
+
+class TTLCache:
+    """LRU кеш фиксированного размера с временем жизни записей."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISS
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TokenCache:
+    """Положительный и негативный кеши токенов webhook."""
+
+    def __init__(self, maxsize=None, ttl=None, negative_maxsize=None, negative_ttl=None, version_interval=None):
+        self.users = TTLCache(maxsize or settings.TOKEN_CACHE_SIZE, ttl or settings.TOKEN_CACHE_TTL)
+        self.unknown = TTLCache(
+            negative_maxsize or settings.TOKEN_NEGATIVE_CACHE_SIZE,
+            negative_ttl or settings.TOKEN_NEGATIVE_CACHE_TTL,
+        )
+        self.version_interval = (
+            settings.TOKEN_CACHE_VERSION_INTERVAL if version_interval is None else version_interval
+        )
+        self._version = None
+        self._checked_at = None
+
+    @staticmethod
+    def _shared():
+        return caches[settings.TOKEN_CACHE_ALIAS]
+
+    def check_version(self):
+        """Удаление токенов, изменённых в других процессах."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.version_interval:
+            return
+        self._checked_at = now
+        version = self._shared().get(VERSION_KEY, 0)
+        if version == self._version:
+            return
+        if self._version is None:
+            # Первая проверка процесса: кеш ещё пуст
+            self._version = version
+            return
+
+        known, self._version = self._version, version
+        if version < known or version - known > MAX_EVENTS:
+            self.clear()
+            return
+        keys = [EVENT_KEY.format(number) for number in range(known + 1, version + 1)]
+        events = self._shared().get_many(keys)
+        if len(events) < len(keys):
+            self.clear()
+            return
+        for tokens in events.values():
+            self._evict(tokens)
+
+    def lookup(self, token):
+        """
+        Поиск в кеше без обращения к БД.
+
+        Returns:
+            User, None для известного неверного токена или MISS
+        """
+        self.check_version()
+        user = self.users.get(token)
+        if user is not MISS:
+            return user
+        if self.unknown.get(token) is not MISS:
+            return None
+        return MISS
+
+    def load(self, token):
+        """Поиск пользователя в БД с сохранением результата в кеш."""
+        user = User.objects.filter(token_url=token).first()
+        if user is None:
+            self.unknown.set(token, True)
+            return None
+        self.users.set(token, user)
+        return user
+
+    def get_user(self, token):
+        user = self.lookup(token)
+        if user is MISS:
+            user = self.load(token)
+        return user
+
+    async def aget_user(self, token):
+        """Асинхронный поиск: попадание в кеш обходится без перехода в поток."""
+        user = self.lookup(token)
+        if user is MISS:
+            user = await sync_to_async(self.load)(token)
+        return user
+
+    def _evict(self, tokens):
+        for token in tokens:
+            self.users.delete(token)
+            self.unknown.delete(token)
+
+    def _publish(self, tokens):
+        shared = self._shared()
+        shared.add(VERSION_KEY, 0, timeout=None)
+        version = shared.incr(VERSION_KEY)
+        # Позже события не нужны: записи кеша к этому времени истекают сами
+        shared.set(EVENT_KEY.format(version), tokens, timeout=self.users.ttl)
+
+    def invalidate_user(self, user, deleted=False):
+        """
+        Сброс записей токенов пользователя после сохранения или удаления.
+
+        Старый токен берётся из User.loaded_token_url (значение при загрузке
+        из БД); если токен не менялся, кеш не затрагивается.
+        """
+        old_token, new_token = user.loaded_token_url, user.__dict__.get('token_url')
+        if not deleted and (new_token is None or new_token == old_token):
+            return
+        # Новый пользователь или смена токена: старый токен больше не
+        # действует, новый мог попасть в негативный кеш
+        tokens = [token for token in {old_token, new_token} if token]
+        user.loaded_token_url = None if deleted else new_token
+        if not tokens:
+            return
+        self._evict(tokens)
+        transaction.on_commit(lambda: self._publish(tokens))
+
+    def clear(self):
+        self.users.clear()
+        self.unknown.clear()
+
+
+token_cache = TokenCache()
@@ -12,6 +12,7 @@ urlpatterns = [
     path('faq/', views.faq, name='faq'),
     path('settings_rules/', views.settings_rules, name='settings_rules'),
     path('settings_rules/delete/<int:rule_id>/', views.delete_rule, name='delete_rule'),
+    path('settings_rules/autocomplete/<str:kind>/', views.rules_autocomplete, name='rules_autocomplete'),
     path('settings_service/', views.settings_service, name='settings_service'),
     path('settings_service/delete/<int:key_id>/', views.delete_service, name='delete_service'),
     path('webhook/<str:token>/', views.get_webhook, name='webhook'),
@@ -1,18 +1,42 @@
+import asyncio
+import functools
+import hashlib
 import json
+import os
+import time
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import IntegrityError
+from django.db.models import Q
 from django.http import JsonResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from telegram import Bot
+from django.views.decorators.http import condition
 from loguru import logger
 
+from users_app.backpressure import check_backpressure, track_inflight
+from users_app.billing import get_meter
+from users_app.chat_health import claim_probe, routable_q
+from users_app.classifier import classify_sms
+from users_app.delivery import create_deliveries, deliver_batch
+from users_app.endpoints import (
+    build_message, create_endpoint_deliveries, deliver_endpoint_batch
+)
 from users_app.forms import ServiceForm, ServiceKeyForm
-from users_app.models import NumbersService, Rules, Key, User
+from users_app.fragment_cache import fragment_version
+from users_app.latency import parse_provider_time
+from users_app.models import HttpEndpoint, NumbersService, Rules, Key, TelegramChats, User
+from users_app.token_cache import token_cache
 from utils.logger_config import log_request, log_webhook_request, get_api_logger
+from utils.rate_limit import get_webhook_rate_limiter
 
 
 def login_view(request):
@@ -60,7 +84,64 @@ def faq(request):
     return render(request, 'html/a_faq.html')
 
 
+def _page_query(request, page_param, number):
+    # Остальные параметры (поиск, страница соседнего списка) сохраняются
+    query = request.GET.copy()
+    query[page_param] = number
+    return query.urlencode()
+
+
+def _paginate(request, queryset, page_param='page'):
+    # Страница вычисляется при первом обращении: если список взят из кеша
+    # фрагментов, запросы подсчёта и выборки не выполняются
+    def get_page():
+        page = Paginator(queryset, settings.SETTINGS_PAGE_SIZE).get_page(request.GET.get(page_param))
+        if page.has_previous():
+            page.previous_query = _page_query(request, page_param, page.previous_page_number())
+        if page.has_next():
+            page.next_query = _page_query(request, page_param, page.next_page_number())
+        return page
+
+    return SimpleLazyObject(get_page)
+
+
+@functools.lru_cache
+def _template_version(template_name):
+    # Время изменения шаблона при запуске процесса: после деплоя с новым
+    # шаблоном ETag страниц меняется
+    return os.stat(get_template(template_name).origin.name).st_mtime_ns
+
+
+def _settings_etag(section, template_name):
+    """
+    ETag страницы настроек без её рендеринга.
+
+    Содержимое страницы определяется версией раздела пользователя (см.
+    users_app/fragment_cache.py), адресом с параметрами поиска и страницы
+    и секретом CSRF: токены форм в закешированной браузером странице
+    остаются действительными, пока не сменился секрет.
+    """
+    def etag(request, *args, **kwargs):
+        if request.method != 'GET':
+            return None
+        parts = (
+            _template_version(template_name), request.user.pk, fragment_version(section, request.user.pk),
+            request.META.get('CSRF_COOKIE'), request.get_full_path(),
+        )
+        return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+    return etag
+
+
+def _fragment_context(request, section):
+    return {
+        'fragment_version': fragment_version(section, request.user.pk),
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_settings_etag('rules', 'html/a_my_forms.html'))
 def settings_rules(request):
     if request.method == 'POST':
         form = ServiceForm(user=request.user, data=request.POST)
@@ -76,17 +157,19 @@ def settings_rules(request):
 
             telephone = form.cleaned_data['telephone']
             telegram_chat = form.cleaned_data['telegram_chat']
+            endpoint = form.cleaned_data['endpoint']
 
             # Создаем правило с учетом флага
             rule = Rules.objects.create(
                 user=request.user,
                 sender=sender,
                 from_whom=telephone,
-                to_whom=telegram_chat
+                to_whom=telegram_chat,
+                to_endpoint=endpoint
             )
             
-            logger.info(f"Создано новое правило (ID: {rule.id}) для пользователя {request.user.phone}: {sender} -> {telegram_chat.title}")
-            log_request(request, 200, f"Rule created: {sender} -> {telegram_chat.title}")
+            logger.info(f"Создано новое правило (ID: {rule.id}) для пользователя {request.user.phone}: {sender} -> {rule.destination}")
+            log_request(request, 200, f"Rule created: {sender} -> {rule.destination}")
 
             return redirect('settings_rules')
 
@@ -98,10 +181,65 @@ def settings_rules(request):
     else:
         form = ServiceForm(user=request.user)
 
-    # Получаем все правила для текущего пользователя
-    user_rules = Rules.objects.filter(user=request.user)
+    # Правила текущего пользователя страницами, с телефоном и каналом в одном запросе
+    query = request.GET.get('q', '').strip()
+    user_rules = Rules.objects.filter(user=request.user).select_related(
+        'from_whom', 'to_whom', 'to_endpoint'
+    ).order_by('-id')
+    if query:
+        user_rules = user_rules.filter(
+            Q(sender__icontains=query) | Q(from_whom__telephone__icontains=query)
+            | Q(to_whom__title__icontains=query) | Q(to_endpoint__name__icontains=query)
+        )
+    page_obj = _paginate(request, user_rules)
+
+    return render(request, 'html/a_my_forms.html', {
+        'form': form,
+        'user_rules': SimpleLazyObject(lambda: page_obj.object_list),
+        'page_obj': page_obj,
+        'q': query,
+        **_fragment_context(request, 'rules'),
+    })
 
-    return render(request, 'html/a_my_forms.html', {'form': form, 'user_rules': user_rules})
+
+@login_required
+def rules_autocomplete(request, kind):
+    """
+    Варианты для полей телефона, канала и HTTP адреса в форме правила.
+
+    Поля формы заполняются по мере ввода, а не списком всех телефонов
+    и каналов пользователя.
+    """
+    query = request.GET.get('q', '').strip()
+    limit = settings.AUTOCOMPLETE_LIMIT
+    if kind == 'numbers':
+        queryset = NumbersService.objects.filter(user=request.user).order_by('telephone')
+        if query:
+            queryset = queryset.filter(telephone__icontains=query)
+        results = [
+            {'id': pk, 'text': f'{name} - {telephone}'}
+            for pk, name, telephone in queryset.values_list('id', 'name', 'telephone')[:limit + 1]
+        ]
+    elif kind == 'chats':
+        queryset = TelegramChats.objects.filter(user=request.user).order_by('title')
+        if query:
+            queryset = queryset.filter(title__icontains=query)
+        results = [
+            {'id': pk, 'text': f'{title} (приостановлен)' if is_suspended else title}
+            for pk, title, is_suspended in queryset.values_list('id', 'title', 'is_suspended')[:limit + 1]
+        ]
+    elif kind == 'endpoints':
+        queryset = HttpEndpoint.objects.filter(user=request.user).order_by('name')
+        if query:
+            queryset = queryset.filter(name__icontains=query)
+        results = [
+            {'id': pk, 'text': name if is_active else f'{name} (отключен)'}
+            for pk, name, is_active in queryset.values_list('id', 'name', 'is_active')[:limit + 1]
+        ]
+    else:
+        return JsonResponse({'results': [], 'more': False}, status=404)
+
+    return JsonResponse({'results': results[:limit], 'more': len(results) > limit})
 
 
 @login_required
@@ -122,6 +260,8 @@ def delete_rule(request, rule_id):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_settings_etag('services', 'html/a_my_input.html'))
 def settings_service(request):
     if request.method == 'POST':
         form = ServiceKeyForm(request.POST)
@@ -146,14 +286,28 @@ def settings_service(request):
     else:
         form = ServiceKeyForm()
 
-    # Получаем все объекты для текущего пользователя
-    user_keys = Key.objects.filter(user=request.user)
-    user_numbers = NumbersService.objects.filter(user=request.user)
+    # Ключи и номера текущего пользователя страницами (у каждого списка своя)
+    query = request.GET.get('q', '').strip()
+    user_keys = Key.objects.filter(user=request.user).order_by('-id')
+    user_numbers = NumbersService.objects.filter(user=request.user).order_by('-id')
+    if query:
+        user_keys = user_keys.filter(Q(title__icontains=query) | Q(name__icontains=query))
+        user_numbers = user_numbers.filter(Q(telephone__icontains=query) | Q(name__icontains=query))
+    keys_page = _paginate(request, user_keys, 'keys_page')
+    numbers_page = _paginate(request, user_numbers, 'numbers_page')
 
     return render(
         request,
         'html/a_my_input.html',
-        {'form': form, 'user_keys': user_keys, 'user_numbers': user_numbers}
+        {
+            'form': form,
+            'user_keys': SimpleLazyObject(lambda: keys_page.object_list),
+            'user_numbers': SimpleLazyObject(lambda: numbers_page.object_list),
+            'keys_page': keys_page,
+            'numbers_page': numbers_page,
+            'q': query,
+            **_fragment_context(request, 'services'),
+        }
     )
 
 
@@ -181,77 +335,151 @@ def delete_service(request, key_id):
     return render(request, 'html/confirm_delete.html', {'key': key})
 
 
+def rules_for_sender(user, caller_id):
+    """Правила пользователя для отправителя SMS (индекс rules_user_sender_idx)."""
+    return Rules.objects.filter(
+        user=user, sender__in=[caller_id, "Любой отправитель"]
+    ).filter(
+        routable_q('to_whom__') | Q(to_whom__isnull=True, to_endpoint__is_active=True)
+    ).select_related('to_whom', 'to_endpoint', 'from_whom')
+
+
+def match_rules(user, caller_id):
+    """Правила пользователя для отправителя SMS с доступными для отправки получателями."""
+    return [
+        rule for rule in rules_for_sender(user, caller_id)
+        if rule.to_endpoint_id or claim_probe(rule.to_whom)
+    ]
+
+
+def _retry_later_response(status, message, retry_after):
+    response = JsonResponse({'status': 'error', 'message': message}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
 @csrf_exempt
 async def get_webhook(request, token):
+    ingested_at = timezone.now()
     if request.method == 'POST':
-        try:
+        # Лимит проверяется до любых обращений к БД
+        retry_after = await get_webhook_rate_limiter().acheck(request, token)
+        if retry_after:
+            return _retry_later_response(429, 'Слишком много запросов', retry_after)
+
+        # Перегрузка очереди доставки: провайдер повторит запрос после Retry-After
+        retry_after = await check_backpressure()
+        if retry_after:
+            return _retry_later_response(503, 'Сервис перегружен, повторите запрос позже', retry_after)
+
+        with track_inflight():
             try:
-                user = await sync_to_async(User.objects.get)(token_url=token)
+                user = await token_cache.aget_user(token)
+                if user is None:
+                    logger.warning(f"Webhook запрос с неверным токеном: {token[:8]}...")
+                    return HttpResponseForbidden('Неверный токен')
                 logger.info(f"Webhook запрос для пользователя: {user.phone} (ID: {user.id})")
-            except User.DoesNotExist:
-                logger.warning(f"Webhook запрос с неверным токеном: {token[:8]}...")
-                return HttpResponseForbidden('Неверный токен')
-
-            data = json.loads(request.body)
-            log_webhook_request(token, data, "Processing started")
-
-            if 'result' in data:
-                result = data['result']
-                caller_did = result.get('caller_did', 'Не указан')
-                caller_id = result.get('caller_id', 'Не указан')
-                text = result.get('text', 'Не указан')
-
-                logger.info(f"SMS получена: от {caller_id} на {caller_did}, текст: {text[:50]}...")
-
-                rules = await sync_to_async(Rules.objects.filter)(user=user)
-                matched_rules = await sync_to_async(
-                    lambda: list(rules.filter(sender__in=[caller_id, "Любой отправитель"]))
-                )()
-
-                if matched_rules:
-                    tg_bot = Bot(settings.TOKEN_BOT)
-                    sent_count = 0
-                    for rule in matched_rules:
+
+                data = json.loads(request.body)
+                log_webhook_request(token, data, "Processing started")
+
+                if 'result' in data:
+                    result = data['result']
+                    caller_did = result.get('caller_did', 'Не указан')
+                    caller_id = result.get('caller_id', 'Не указан')
+                    text = result.get('text', 'Не указан')
+
+                    logger.info(f"SMS получена: от {caller_id} на {caller_did}, текст: {text[:50]}...")
+
+                    matched_rules = await sync_to_async(match_rules)(user, caller_id)
+
+                    if matched_rules and not await get_meter().acan_forward(user.id):
+                        # Проверка по копии баланса в памяти процесса, без запроса к БД
+                        logger.warning(f"SMS от {caller_id} не переслана: недостаточно средств у пользователя {user.id}")
+                        log_webhook_request(token, data, "Insufficient balance")
+                        return JsonResponse({'status': 'error', 'message': 'Недостаточно средств на балансе'}, status=402)
+
+                    if matched_rules:
+                        message_text = (f'Пришло сообщение от {caller_id}\n'
+                                        f'На номер: {caller_did}\n'
+                                        f'Текст: {text}')
+                        # Доставки записываются до отправки: при временной ошибке
+                        # их повторит планировщик (manage.py run_delivery)
+                        priority = classify_sms(caller_id, text)
+                        provider_at = parse_provider_time(result)
+                        chat_rules = [rule for rule in matched_rules if rule.to_whom_id]
+                        endpoint_rules = [rule for rule in matched_rules if rule.to_endpoint_id]
                         try:
-                            to_whom_chat_id = await sync_to_async(lambda: rule.to_whom.chat_id)()
-
-                            message_text = (f'Пришло сообщение от {caller_id}\n'
-                                            f'На номер: {caller_did}\n'
-                                            f'Текст: {text}')
-                            await tg_bot.send_message(chat_id=to_whom_chat_id, text=message_text)
-                            sent_count += 1
-                            logger.info(f"SMS переслана в Telegram канал: {rule.to_whom.title}")
+                            deliveries = await sync_to_async(create_deliveries)(
+                                user, chat_rules, message_text, priority,
+                                ingested_at=ingested_at, provider_at=provider_at
+                            ) if chat_rules else []
+                            endpoint_deliveries = await sync_to_async(create_endpoint_deliveries)(
+                                user, endpoint_rules,
+                                build_message(caller_id, caller_did, text, provider_at or ingested_at),
+                                priority, ingested_at=ingested_at, provider_at=provider_at
+                            ) if endpoint_rules else []
                         except Exception as e:
-                            logger.error(f"Ошибка отправки в Telegram канал {rule.to_whom.title}: {e}")
-
-                    processing_result = f"Sent to {sent_count}/{len(matched_rules)} channels"
-                    log_webhook_request(token, data, processing_result)
+                            if isinstance(e, IntegrityError) and not await User.objects.filter(pk=user.pk).aexists():
+                                # Пользователь удалён, а событие удаления ещё не дошло до кеша процесса
+                                token_cache.users.delete(token)
+                                logger.warning(f"Webhook запрос удалённого пользователя: {token[:8]}...")
+                                return HttpResponseForbidden('Неверный токен')
+                            # SMS не принимается, если его нельзя надёжно поставить в очередь
+                            logger.error(f"Не удалось записать доставки SMS от {caller_id}: {e}")
+                            log_webhook_request(token, data, f"Delivery ledger error: {str(e)}")
+                            return _retry_later_response(
+                                503, 'Не удалось поставить сообщение в очередь', settings.BACKPRESSURE_RETRY_AFTER
+                            )
+                        # Списание копится в памяти, в БД его пакетом запишет фоновый поток
+                        # (users_app/billing.py)
+                        get_meter().charge(user.id)
+
+                        # Чаты и HTTP адреса обслуживаются параллельно, а ожидание ограничено
+                        # DELIVERY_INLINE_MAX_WAIT на весь запрос: не уложившиеся доставки
+                        # отправит планировщик. attempts=1: доставка на адрес арендована для
+                        # отправки здесь же, остальные (адреса с пакетной отправкой) ждут планировщика
+                        deadline = time.monotonic() + settings.DELIVERY_INLINE_MAX_WAIT
+                        telegram_sent, endpoint_sent = await asyncio.gather(
+                            deliver_batch(deliveries, deadline=deadline),
+                            deliver_endpoint_batch(
+                                [delivery for delivery in endpoint_deliveries if delivery.attempts], deadline=deadline
+                            ),
+                        )
+                        if telegram_sent:
+                            logger.info(f"SMS переслана в {telegram_sent}/{len(deliveries)} Telegram каналов")
+                        if endpoint_sent:
+                            logger.info(f"SMS отправлена на {endpoint_sent}/{len(endpoint_deliveries)} HTTP адресов")
+                        sent_count = telegram_sent + endpoint_sent
+
+                        processing_result = f"Sent to {sent_count}/{len(matched_rules)} channels"
+                        log_webhook_request(token, data, processing_result)
                     
-                    return JsonResponse({
-                        'status': 'success',
-                        'message': 'Данные получены и обработаны',
-                        'rules_count': len(matched_rules)
-                    }, status=200)
-                else:
-                    logger.info(f"Для SMS от {caller_id} не найдено подходящих правил")
-                    log_webhook_request(token, data, "No matching rules found")
-                    return JsonResponse({
-                        'status': 'success',
-                        'message': 'Данные получены, но правило не найдено'
-                    }, status=200)
+                        return JsonResponse({
+                            'status': 'success',
+                            'message': 'Данные получены и обработаны',
+                            'rules_count': len(matched_rules)
+                        }, status=200)
+                    else:
+                        logger.info(f"Для SMS от {caller_id} не найдено подходящих правил")
+                        log_webhook_request(token, data, "No matching rules found")
+                        return JsonResponse({
+                            'status': 'success',
+                            'message': 'Данные получены, но правило не найдено'
+                        }, status=200)
 
-            else:
-                logger.warning(f"Webhook запрос без ключа 'result': {data}")
-                log_webhook_request(token, data, "Missing 'result' key")
-                return JsonResponse({'status': 'error', 'message': 'Ключ "result" отсутствует'}, status=400)
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON в webhook: {e}")
-            log_webhook_request(token, {}, f"JSON decode error: {str(e)}")
-            return JsonResponse({'status': 'error', 'message': 'Неверный формат JSON'}, status=400)
-        except Exception as e:
-            logger.error(f"Критическая ошибка в webhook обработчике: {e}")
-            log_webhook_request(token, {}, f"Critical error: {str(e)}")
-            return JsonResponse({'status': 'error', 'message': 'Внутренняя ошибка сервера'}, status=500)
+                else:
+                    logger.warning(f"Webhook запрос без ключа 'result': {data}")
+                    log_webhook_request(token, data, "Missing 'result' key")
+                    return JsonResponse({'status': 'error', 'message': 'Ключ "result" отсутствует'}, status=400)
+            except json.JSONDecodeError as e:
+                logger.error(f"Ошибка парсинга JSON в webhook: {e}")
+                log_webhook_request(token, {}, f"JSON decode error: {str(e)}")
+                return JsonResponse({'status': 'error', 'message': 'Неверный формат JSON'}, status=400)
+            except Exception as e:
+                logger.error(f"Критическая ошибка в webhook обработчике: {e}")
+                log_webhook_request(token, {}, f"Critical error: {str(e)}")
+                return JsonResponse({'status': 'error', 'message': 'Внутренняя ошибка сервера'}, status=500)
     else:
         logger.warning(f"Неподдерживаемый метод {request.method} для webhook")
         return JsonResponse({'status': 'error', 'message': 'Только POST-запросы поддерживаются'}, status=405)
@@ -0,0 +1,160 @@
+"""
+Процессы планировщика доставки (manage.py run_workers).
+
+Один цикл asyncio использует одно ядро, поэтому WorkerSupervisor запускает
+N процессов (fork), каждый со своим подключением к БД и своим пулом
+ботов с HTTP соединениями. Чаты делятся между процессами по остатку от
+деления ID чата (delivery.partitioned_deliveries): доставки одного чата
+отправляет один процесс, порядок сообщений чата сохраняется. Бот же
+общий для всех процессов, поэтому каждый получает 1/N его лимита
+TELEGRAM_BOT_RATE_PER_SECOND.
+
+Супервизор перезапускает завершившиеся процессы с нарастающей паузой,
+если процесс падает сразу после запуска. По SIGTERM или SIGINT процессы
+получают SIGTERM, дописывают текущий пакет и выполняют хуки остановки
+(utils/lifespan.py); не завершившиеся за WORKER_SHUTDOWN_TIMEOUT секунд
+завершаются принудительно. Доставки убитого процесса заберёт планировщик
+после окончания аренды.
+"""
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from utils.logger_config import get_telegram_logger
+
+# Процесс, проработавший меньше RESTART_WINDOW секунд, перезапускается с паузой,
+# которая удваивается до RESTART_MAX_DELAY
+RESTART_WINDOW = 10
+RESTART_MIN_DELAY = 1
+RESTART_MAX_DELAY = 30
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def run_worker(index, count, poll_interval=None):
+    """Точка входа процесса: планировщик доставки раздела index из count."""
+    from users_app.bot_pool import configure_bot_pool
+    from users_app.delivery import run_delivery_scheduler
+    from utils.lifespan import shutdown
+
+    # Обработчики сигналов супервизора наследуются при fork; сами сигналы
+    # заблокированы супервизором до установки обработчиков цикла ниже
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    configure_bot_pool(bot_rate=settings.TELEGRAM_BOT_RATE_PER_SECOND / count)
+
+    async def main():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        # SIGTERM, пришедший во время запуска, остановит цикл с хуками остановки
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        try:
+            await run_delivery_scheduler(poll_interval=poll_interval, stop_event=stop_event,
+                                         partition=(index, count))
+        finally:
+            # Процесс multiprocessing завершается без atexit: буферы сбрасываются здесь
+            await shutdown()
+
+    asyncio.run(main())
+
+
+class Worker:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.started_at = 0
+        self.restart_delay = RESTART_MIN_DELAY
+        self.restart_at = 0
+
+
+class WorkerSupervisor:
+    def __init__(self, procs, poll_interval=None, shutdown_timeout=None):
+        self.procs = procs
+        self.poll_interval = poll_interval
+        self.shutdown_timeout = settings.WORKER_SHUTDOWN_TIMEOUT if shutdown_timeout is None else shutdown_timeout
+        self.context = multiprocessing.get_context('fork')
+        self.workers = [Worker(index) for index in range(procs)]
+        self.stopping = False
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def start_worker(self, worker):
+        # Подключения к БД не должны наследоваться процессом
+        connections.close_all()
+        worker.process = self.context.Process(
+            target=run_worker, args=(worker.index, self.procs, self.poll_interval),
+            name=f'delivery-worker-{worker.index}',
+        )
+        # Процесс получает сигналы остановки только после установки своих
+        # обработчиков (маска сигналов наследуется при fork)
+        previous_mask = signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        try:
+            worker.process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous_mask)
+        worker.started_at = time.monotonic()
+        get_telegram_logger().info(f"Процесс доставки {worker.index} запущен (pid {worker.process.pid})")
+
+    def check_worker(self, worker):
+        """Перезапуск завершившегося процесса."""
+        now = time.monotonic()
+        if worker.process is not None and not worker.process.is_alive():
+            exitcode = worker.process.exitcode
+            worker.process.join()
+            worker.process = None
+            if now - worker.started_at < RESTART_WINDOW:
+                worker.restart_delay = min(worker.restart_delay * 2, RESTART_MAX_DELAY)
+            else:
+                worker.restart_delay = RESTART_MIN_DELAY
+            worker.restart_at = now + worker.restart_delay
+            get_telegram_logger().error(
+                f"Процесс доставки {worker.index} завершился с кодом {exitcode}, "
+                f"перезапуск через {worker.restart_delay} с"
+            )
+        if worker.process is None and now >= worker.restart_at:
+            self.start_worker(worker)
+
+    def run(self):
+        previous = {sig: signal.signal(sig, self.stop) for sig in STOP_SIGNALS}
+        try:
+            get_telegram_logger().info(f"Запуск {self.procs} процессов доставки")
+            for worker in self.workers:
+                self.start_worker(worker)
+            while not self.stopping:
+                sentinels = [worker.process.sentinel for worker in self.workers if worker.process is not None]
+                multiprocessing.connection.wait(sentinels, timeout=1)
+                if self.stopping:
+                    break
+                for worker in self.workers:
+                    self.check_worker(worker)
+        finally:
+            self.shutdown()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def shutdown(self):
+        running = [worker.process for worker in self.workers if worker.process is not None]
+        get_telegram_logger().info(f"Остановка {len(running)} процессов доставки")
+        for process in running:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in running:
+            process.join(max(deadline - time.monotonic(), 0))
+        for process in running:
+            if process.is_alive():
+                get_telegram_logger().warning(
+                    f"Процесс доставки {process.name} не остановился за {self.shutdown_timeout} с и будет завершён"
+                )
+                process.kill()
+                process.join()
+        for worker in self.workers:
+            worker.process = None
@@ -0,0 +1,146 @@
+"""
+Проверки состояния сервиса для балансировщика нагрузки.
+
+/healthz (liveness) отвечает 200, пока процесс обслуживает запросы.
+/readyz (readiness) отвечает 503, если БД недоступна, воркер
+останавливается (utils/lifespan.py) или результаты проверок устарели.
+
+Проверки выполняет фоновый поток раз в HEALTH_REFRESH_INTERVAL секунд
+(Telegram — раз в HEALTH_TELEGRAM_INTERVAL), а запросы проб читают
+готовый результат, поэтому частые пробы не нагружают БД. Отставание
+очереди доставки и недоступность Telegram отражаются в ответе как
+degraded, но не снимают воркер с балансировки: доставки дождутся
+планировщика.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+
+from utils.logger_config import get_database_logger
+from utils.metrics import registry
+
+check_gauge = registry.gauge('health_check_up', 'Result of the last dependency check (1 - ok)')
+
+
+class HealthState:
+    """Результаты проверок, обновляемые фоновым потоком."""
+
+    def __init__(self):
+        self.checks = {}
+        self.refreshed_at = None
+        self._telegram_checked_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='health-refresh', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                get_database_logger().error(f"Ошибка фоновой проверки состояния: {e}")
+            time.sleep(settings.HEALTH_REFRESH_INTERVAL)
+
+    def refresh(self):
+        database = self._check_database()
+        self._publish(
+            database=database,
+            delivery_queue=self._check_delivery_queue() if database['ok'] else {
+                'ok': False, 'error': 'database unavailable'
+            },
+        )
+        self.refreshed_at = time.monotonic()
+
+        # Telegram проверяется реже и после БД, чтобы медленный ответ API
+        # не задерживал обновление остальных результатов
+        if (self._telegram_checked_at is None
+                or time.monotonic() - self._telegram_checked_at >= settings.HEALTH_TELEGRAM_INTERVAL):
+            self._publish(telegram=self._check_telegram())
+            self._telegram_checked_at = time.monotonic()
+
+    def _publish(self, **results):
+        for name, result in results.items():
+            check_gauge.set(int(result['ok']), check=name)
+        # Новый словарь вместо изменения: запросы проб читают checks без блокировки
+        self.checks = {**self.checks, **results}
+
+    @staticmethod
+    def _check_database():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return {'ok': True}
+        except Exception as e:
+            get_database_logger().error(f"Проверка состояния: БД недоступна: {e}")
+            connection.close()
+            return {'ok': False, 'error': str(e)}
+
+    @staticmethod
+    def _check_delivery_queue():
+        from users_app.backpressure import backlog
+
+        backlog.refresh()
+        lag = round(backlog.lag_seconds, 3)
+        return {
+            'ok': lag < settings.HEALTH_MAX_DELIVERY_LAG,
+            'pending': backlog.pending,
+            'lag_seconds': lag,
+        }
+
+    def _check_telegram(self):
+        from users_app.bot_pool import get_bot_pool
+
+        async def check():
+            pool = get_bot_pool()
+            for bot_id in pool.bot_ids:
+                await asyncio.wait_for(pool.get_bot(bot_id).get_me(), timeout=10)
+
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(check())
+            return {'ok': True}
+        except Exception as e:
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+
+    @property
+    def is_stale(self):
+        return (self.refreshed_at is None
+                or time.monotonic() - self.refreshed_at > settings.HEALTH_REFRESH_INTERVAL * 3)
+
+
+health_state = HealthState()
+
+
+def liveness_response():
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness_response():
+    health_state.ensure_started()
+    checks = health_state.checks
+    if health_state.is_stale:
+        status, reason = 'unavailable', 'health checks are stale'
+    elif not checks.get('database', {}).get('ok'):
+        status, reason = 'unavailable', 'database unavailable'
+    elif all(result['ok'] for result in checks.values()):
+        status, reason = 'ok', None
+    else:
+        status, reason = 'degraded', None
+
+    data = {'status': status, 'checks': checks}
+    if reason:
+        data['reason'] = reason
+    return JsonResponse(data, status=200 if status in ('ok', 'degraded') else 503)
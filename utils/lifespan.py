@@ -0,0 +1,87 @@
+"""
+Хуки запуска и остановки процесса.
+
+Для ASGI процесса хуки выполняет обработчик протокола lifespan. Сервер
+(uvicorn) отправляет lifespan.shutdown, когда уже перестал принимать
+соединения и дождался обрабатываемых запросов (не дольше
+--timeout-graceful-shutdown) или прервал их. Поэтому при остановке
+выполняются только хуки: незавершённые доставки возвращаются
+планировщику, буферы статистики, аудита и списаний записываются в БД,
+затем дописываются логи. Процессы планировщика (run_delivery,
+run_workers) вызывают shutdown() сами при завершении цикла.
+
+Хуки регистрируются функцией on_shutdown и выполняются в порядке
+регистрации; синхронные хуки запускаются в отдельном потоке. Аналогично
+on_startup регистрирует подготовку процесса перед приёмом запросов
+(событие lifespan.startup).
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from loguru import logger
+
+from utils.logger_config import get_webhook_logger
+
+_shutdown_hooks = []
+_startup_hooks = []
+
+
+def on_shutdown(hook):
+    """Регистрация хука остановки (можно использовать как декоратор)."""
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+    return hook
+
+
+def on_startup(hook):
+    """Регистрация хука запуска (можно использовать как декоратор)."""
+    if hook not in _startup_hooks:
+        _startup_hooks.append(hook)
+    return hook
+
+
+async def _run_hook(hook, stage='остановки'):
+    try:
+        if inspect.iscoroutinefunction(hook):
+            await hook()
+        else:
+            await sync_to_async(hook)()
+    except Exception as e:
+        get_webhook_logger().error(f"Ошибка хука {stage} {hook.__qualname__}: {e}")
+
+
+async def startup():
+    for hook in list(_startup_hooks):
+        await _run_hook(hook, 'запуска')
+
+
+async def shutdown():
+    """Выполнение хуков остановки и запись буферизованных логов."""
+    for hook in list(_shutdown_hooks):
+        await _run_hook(hook)
+    await logger.complete()
+
+
+class LifespanApplication:
+    """ASGI обёртка, обрабатывающая события lifespan."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                try:
+                    await shutdown()
+                except Exception as e:
+                    await send({'type': 'lifespan.shutdown.failed', 'message': str(e)})
+                else:
+                    await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -10,18 +10,64 @@ from loguru import logger
 from django.conf import settings
 
 
-def setup_logging(base_dir=None):
+# Файлы компонентов: метка в extra -> (имя файла, размер для ротации)
+COMPONENT_SINKS = {
+    'api': ("api.log", "10 MB"),
+    'telegram': ("telegram_bot.log", "5 MB"),
+    'webhook': ("webhooks.log", "10 MB"),
+    'database': ("database.log", "5 MB"),
+}
+
+# Компоненты, которые пишет процесс каждой роли; app.log и errors.log есть у всех
+ROLE_COMPONENTS = {
+    'web': ('api', 'telegram', 'webhook', 'database'),
+    'bot': ('telegram', 'database'),
+    'delivery': ('telegram', 'webhook', 'database'),
+    'command': ('database',),
+}
+
+# Команды manage.py, запускающие долгоживущие процессы
+COMMAND_ROLES = {
+    'runserver': 'web',
+    'run_bot': 'bot',
+    'run_delivery': 'delivery',
+    'run_workers': 'delivery',
+}
+
+
+def detect_role(argv=None):
+    """
+    Роль процесса для выбора файлов логов.
+
+    Берётся из LOG_ROLE, иначе определяется по команде manage.py:
+    run_bot, run_delivery, runserver или прочие команды ('command').
+    Процессы вне manage.py (ASGI сервер) считаются веб-процессами.
+    """
+    role = os.getenv('LOG_ROLE')
+    if role:
+        return role
+    argv = sys.argv if argv is None else argv
+    if argv and Path(argv[0]).name == 'manage.py':
+        return COMMAND_ROLES.get(argv[1], 'command') if len(argv) > 1 else 'command'
+    return 'web'
+
+
+def setup_logging(base_dir=None, role=None):
     """
     Настройка системы логирования с использованием loguru.
     
     Args:
         base_dir: Базовая директория проекта. Если не указана, пытается получить из settings
+        role: Роль процесса (ROLE_COMPONENTS). Если не указана, определяется detect_role
     
     Конфигурирует:
     - Различные уровни логирования для разных компонентов
     - Ротацию файлов по размеру и времени
     - Форматирование сообщений
     - Разделение логов по типам (общие, ошибки, API, бот)
+
+    Процесс открывает только файлы компонентов своей роли, файл создаётся
+    при первой записи (delay=True).
     """
     
     # Удаляем стандартный обработчик loguru
@@ -39,6 +85,7 @@ def setup_logging(base_dir=None):
             log_dir = Path(__file__).resolve().parent.parent / "logs"
     
     log_dir.mkdir(exist_ok=True)
+    role = role or detect_role()
     
     # Формат для логов
     log_format = (
@@ -91,7 +138,8 @@ def setup_logging(base_dir=None):
         retention="30 days",
         compression="gz",
         backtrace=False,
-        diagnose=False
+        diagnose=False,
+        delay=True
     )
     
     # Лог ошибок (WARNING и выше)
@@ -103,54 +151,25 @@ def setup_logging(base_dir=None):
         retention="60 days",
         compression="gz",
         backtrace=True,
-        diagnose=True
-    )
-    
-    # Лог API запросов
-    logger.add(
-        log_dir / "api.log",
-        format=file_format,
-        level="INFO",
-        rotation="10 MB",
-        retention="30 days",
-        compression="gz",
-        filter=lambda record: "api" in record["extra"]
-    )
-    
-    # Лог Telegram бота
-    logger.add(
-        log_dir / "telegram_bot.log",
-        format=file_format,
-        level="INFO",
-        rotation="5 MB",
-        retention="30 days",
-        compression="gz",
-        filter=lambda record: "telegram" in record["extra"]
-    )
-    
-    # Лог webhook запросов
-    logger.add(
-        log_dir / "webhooks.log",
-        format=file_format,
-        level="INFO",
-        rotation="10 MB",
-        retention="30 days",
-        compression="gz",
-        filter=lambda record: "webhook" in record["extra"]
+        diagnose=True,
+        delay=True
     )
     
-    # Лог операций с базой данных
-    logger.add(
-        log_dir / "database.log",
-        format=file_format,
-        level="INFO",
-        rotation="5 MB",
-        retention="30 days",
-        compression="gz",
-        filter=lambda record: "database" in record["extra"]
-    )
+    # Логи компонентов роли (API, Telegram бот, webhook, база данных)
+    for component in ROLE_COMPONENTS.get(role, ROLE_COMPONENTS['web']):
+        file_name, rotation = COMPONENT_SINKS[component]
+        logger.add(
+            log_dir / file_name,
+            format=file_format,
+            level="INFO",
+            rotation=rotation,
+            retention="30 days",
+            compression="gz",
+            filter=lambda record, component=component: component in record["extra"],
+            delay=True
+        )
     
-    logger.info("Система логирования инициализирована")
+    logger.info(f"Система логирования инициализирована (роль: {role})")
 
 
 def get_logger(name: str = None, **extra_context):
@@ -182,11 +201,19 @@ def get_webhook_logger():
 def get_database_logger():
     return get_logger(database=True)
 
-# Для обратной совместимости
-api_logger = get_api_logger()
-telegram_logger = get_telegram_logger()
-webhook_logger = get_webhook_logger()
-database_logger = get_database_logger()
+# Для обратной совместимости: api_logger, telegram_logger и др. создаются при обращении
+_COMPATIBLE_LOGGERS = {
+    'api_logger': get_api_logger,
+    'telegram_logger': get_telegram_logger,
+    'webhook_logger': get_webhook_logger,
+    'database_logger': get_database_logger,
+}
+
+
+def __getattr__(name):
+    if name in _COMPATIBLE_LOGGERS:
+        return _COMPATIBLE_LOGGERS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def log_request(request, response_status=None, extra_info=None):
@@ -0,0 +1,109 @@
+"""
+Простые метрики процесса в формате Prometheus.
+
+Счётчики и датчики хранятся в памяти процесса и отдаются на /metrics/.
+Значение датчика можно задавать напрямую или функцией, которая
+вызывается при каждом сборе метрик.
+"""
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Значение датчика вычисляется функцией при сборе метрик."""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            return [((), self._function())]
+        return super().samples()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, documentation):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation)
+            return metric
+
+    def counter(self, name, documentation=''):
+        return self._get_or_create(Counter, name, documentation)
+
+    def gauge(self, name, documentation=''):
+        return self._get_or_create(Gauge, name, documentation)
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for labels, value in metric.samples():
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                name = f'{metric.name}{{{label_text}}}' if label_text else metric.name
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """Отдача метрик процесса для Prometheus (только с адресов METRICS_ALLOWED_IPS)."""
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
@@ -2,30 +2,216 @@
 Middleware для автоматического логирования HTTP запросов.
 """
 import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
 from loguru import logger
-from utils.logger_config import log_request
+
+from utils.health import liveness_response, readiness_response
+from utils.logger_config import get_database_logger, log_request
+from utils.metrics import registry
+from utils.profiling import RequestProfile, request_label, should_profile_request
+from utils.staticfiles import serve_static
+
+
+class HealthCheckMiddleware:
+    """
+    Ответы на пробы балансировщика (/healthz, /readyz).
+
+    Стоит первым в MIDDLEWARE: пробы не проходят через сессии,
+    аутентификацию и логирование запросов.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.handlers = {
+            settings.HEALTH_LIVENESS_PATH.rstrip('/'): liveness_response,
+            settings.HEALTH_READINESS_PATH.rstrip('/'): readiness_response,
+        }
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        handler = self.handlers.get(request.path.rstrip('/'))
+        if handler is not None:
+            return handler()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        handler = self.handlers.get(request.path.rstrip('/'))
+        if handler is not None:
+            return handler()
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware:
+    """
+    Раздача собранных статических файлов (utils/staticfiles.py).
+
+    Стоит сразу после HealthCheckMiddleware: запросы статики не проходят
+    через сессии, аутентификацию и логирование запросов. Отключается
+    STATIC_SERVE=False, если статику раздаёт веб-сервер.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path.startswith(self.prefix):
+            return serve_static(request, request.path[len(self.prefix):])
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.prefix):
+            # Чтение файла не блокирует цикл событий
+            return await sync_to_async(serve_static, thread_sensitive=False)(
+                request, request.path[len(self.prefix):]
+            )
+        return await self.get_response(request)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжатие ответов gzip (в том числе потоковых) от GZIP_MIN_LENGTH байт.
+
+    Пути из GZIP_EXEMPT_PATHS (webhook) не сжимаются: ответы провайдерам
+    короткие, а сжатие только добавило бы работы на горячем пути.
+    """
+
+    def process_response(self, request, response):
+        if request.path.startswith(tuple(settings.GZIP_EXEMPT_PATHS)):
+            return response
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование выбранных запросов (utils/profiling.py).
+
+    Подключается только при PROFILING_ENABLED, иначе исключается из цепочки.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def start_profile(self, request):
+        if not should_profile_request(request):
+            return None
+        profile = RequestProfile(request_label(request))
+        return profile if profile.start() else None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = self.start_profile(request)
+        try:
+            return self.get_response(request)
+        finally:
+            if profile is not None:
+                profile.stop()
+
+    async def __acall__(self, request):
+        profile = self.start_profile(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            if profile is not None:
+                profile.stop()
+
+
+class QueryRecorder:
+    """Учёт SQL запросов запроса через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms >= self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_sql = sql
+
+
+db_queries_counter = registry.counter('http_db_queries_total', 'SQL queries executed by HTTP requests')
+db_time_counter = registry.counter('http_db_time_ms_total', 'Time spent in SQL by HTTP requests, ms')
+db_slow_requests_counter = registry.counter(
+    'http_db_slow_requests_total', 'HTTP requests over DB_QUERY_WARN_COUNT or DB_QUERY_WARN_TIME_MS'
+)
 
 
 class RequestLoggingMiddleware:
     """
     Middleware для логирования всех HTTP запросов и ответов.
+
+    При DB_QUERY_INSTRUMENTATION также считает SQL запросы каждого
+    запроса, их суммарное время и самый медленный из них.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
+        # Настройка читается один раз: без инструментирования нет накладных расходов
+        self.instrument_queries = settings.DB_QUERY_INSTRUMENTATION
 
     def __call__(self, request):
         # Запоминаем время начала обработки запроса
         start_time = time.time()
         
         # Обрабатываем запрос
-        response = self.get_response(request)
+        recorder = None
+        if self.instrument_queries:
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
         
         # Вычисляем время обработки
         process_time = round((time.time() - start_time) * 1000, 2)  # в миллисекундах
         
         # Логируем запрос
         extra_info = f"Response time: {process_time}ms"
+        if recorder is not None:
+            extra_info += f" | DB: {recorder.count} queries, {round(recorder.total_ms, 2)}ms"
+            self.record_queries(request, recorder)
         if hasattr(response, 'status_code'):
             log_request(request, response.status_code, extra_info)
         else:
@@ -33,6 +219,30 @@ class RequestLoggingMiddleware:
             
         return response
 
+    @staticmethod
+    def record_queries(request, recorder):
+        """Экспорт статистики SQL запросов в метрики и предупреждение о превышении порогов."""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        db_queries_counter.inc(recorder.count, view=view)
+        db_time_counter.inc(round(recorder.total_ms, 3), view=view)
+
+        if (recorder.count > settings.DB_QUERY_WARN_COUNT
+                or recorder.total_ms > settings.DB_QUERY_WARN_TIME_MS):
+            db_slow_requests_counter.inc(view=view)
+            get_database_logger().bind(
+                path=request.path,
+                view=view,
+                db_queries=recorder.count,
+                db_time_ms=round(recorder.total_ms, 2),
+                slowest_ms=round(recorder.slowest_ms, 2),
+                slowest_sql=(recorder.slowest_sql or '')[:500],
+            ).warning(
+                f"Много обращений к БД: {request.method} {request.path} | "
+                f"{recorder.count} запросов, {round(recorder.total_ms, 2)}ms | "
+                f"самый медленный ({round(recorder.slowest_ms, 2)}ms): {(recorder.slowest_sql or '')[:200]}"
+            )
+
     def process_exception(self, request, exception):
         """
         Логирование исключений.
@@ -0,0 +1,75 @@
+"""
+Проверка адресов, на которые сервис отправляет запросы по указанию клиентов.
+
+HTTP адрес клиента (HttpEndpoint.url) задаёт пользователь, поэтому без
+проверки запросы сервиса можно было бы направить во внутреннюю сеть
+(SSRF): на localhost, адреса облачных метаданных (169.254.169.254) или
+частные подсети. Допускаются только https адреса, все IP которых
+публичные. Проверка выполняется при сохранении адреса и перед каждой
+отправкой (users_app/endpoints.py), так как DNS запись могла измениться.
+
+ENDPOINT_ALLOW_PRIVATE_ADDRESSES отключает проверку — только для
+разработки (manage.py endpoint_stub).
+"""
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+def is_public_address(address):
+    """Является ли IP адрес публичным (не частным, не loopback, не link-local и т.п.)."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def literal_address(host):
+    """IP адрес, если host записан как IP, иначе None."""
+    try:
+        return str(ipaddress.ip_address(host.strip('[]')))
+    except ValueError:
+        return None
+
+
+def check_public_addresses(host, addresses):
+    """
+    Проверка адресов, в которые разрешается host.
+
+    Raises:
+        ValueError: среди адресов есть непубличный
+    """
+    if settings.ENDPOINT_ALLOW_PRIVATE_ADDRESSES:
+        return
+    for address in addresses:
+        if not is_public_address(address):
+            raise ValueError(f'{host} указывает на непубличный адрес {address}')
+
+
+def validate_public_url(url):
+    """Валидатор HttpEndpoint.url: https и только публичные адреса хоста."""
+    parts = urlsplit(url)
+    if parts.scheme != 'https' and not settings.ENDPOINT_ALLOW_PRIVATE_ADDRESSES:
+        raise ValidationError('Адрес должен начинаться с https://')
+    host = parts.hostname
+    if not host:
+        raise ValidationError('В адресе не указан хост')
+
+    address = literal_address(host)
+    if address:
+        addresses = [address]
+    else:
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, type=socket.SOCK_STREAM)}
+        except (socket.gaierror, UnicodeError):
+            raise ValidationError(f'Не удалось определить IP адрес {host}')
+    try:
+        check_public_addresses(host, addresses)
+    except ValueError as e:
+        raise ValidationError(str(e))
@@ -0,0 +1,147 @@
+"""
+Профилирование отдельных запросов и обновлений Telegram бота в продакшене.
+
+Включается настройкой PROFILING_ENABLED. Профилируется запрос, если:
+- в нём передан заголовок PROFILING_HEADER с подписанным значением
+  (manage.py profiles --sign), или
+- он попал в выборку с вероятностью PROFILING_SAMPLE_RATE (для запросов —
+  только пути с префиксами из PROFILING_PATH_PREFIXES, если они заданы).
+
+Профиль cProfile сохраняется в PROFILING_DIR (по умолчанию logs/profiles),
+хранится не больше PROFILING_MAX_FILES последних файлов. Одновременно
+профилируется не более одного запроса в процессе: cProfile учитывает
+весь поток, и параллельные профили мешали бы друг другу. Для асинхронных
+запросов в профиль попадает поток цикла событий (включая другие его
+задачи), но не код, выполняемый в sync_to_async.
+"""
+import cProfile
+import functools
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+from utils.logger_config import get_api_logger
+
+SIGNING_SALT = 'utils.profiling'
+# Подписанное значение заголовка действует ограниченное время
+SIGNATURE_MAX_AGE = 24 * 60 * 60
+
+_profile_lock = threading.Lock()
+
+
+def sign_profiling_request():
+    """Значение заголовка PROFILING_HEADER для профилирования запроса."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def has_valid_signature(value):
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=SIGNATURE_MAX_AGE) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+def should_profile_request(request):
+    header_value = request.headers.get(settings.PROFILING_HEADER)
+    if header_value:
+        return has_valid_signature(header_value)
+    prefixes = settings.PROFILING_PATH_PREFIXES
+    if prefixes and not request.path.startswith(tuple(prefixes)):
+        return False
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def should_profile_update():
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def profile_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+class RequestProfile:
+    """
+    Профиль одного запроса.
+
+    start() возвращает False, если в процессе уже профилируется другой
+    запрос; stop() сохраняет профиль и удаляет старые файлы.
+    """
+
+    def __init__(self, label):
+        self.label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_')[:80] or 'request'
+        self.profiler = None
+        self.started_at = None
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        self.profiler = cProfile.Profile()
+        self.started_at = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Другой инструмент профилирования уже активен в процессе
+            _profile_lock.release()
+            return False
+        return True
+
+    def stop(self):
+        self.profiler.disable()
+        elapsed_ms = int((time.perf_counter() - self.started_at) * 1000)
+        _profile_lock.release()
+        try:
+            directory = profile_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{datetime.now():%Y%m%d-%H%M%S-%f}_{self.label}_{elapsed_ms}ms.prof"
+            self.profiler.dump_stats(path)
+            prune_profiles()
+            get_api_logger().info(f"Профиль {self.label} ({elapsed_ms}ms) сохранён: {path.name}")
+        except OSError as e:
+            get_api_logger().error(f"Не удалось сохранить профиль {self.label}: {e}")
+
+
+def list_profiles():
+    """Файлы профилей, от новых к старым."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    return sorted(directory.glob('*.prof'), key=lambda path: path.name, reverse=True)
+
+
+def prune_profiles():
+    for path in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        path.unlink(missing_ok=True)
+
+
+def request_label(request):
+    # Токен webhook в имени файла сокращается, как и в логах
+    path = re.sub(r'^/webhook/([^/]{8})[^/]*', r'/webhook/\1', request.path)
+    return f'{request.method}_{path}'
+
+
+def profiled_handler(name):
+    """Профилирование выборки обновлений, обрабатываемых Telegram обработчиком."""
+    def decorator(handler):
+        if not settings.PROFILING_ENABLED:
+            return handler
+
+        @functools.wraps(handler)
+        async def wrapper(update, context):
+            profile = None
+            if should_profile_update():
+                profile = RequestProfile(f'bot_{name}')
+                if not profile.start():
+                    profile = None
+            try:
+                return await handler(update, context)
+            finally:
+                if profile is not None:
+                    profile.stop()
+        return wrapper
+    return decorator
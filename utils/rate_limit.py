@@ -0,0 +1,239 @@
+"""
+Ограничение частоты запросов к webhook по токену и IP адресу.
+
+Используется скользящее окно со взвешиванием предыдущего окна (sliding
+window counter): на ключ хранятся только два счётчика, а оценка числа
+запросов за последние window секунд сглаживает всплески на границе окон.
+
+Бэкенды:
+- MemoryBackend — счётчики в памяти процесса (по умолчанию);
+- CacheBackend — Django cache, общий для процессов при Redis/Memcached;
+- SQLiteBackend — файл SQLite, общий для процессов одной машины
+  (замена общего хранилища в тестах и небольших установках).
+
+Проверка выполняется до обращения к БД приложения, поэтому клиент,
+превысивший лимит, не нагружает ни БД, ни логи. Сначала проверяется лимит
+токена, затем IP: запрос, отклонённый по токену, не расходует лимит IP.
+Запросы провайдеров приходят с немногих общих адресов, поэтому лимит по
+IP по умолчанию выключен, а адреса провайдеров можно исключить из него
+(WEBHOOK_RATE_LIMIT_IP_ALLOWLIST).
+"""
+import ipaddress
+import itertools
+import math
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from utils.logger_config import get_webhook_logger
+
+
+def sliding_window_check(previous, current, elapsed, window, limit):
+    """
+    Оценка скользящего окна.
+
+    Args:
+        previous: Количество запросов в предыдущем окне
+        current: Количество запросов в текущем окне
+        elapsed: Сколько секунд прошло с начала текущего окна
+        window: Длина окна в секундах
+        limit: Допустимое количество запросов за окно
+
+    Returns:
+        0, если запрос разрешён, иначе через сколько секунд повторить запрос
+    """
+    estimated = previous * (window - elapsed) / window + current
+    if estimated < limit:
+        return 0
+    if current >= limit or not previous:
+        wait = window - elapsed
+    else:
+        # Момент, когда вклад предыдущего окна опустится ниже остатка лимита
+        wait = (window - elapsed) - (limit - current) * window / previous
+    return max(1, math.ceil(wait))
+
+
+class MemoryBackend:
+    """Счётчики в памяти процесса."""
+
+    blocking = False
+    # Количество ключей, после которого удаляются устаревшие счётчики
+    MAX_KEYS = 100000
+
+    def __init__(self, **options):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.MAX_KEYS:
+                    self._prune(index)
+                counter = self._counters[key] = [index, 0, 0]
+            elif counter[0] != index:
+                previous = counter[1] if counter[0] == index - 1 else 0
+                counter[:] = [index, 0, previous]
+
+            retry_after = sliding_window_check(counter[2], counter[1], now - index * window, window, limit)
+            if not retry_after:
+                counter[1] += 1
+            return retry_after
+
+    def _prune(self, index):
+        counters = {key: counter for key, counter in self._counters.items() if counter[0] >= index - 1}
+        if len(counters) >= self.MAX_KEYS:
+            # Множество разных ключей в одном окне: вытесняются самые старые
+            keep = self.MAX_KEYS * 9 // 10
+            counters = dict(itertools.islice(counters.items(), len(counters) - keep, None))
+        self._counters = counters
+
+
+class CacheBackend:
+    """Счётчики в Django cache (общие для процессов при сетевом кеше)."""
+
+    blocking = True
+
+    def __init__(self, cache_alias='default', **options):
+        self.cache = caches[cache_alias]
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        current_key = f'rl:{key}:{index}'
+        counts = self.cache.get_many([current_key, f'rl:{key}:{index - 1}'])
+        retry_after = sliding_window_check(
+            counts.get(f'rl:{key}:{index - 1}', 0), counts.get(current_key, 0),
+            now - index * window, window, limit
+        )
+        if not retry_after:
+            if not self.cache.add(current_key, 1, timeout=window * 2):
+                try:
+                    self.cache.incr(current_key)
+                except ValueError:
+                    self.cache.set(current_key, 1, timeout=window * 2)
+        return retry_after
+
+
+class SQLiteBackend:
+    """Счётчики в файле SQLite (общие для процессов одной машины)."""
+
+    blocking = True
+
+    def __init__(self, path=None, **options):
+        self.path = str(path or settings.WEBHOOK_RATE_LIMIT_SQLITE_PATH)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, '
+                'PRIMARY KEY (key, window))'
+            )
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            counts = dict(connection.execute(
+                'SELECT window, count FROM rate_limit WHERE key = ? AND window IN (?, ?)',
+                (key, index, index - 1)
+            ).fetchall())
+            retry_after = sliding_window_check(
+                counts.get(index - 1, 0), counts.get(index, 0), now - index * window, window, limit
+            )
+            if not retry_after:
+                connection.execute(
+                    'INSERT INTO rate_limit (key, window, count) VALUES (?, ?, 1) '
+                    'ON CONFLICT (key, window) DO UPDATE SET count = count + 1',
+                    (key, index)
+                )
+                if not counts:
+                    connection.execute(
+                        'DELETE FROM rate_limit WHERE key = ? AND window < ?', (key, index - 1)
+                    )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return retry_after
+
+
+class WebhookRateLimiter:
+    """Лимиты webhook по токену и IP адресу клиента."""
+
+    def __init__(self, backend=None):
+        if backend is None:
+            backend_class = import_string(settings.WEBHOOK_RATE_LIMIT_BACKEND)
+            backend = backend_class(**settings.WEBHOOK_RATE_LIMIT_BACKEND_OPTIONS)
+        self.backend = backend
+        self.ip_allowlist = [
+            ipaddress.ip_network(network, strict=False) for network in settings.WEBHOOK_RATE_LIMIT_IP_ALLOWLIST
+        ]
+
+    @staticmethod
+    def client_ip(request):
+        header = settings.WEBHOOK_RATE_LIMIT_IP_HEADER
+        if header and request.META.get(header):
+            return request.META[header].split(',')[0].strip()
+        return request.META.get('REMOTE_ADDR', 'unknown')
+
+    def is_allowlisted(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.ip_allowlist)
+
+    def check(self, request, token):
+        """
+        Учёт запроса к webhook.
+
+        Returns:
+            0, если запрос разрешён, иначе значение Retry-After в секундах
+        """
+        window = settings.WEBHOOK_RATE_LIMIT_WINDOW
+        ip = self.client_ip(request)
+        ip_limit = 0 if self.is_allowlisted(ip) else settings.WEBHOOK_RATE_LIMIT_PER_IP
+        # Лимит IP учитывается последним: запрос, отклонённый по токену, его не расходует
+        for key, limit in (
+            (f'token:{token[:64]}', settings.WEBHOOK_RATE_LIMIT_PER_TOKEN),
+            (f'ip:{ip}', ip_limit),
+        ):
+            if not limit:
+                continue
+            retry_after = self.backend.hit(key, limit, window)
+            if retry_after:
+                get_webhook_logger().debug(f"Превышен лимит webhook запросов для {key[:24]}")
+                return retry_after
+        return 0
+
+    async def acheck(self, request, token):
+        if self.backend.blocking:
+            return await sync_to_async(self.check)(request, token)
+        return self.check(request, token)
+
+
+_limiter = None
+
+
+def get_webhook_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = WebhookRateLimiter()
+    return _limiter
@@ -0,0 +1,222 @@
+"""
+Сборка и раздача статических файлов темы.
+
+collectstatic (STORAGES['staticfiles'] = CompressedManifestStaticFilesStorage):
+- добавляет к именам файлов хеш содержимого (ManifestStaticFilesStorage),
+  {% static %} выдаёт ссылки на хешированные имена;
+- рядом с текстовыми файлами сохраняет сжатые копии .gz и .br
+  (brotli — если установлен пакет brotli);
+- пропускает демо-страницы темы, неиспользуемые библиотеки графиков
+  и исходники SCSS (PRUNED_PATTERNS).
+
+StaticFilesMiddleware (utils/middleware.py) раздаёт собранные файлы из
+STATIC_ROOT без отдельного веб-сервера: выбирает сжатую копию по
+Accept-Encoding, хешированные имена отдаются с Cache-Control immutable
+на год, остальные — с STATIC_MAX_AGE и проверкой If-Modified-Since.
+Файл передаётся частями (FileResponse), без чтения целиком в память;
+под ASGI части читаются в пуле потоков, не блокируя цикл событий.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.apps import StaticFilesConfig as BaseStaticFilesConfig
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, HttpResponseNotFound, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: без неё только gzip
+    brotli = None
+
+# Файлы темы, которые не используются страницами сервиса (пути внутри assets/;
+# каталоги сравниваются только по имени, поэтому для библиотек указан шаблон файлов)
+PRUNED_PATTERNS = [
+    'scss',
+    '*.scss',
+    '*.less',
+    # Исходники и отдельные SVG иконки шрифтов: страницам нужны только CSS и файлы шрифтов
+    *(f'icon-fonts/{pattern}' for pattern in (
+        '*.md', '*.js', '*.png', '*.html', '*.json', '*/icons/*.svg', '*/svg/*', '*/svgs/*', '*/docs/*',
+    )),
+    # Библиотеки графиков, карт, редакторов и прочих демо-страниц
+    *(f'libs/{name}/*' for name in (
+        'apexcharts', 'awesome-notifications', 'chart.js', 'cleave.js', 'datatables.net-bs5', 'dragula',
+        'dropzone', 'echarts', 'filepond*', 'fullcalendar', 'glightbox', 'gmaps', 'gridjs', 'js-treeview',
+        'jsvectormap', 'leaflet', 'masonry-layout', 'moment', 'nouislider', 'particles.js', 'prismjs',
+        'quill', 'rater-js', 'slick-slider', 'sweetalert2', 'swiper', 'wnumb',
+    )),
+    # Скрипты демо-страниц
+    *(f'js/{name}' for name in (
+        'apex*.js', 'chartjs-charts.js', 'echarts.js', 'jsvectormap.js', 'canada.js', 'italy.js',
+        'russia.js', 'spain.js', 'us-merc-en.js', 'dataseries.js', 'google-maps.js', 'leaflet.js',
+        'fullcalendar.js', 'gallery.js', 'blog-post.js', 'chat.js', 'checkout.js', 'file-details.js',
+        'fileupload.js', 'grid.js', 'datatables.js', 'landing.js', 'quill-editor.js', 'swiper.js',
+        'sweet-alerts.js', 'treeview.js', 'under-maintenance.js', 'draggable-cards.js', 'index.js',
+    )),
+]
+
+# Сжимаются только текстовые форматы: шрифты woff2 и изображения уже сжаты
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ttf', '.eot', '.otf')
+COMPRESS_MIN_SIZE = 512
+
+# Варианты файла в порядке предпочтения: (Accept-Encoding, расширение)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Размер части файла в ответе
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class StaticFilesConfig(BaseStaticFilesConfig):
+    """django.contrib.staticfiles с пропуском файлов из PRUNED_PATTERNS."""
+    ignore_patterns = BaseStaticFilesConfig.ignore_patterns + PRUNED_PATTERNS
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хешированные имена файлов и сжатые копии .gz/.br."""
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Шаблоны темы ссылаются и на отсутствующие файлы: для них {% static %}
+        # выдаёт ссылку без хеша вместо ошибки рендеринга страницы
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def safe_converter(matchobj):
+            # Ссылки сторонних CSS на отсутствующие файлы (исходные карты,
+            # удалённые демо-изображения) остаются без изменений
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj[0]
+        return safe_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files) | set(self.hashed_files.values())):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSED_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            # Сжатая копия без заметного выигрыша не сохраняется
+            if len(compressed) < len(content) * 0.95:
+                self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+                yield name + suffix
+
+
+_hashed_names = None
+
+
+def hashed_names():
+    """Хешированные имена из манифеста collectstatic (читается один раз)."""
+    global _hashed_names
+    if _hashed_names is None:
+        manifest = Path(settings.STATIC_ROOT) / ManifestStaticFilesStorage.manifest_name
+        try:
+            _hashed_names = set(json.loads(manifest.read_text())['paths'].values())
+        except (OSError, ValueError, KeyError):
+            _hashed_names = set()
+    return _hashed_names
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = item.partition(';')
+        try:
+            quality = float(params.strip().removeprefix('q=') or 1)
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+async def aread_blocks(file, block_size=STREAM_BLOCK_SIZE):
+    """Асинхронное чтение файла частями: синхронный итератор ASGI обработчик прочитал бы целиком."""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while block := await read(block_size):
+        yield block
+
+
+def serve_static(request, name):
+    """Ответ с файлом name из STATIC_ROOT (или его сжатой копией)."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        return HttpResponseNotFound()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return HttpResponseNotFound()
+    if not os.path.isfile(path):
+        return HttpResponseNotFound()
+
+    immutable = name in hashed_names()
+    if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(name)
+    headers = {
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': (f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+                          else f'public, max-age={settings.STATIC_MAX_AGE}'),
+    }
+    served_path = path
+    if name.endswith(COMPRESSED_EXTENSIONS):
+        headers['Vary'] = 'Accept-Encoding'
+        accepted = accepted_encodings(request)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                served_path = path + suffix
+                headers['Content-Encoding'] = encoding
+                break
+
+    content_type = content_type or 'application/octet-stream'
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['Content-Length'] = os.path.getsize(served_path)
+        return response
+
+    # Файл закрывается при закрытии ответа
+    file = open(served_path, 'rb')
+    response = FileResponse(file, content_type=content_type, headers=headers)
+    response.block_size = STREAM_BLOCK_SIZE
+    # Имя файла (в том числе .gz/.br копии) в ответе не нужно
+    response.headers.pop('Content-Disposition', None)
+    if isinstance(request, ASGIRequest):
+        response.streaming_content = aread_blocks(file)
+    return response